@@ -0,0 +1,6 @@
+"""
+Benchmarks of RePlay hot paths.
+
+Run ``python -m benchmarks.run --help`` to time the cases
+and ``python -m benchmarks.compare --help`` to check results against a stored baseline.
+"""
@@ -0,0 +1,211 @@
+"""
+Benchmark cases of RePlay hot paths.
+
+Every case prepares its inputs outside of the timed part
+and returns a function that runs the hot path once.
+Spark cases force evaluation with an action, otherwise only the plan would be timed.
+"""
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List
+
+import pandas as pd
+
+from replay.data import Dataset, FeatureHint, FeatureInfo, FeatureSchema, FeatureType
+from replay.metrics import NDCG
+from replay.models import ItemKNN, PopRec, Recommender
+from replay.splitters import LastNSplitter, RatioSplitter
+from replay.utils import PYSPARK_AVAILABLE
+from replay.utils.session_handler import State
+
+if PYSPARK_AVAILABLE:
+    from pyspark.sql import DataFrame as SparkDataFrame
+
+    from replay.utils.spark_utils import convert2spark, get_top_k_recs
+
+K = 10
+
+
+class BenchmarkData:
+    """
+    Inputs shared by benchmark cases.
+    Spark DataFrames are cached and fitted models are created lazily once per run.
+    """
+
+    def __init__(self, interactions: pd.DataFrame):
+        """
+        :param interactions: synthetic interactions ``[user_idx, item_idx, relevance, timestamp]``
+        """
+        self.interactions = interactions
+        self._cache: Dict[str, Any] = {}
+
+    def _get(self, name: str, create: Callable[[], Any]) -> Any:
+        if name not in self._cache:
+            self._cache[name] = create()
+        return self._cache[name]
+
+    @property
+    def feature_schema(self) -> FeatureSchema:
+        """Schema of synthetic interactions"""
+        return FeatureSchema(
+            [
+                FeatureInfo("user_idx", FeatureType.CATEGORICAL, FeatureHint.QUERY_ID),
+                FeatureInfo("item_idx", FeatureType.CATEGORICAL, FeatureHint.ITEM_ID),
+                FeatureInfo("relevance", FeatureType.NUMERICAL, FeatureHint.RATING),
+                FeatureInfo("timestamp", FeatureType.NUMERICAL, FeatureHint.TIMESTAMP),
+            ]
+        )
+
+    @property
+    def spark_interactions(self) -> SparkDataFrame:
+        """Cached Spark copy of interactions"""
+        return self._get("spark_interactions", lambda: _materialize(convert2spark(self.interactions)))
+
+    @property
+    def dataset(self) -> Dataset:
+        """Spark dataset of interactions"""
+        return self._get(
+            "dataset",
+            lambda: Dataset(self.feature_schema, self.spark_interactions, check_consistency=False),
+        )
+
+    @property
+    def model(self) -> ItemKNN:
+        """ItemKNN fitted on interactions"""
+
+        def fit():
+            model = ItemKNN()
+            model._fit_wrap(self.dataset)
+            return model
+
+        return self._get("model", fit)
+
+    @property
+    def spark_recs(self) -> SparkDataFrame:
+        """Cached top-k recommendations of ``model`` without seen items filtering"""
+        return self._get(
+            "spark_recs",
+            lambda: _materialize(self.model._predict_wrap(self.dataset, K, filter_seen_items=False)),
+        )
+
+    @property
+    def recs(self) -> pd.DataFrame:
+        """Pandas copy of ``spark_recs``"""
+        return self._get("recs", self.spark_recs.toPandas)
+
+
+def _materialize(dataframe: SparkDataFrame) -> SparkDataFrame:
+    dataframe = dataframe.cache()
+    dataframe.count()
+    return dataframe
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    """
+    :param name: hot path name
+    :param backend: ``pandas`` or ``spark``
+    :param prepare: function of shared inputs returning a function to time
+    """
+
+    name: str
+    backend: str
+    prepare: Callable[[BenchmarkData], Callable[[], Any]]
+
+    @property
+    def case_id(self) -> str:
+        """Unique name of the case in results"""
+        return f"{self.name}[{self.backend}]"
+
+
+def _fit_and_release(model_type: type, dataset: Dataset) -> None:
+    # every run fits a new model, so its cached dataframes are released not to pile up between runs
+    model = model_type()
+    model._fit_wrap(dataset)
+    model._clear_cache()
+
+
+def _fit_wrap(data: BenchmarkData) -> Callable[[], Any]:
+    dataset = data.dataset
+    return lambda: _fit_and_release(ItemKNN, dataset)
+
+
+def _pop_rec_fit_wrap(data: BenchmarkData) -> Callable[[], Any]:
+    dataset = data.dataset
+    return lambda: _fit_and_release(PopRec, dataset)
+
+
+def _predict_and_release(model: Recommender, dataset: Dataset) -> int:
+    recs = model._predict_wrap(dataset, K)
+    num_recs = recs.count()
+    recs.unpersist()
+    return num_recs
+
+
+def _predict_wrap(data: BenchmarkData) -> Callable[[], Any]:
+    model, dataset = data.model, data.dataset
+    return lambda: _predict_and_release(model, dataset)
+
+
+def _filter_seen(data: BenchmarkData) -> Callable[[], Any]:
+    model, recs, dataset = data.model, data.spark_recs, data.dataset
+    return lambda: model._filter_seen(recs, dataset.get_seen_items()).count()
+
+
+def _get_top_k_recs(data: BenchmarkData) -> Callable[[], Any]:
+    recs = data.spark_recs
+    return lambda: get_top_k_recs(recs, K // 2).count()
+
+
+def _metric(backend: str) -> Callable[[BenchmarkData], Callable[[], Any]]:
+    def prepare(data: BenchmarkData) -> Callable[[], Any]:
+        metric = NDCG(K, query_column="user_idx", item_column="item_idx", rating_column="relevance")
+        if backend == "spark":
+            recs, ground_truth = data.spark_recs, data.spark_interactions
+        else:
+            recs, ground_truth = data.recs, data.interactions
+        return lambda: metric(recs, ground_truth)
+
+    return prepare
+
+
+def _splitter(splitter_type: type, backend: str, **kwargs) -> Callable[[BenchmarkData], Callable[[], Any]]:
+    def prepare(data: BenchmarkData) -> Callable[[], Any]:
+        splitter = splitter_type(
+            divide_column="user_idx",
+            query_column="user_idx",
+            item_column="item_idx",
+            timestamp_column="timestamp",
+            **kwargs,
+        )
+        if backend == "spark":
+            interactions = data.spark_interactions
+            return lambda: [part.count() for part in splitter.split(interactions)]
+        interactions = data.interactions
+        return lambda: splitter.split(interactions)
+
+    return prepare
+
+
+CASES: List[BenchmarkCase] = [
+    BenchmarkCase("PopRec._fit_wrap", "spark", _pop_rec_fit_wrap),
+    BenchmarkCase("ItemKNN._fit_wrap", "spark", _fit_wrap),
+    BenchmarkCase("ItemKNN._predict_wrap", "spark", _predict_wrap),
+    BenchmarkCase("_filter_seen", "spark", _filter_seen),
+    BenchmarkCase("get_top_k_recs", "spark", _get_top_k_recs),
+    BenchmarkCase("NDCG.__call__", "pandas", _metric("pandas")),
+    BenchmarkCase("NDCG.__call__", "spark", _metric("spark")),
+    BenchmarkCase("RatioSplitter.split", "pandas", _splitter(RatioSplitter, "pandas", test_size=0.2)),
+    BenchmarkCase("RatioSplitter.split", "spark", _splitter(RatioSplitter, "spark", test_size=0.2)),
+    BenchmarkCase("LastNSplitter.split", "pandas", _splitter(LastNSplitter, "pandas", N=2)),
+    BenchmarkCase("LastNSplitter.split", "spark", _splitter(LastNSplitter, "spark", N=2)),
+]
+
+
+def spark_session_info() -> Dict[str, Any]:
+    """Spark settings that affect timings"""
+    spark = State().session
+    return {
+        "spark_version": spark.version,
+        "spark_master": spark.sparkContext.master,
+        "shuffle_partitions": spark.conf.get("spark.sql.shuffle.partitions"),
+    }
@@ -0,0 +1,79 @@
+"""
+Compare benchmark results with a stored baseline.
+
+Exits with code 1 if the median time or peak memory of any case
+grew more than the threshold relative to the baseline.
+
+Example::
+
+    python -m benchmarks.compare baseline.json results.json --threshold 0.2
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+METRICS = ("median_seconds", "peak_python_memory_mb")
+
+
+def compare_results(
+    baseline: Dict[str, Any], current: Dict[str, Any], threshold: float
+) -> List[Dict[str, Any]]:
+    """
+    Compare cases present in both results.
+
+    :param baseline: results of ``benchmarks.run`` to compare with
+    :param current: new results of ``benchmarks.run``
+    :param threshold: allowed relative growth, ``0.2`` means 20%
+    :return: comparison rows with ``regression`` flag
+    """
+    if baseline["meta"]["scale"] != current["meta"]["scale"]:
+        print("Warning: results were obtained on different scales", file=sys.stderr)
+
+    rows = []
+    for case_id, current_case in current["results"].items():
+        baseline_case = baseline["results"].get(case_id)
+        if baseline_case is None:
+            continue
+        for metric in METRICS:
+            base_value, value = baseline_case[metric], current_case[metric]
+            ratio = value / base_value if base_value > 0 else float("inf") if value > 0 else 1.0
+            rows.append(
+                {
+                    "case": case_id,
+                    "metric": metric,
+                    "baseline": base_value,
+                    "current": value,
+                    "ratio": ratio,
+                    "regression": ratio > 1 + threshold,
+                }
+            )
+    return rows
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline", help="json file with baseline results")
+    parser.add_argument("current", help="json file with new results")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative growth")
+    parsed = parser.parse_args(args)
+
+    with open(parsed.baseline, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+    with open(parsed.current, encoding="utf-8") as current_file:
+        current = json.load(current_file)
+
+    rows = compare_results(baseline, current, parsed.threshold)
+    for row in rows:
+        mark = "REGRESSION" if row["regression"] else "ok"
+        print(
+            f"{row['case']:<40} {row['metric']:<22} "
+            f"{row['baseline']:>10.3f} -> {row['current']:>10.3f} ({row['ratio']:.2f}x) {mark}"
+        )
+    if any(row["regression"] for row in rows):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Deterministic synthetic interaction logs for benchmarks
+"""
+from dataclasses import asdict, dataclass
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+
+@dataclass(frozen=True)
+class Scale:
+    """
+    Size and shape of a synthetic interaction log.
+
+    :param num_queries: number of queries
+    :param num_items: number of items
+    :param density: share of all query-item pairs present in the log
+    :param skew: exponent of Zipf-like item popularity, ``0`` gives uniform popularity
+    :param seed: random seed
+    """
+
+    num_queries: int
+    num_items: int
+    density: float
+    skew: float = 1.0
+    seed: int = 42
+
+    @property
+    def num_interactions(self) -> int:
+        """Expected number of interactions in the log"""
+        return max(int(self.num_queries * self.num_items * self.density), self.num_queries)
+
+    def as_dict(self) -> Dict:
+        """Scale parameters to store with results"""
+        return asdict(self)
+
+
+SCALES = {
+    "tiny": Scale(num_queries=100, num_items=50, density=0.1),
+    "small": Scale(num_queries=2_000, num_items=1_000, density=0.01),
+    "medium": Scale(num_queries=20_000, num_items=5_000, density=0.002),
+    "large": Scale(num_queries=200_000, num_items=20_000, density=0.0005),
+}
+
+
+def generate_interactions(scale: Scale) -> pd.DataFrame:
+    """
+    Generate interactions ``[user_idx, item_idx, relevance, timestamp]``
+    without duplicate query-item pairs.
+    Item popularity follows a power law with ``scale.skew`` exponent,
+    every query has at least one interaction.
+
+    :param scale: size and shape of the log
+    :return: interactions sorted by query and timestamp
+    """
+    rng = np.random.default_rng(scale.seed)
+    popularity = 1.0 / np.arange(1, scale.num_items + 1) ** scale.skew
+    popularity /= popularity.sum()
+    item_order = rng.permutation(scale.num_items)
+
+    queries = np.concatenate(
+        [
+            np.arange(scale.num_queries),
+            rng.integers(0, scale.num_queries, scale.num_interactions - scale.num_queries),
+        ]
+    )
+    items = item_order[rng.choice(scale.num_items, size=len(queries), p=popularity)]
+    interactions = pd.DataFrame({"user_idx": queries, "item_idx": items}).drop_duplicates()
+    interactions["relevance"] = rng.integers(1, 6, len(interactions)).astype(float)
+    interactions["timestamp"] = pd.to_datetime(
+        rng.integers(1_500_000_000, 1_600_000_000, len(interactions)), unit="s"
+    )
+    return interactions.sort_values(["user_idx", "timestamp"]).reset_index(drop=True)
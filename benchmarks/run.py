@@ -0,0 +1,142 @@
+"""
+Time benchmark cases and write results as json.
+
+Model fit and predict cases run only on Spark, the in-process pandas backend of models
+is not benchmarked. Peak memory is the Python heap growth traced with ``tracemalloc``,
+memory of the JVM and of native libraries is not included.
+
+Example::
+
+    python -m benchmarks.run --scale small --repeat 5 --output results.json
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+import replay
+from benchmarks.cases import CASES, BenchmarkCase, BenchmarkData, spark_session_info
+from benchmarks.data import SCALES, Scale, generate_interactions
+
+
+def time_case(case: BenchmarkCase, data: BenchmarkData, repeat: int, warmup: int) -> Dict[str, Any]:
+    """
+    Run a case ``warmup + repeat`` times and measure the last ``repeat`` runs.
+    Peak memory is the largest Python heap growth during a run measured with ``tracemalloc``,
+    memory of the JVM is not included. Tracing slows Python code down,
+    so memory is measured by a separate run after the timed ones.
+
+    :param case: benchmark case
+    :param data: shared inputs
+    :param repeat: number of measured runs
+    :param warmup: number of runs before measurement
+    :return: timings in seconds and peak memory in megabytes
+    """
+    run = case.prepare(data)
+    for _ in range(warmup):
+        run()
+
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        run()
+        peak_memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "name": case.name,
+        "backend": case.backend,
+        "median_seconds": statistics.median(timings),
+        "min_seconds": min(timings),
+        "timings_seconds": timings,
+        "peak_python_memory_mb": peak_memory / 2**20,
+    }
+
+
+def run_benchmarks(
+    scale: Scale, repeat: int = 3, warmup: int = 1, cases: Optional[List[str]] = None
+) -> Dict[str, Any]:
+    """
+    Generate interactions of the given scale and time benchmark cases on them.
+
+    :param scale: size and shape of synthetic interactions
+    :param repeat: number of measured runs of each case
+    :param warmup: number of runs of each case before measurement
+    :param cases: substrings of case ids to run, all cases are run if ``None``
+    :return: results with environment description
+    """
+    interactions = generate_interactions(scale)
+    data = BenchmarkData(interactions)
+    selected = [
+        case for case in CASES if cases is None or any(pattern in case.case_id for pattern in cases)
+    ]
+
+    results = {}
+    for case in selected:
+        results[case.case_id] = time_case(case, data, repeat, warmup)
+        print(f"{case.case_id}: {results[case.case_id]['median_seconds']:.3f}s", file=sys.stderr)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "scale": scale.as_dict(),
+            "num_interactions": len(interactions),
+            "repeat": repeat,
+            "warmup": warmup,
+            "replay_version": getattr(replay, "__version__", None),
+            "python_version": platform.python_version(),
+            "numpy_version": np.__version__,
+            "pandas_version": pd.__version__,
+            "platform": platform.platform(),
+            **spark_session_info(),
+        },
+        "results": results,
+    }
+
+
+def main(args: Optional[List[str]] = None) -> None:
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="predefined log size")
+    parser.add_argument("--num-queries", type=int, help="override number of queries of the scale")
+    parser.add_argument("--num-items", type=int, help="override number of items of the scale")
+    parser.add_argument("--density", type=float, help="override density of the scale")
+    parser.add_argument("--skew", type=float, help="override item popularity skew of the scale")
+    parser.add_argument("--seed", type=int, help="override random seed of the scale")
+    parser.add_argument("--repeat", type=int, default=3, help="number of measured runs of each case")
+    parser.add_argument("--warmup", type=int, default=1, help="number of runs before measurement")
+    parser.add_argument("--case", action="append", help="run only cases containing this substring")
+    parser.add_argument("--output", default="-", help="json file to write results to, stdout by default")
+    parsed = parser.parse_args(args)
+
+    overrides = {
+        name: getattr(parsed, name)
+        for name in ("num_queries", "num_items", "density", "skew", "seed")
+        if getattr(parsed, name) is not None
+    }
+    scale = Scale(**{**SCALES[parsed.scale].as_dict(), **overrides})
+    report = run_benchmarks(scale, repeat=parsed.repeat, warmup=parsed.warmup, cases=parsed.case)
+
+    if parsed.output == "-":
+        json.dump(report, sys.stdout, indent=2)
+    else:
+        with open(parsed.output, "w", encoding="utf-8") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
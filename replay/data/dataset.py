@@ -47,6 +47,7 @@ class Dataset:
         self._interactions = interactions
         self._query_features = query_features
         self._item_features = item_features
+        self._seen_items: Optional[SparkDataFrame] = None
 
         self.is_pandas = isinstance(interactions, PandasDataFrame)
         self.is_spark = isinstance(interactions, SparkDataFrame)
@@ -204,6 +205,9 @@ class Dataset:
                     self.item_features.unpersist(blocking)
                 if self.query_features is not None:
                     self.query_features.unpersist(blocking)
+                if self._seen_items is not None:
+                    self._seen_items.unpersist(blocking)
+                    self._seen_items = None
 
         def cache(self) -> None:
             """
@@ -217,6 +221,36 @@ class Dataset:
                 if self.query_features is not None:
                     self.query_features.cache()
 
+        def get_seen_items(self, queries: Optional[SparkDataFrame] = None) -> SparkDataFrame:
+            """
+            Items seen by queries in interactions as sorted arrays.
+
+            If ``queries`` are given, the items are aggregated only for them,
+            the dataframe is not cached and is not kept by the dataset.
+            Otherwise the items of all queries are partitioned by query, cached
+            and reused by further calls until ``unpersist`` of the dataset.
+
+            :param queries: dataframe with the query column to get the seen items for.
+                Default: ``None``.
+            :returns: dataframe ``[query_id, seen_items]``.
+            """
+            query_column = self.feature_schema.query_id_column
+            item_column = self.feature_schema.item_id_column
+            if queries is not None:
+                return (
+                    self.interactions.join(queries.select(query_column), on=query_column, how="left_semi")
+                    .groupBy(query_column)
+                    .agg(F.array_sort(F.collect_set(item_column)).alias("seen_items"))
+                )
+            if self._seen_items is None:
+                self._seen_items = (
+                    self.interactions.groupBy(query_column)
+                    .agg(F.array_sort(F.collect_set(item_column)).alias("seen_items"))
+                    .repartition(query_column)
+                    .cache()
+                )
+            return self._seen_items
+
     def subset(self, features_to_keep: Iterable[str]) -> Dataset:
         """
         Returns subset of features. Keeps query and item IDs even if
@@ -1,4 +1,4 @@
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, Optional, Tuple, Union
 
 import numba as nb
 import numpy as np
@@ -94,12 +94,16 @@ class ADMMSLIM(NeighbourRec):
         "lambda_2": {"type": "loguniform", "args": [1e-9, 5000]},
     }
 
+    # maximal number of elements in the blocks of factorized neighbour matrices
+    block_size: int = 2**24
+
     def __init__(
         self,
         lambda_1: float = 5,
         lambda_2: float = 5000,
         seed: Optional[int] = None,
         index_builder: Optional[IndexBuilder] = None,
+        num_neighbours: Optional[int] = None,
     ):
         """
         :param lambda_1: l1 regularization term
@@ -107,13 +111,21 @@ class ADMMSLIM(NeighbourRec):
         :param seed: random seed
         :param index_builder: `IndexBuilder` instance that adds ANN functionality.
             If not set, then ann will not be used.
+        :param num_neighbours: maximal number of candidate neighbours for each item,
+            items with the largest co-occurrence are taken.
+            If set, only similarities to candidates are fitted,
+            so memory is proportional to ``items * num_neighbours^2`` instead of ``items^2``.
+            If ``None``, dense similarity matrix is fitted.
         """
         if lambda_1 < 0 or lambda_2 <= 0:
             raise ValueError("Invalid regularization parameters")
+        if num_neighbours is not None and num_neighbours <= 0:
+            raise ValueError("num_neighbours must be positive")
         self.lambda_1 = lambda_1
         self.lambda_2 = lambda_2
         self.rho = lambda_2
         self.seed = seed
+        self.num_neighbours = num_neighbours
         if isinstance(index_builder, (IndexBuilder, type(None))):
             self.index_builder = index_builder
         elif isinstance(index_builder, dict):
@@ -125,6 +137,7 @@ class ADMMSLIM(NeighbourRec):
             "lambda_1": self.lambda_1,
             "lambda_2": self.lambda_2,
             "seed": self.seed,
+            "num_neighbours": self.num_neighbours,
         }
 
     # pylint: disable=too-many-locals
@@ -144,13 +157,35 @@ class ADMMSLIM(NeighbourRec):
             shape=(self._user_dim, self._item_dim),
         )
         self.logger.debug("Gram matrix")
-        xtx = (interactions_matrix.T @ interactions_matrix).toarray()
-        self.logger.debug("Inverse matrix")
-        inv_matrix = np.linalg.inv(
-            xtx + (self.lambda_2 + self.rho) * np.eye(self._item_dim)
+        if self.num_neighbours is not None:
+            mat_c_sparse = self._fit_sparse((interactions_matrix.T @ interactions_matrix).tocsr())
+        else:
+            mat_c_sparse = self._fit_dense((interactions_matrix.T @ interactions_matrix).toarray())
+        mat_c_pd = pd.DataFrame(
+            {
+                "item_idx_one": mat_c_sparse.row.astype(np.int32),
+                "item_idx_two": mat_c_sparse.col.astype(np.int32),
+                "similarity": mat_c_sparse.data,
+            }
+        )
+        self.similarity = State().session.createDataFrame(
+            mat_c_pd,
+            schema="item_idx_one int, item_idx_two int, similarity double",
         )
+        self.similarity.cache().count()
+
+    def _fit_dense(self, xtx: np.ndarray) -> coo_matrix:
+        """ADMM iterations over dense items x items matrices"""
+
+        def invert() -> Tuple[np.ndarray, np.ndarray]:
+            self.logger.debug("Inverse matrix for rho %s", self.rho)
+            inv_matrix = np.linalg.inv(
+                xtx + (self.lambda_2 + self.rho) * np.eye(self._item_dim)
+            )
+            return inv_matrix, inv_matrix @ xtx
+
+        inv_matrix, p_x = invert()
         self.logger.debug("Main calculations")
-        p_x = inv_matrix @ xtx
         mat_b, mat_c, mat_gamma = self._init_matrix(self._item_dim)
         r_primal = np.linalg.norm(mat_b - mat_c)
         r_dual = np.linalg.norm(self.rho * mat_c)
@@ -160,6 +195,7 @@ class ADMMSLIM(NeighbourRec):
             r_primal > eps_primal or r_dual > eps_dual
         ) and iteration < self.max_iteration:
             iteration += 1
+            rho = self.rho
             (
                 mat_b,
                 mat_c,
@@ -183,6 +219,9 @@ class ADMMSLIM(NeighbourRec):
                 self.threshold,
                 self.multiplicator,
             )
+            if self.rho != rho:
+                # the inverse matrix depends on rho
+                inv_matrix, p_x = invert()
             result_message = (
                 f"Iteration: {iteration}. primal gap: "
                 f"{r_primal - eps_primal:.5}; dual gap: "
@@ -190,27 +229,133 @@ class ADMMSLIM(NeighbourRec):
             )
             self.logger.debug(result_message)
 
-        mat_c_sparse = coo_matrix(mat_c)
-        mat_c_pd = pd.DataFrame(
-            {
-                "item_idx_one": mat_c_sparse.row.astype(np.int32),
-                "item_idx_two": mat_c_sparse.col.astype(np.int32),
-                "similarity": mat_c_sparse.data,
-            }
-        )
-        self.similarity = State().session.createDataFrame(
-            mat_c_pd,
-            schema="item_idx_one int, item_idx_two int, similarity double",
+        return coo_matrix(mat_c)
+
+    def _fit_sparse(self, xtx: csr_matrix) -> coo_matrix:
+        """
+        ADMM iterations over similarities of items to their candidate neighbours.
+
+        Column ``j`` of similarity matrix is fitted only for candidates ``S_j``,
+        so its update solves ``(XtX[S_j, S_j] + (lambda_2 + rho) I) b = XtX[S_j, j] + rho c - gamma``.
+        Cholesky factors of these systems are reused in the iterations
+        and calculated again only when ``rho`` is rescaled.
+        Columns are processed in blocks of ``block_size`` elements of factors.
+        """
+        neighbours = self._get_neighbours(xtx)
+        items_count, num_neighbours = neighbours.shape
+        is_neighbour = neighbours >= 0
+        neighbour_idx = np.where(is_neighbour, neighbours, 0)
+        columns = np.broadcast_to(np.arange(items_count)[:, None], neighbours.shape)
+        block = max(1, self.block_size // num_neighbours**2)
+        blocks = [slice(start, start + block) for start in range(0, items_count, block)]
+
+        xtx_column = np.asarray(xtx[neighbour_idx.ravel(), columns.ravel()]).reshape(neighbours.shape) * is_neighbour
+        inv_factors = np.empty((items_count, num_neighbours, num_neighbours))
+        p_x = np.empty(neighbours.shape)
+
+        def factorize() -> None:
+            self.logger.debug("Cholesky factors for rho %s", self.rho)
+            for rows in blocks:
+                inv_factors[rows] = self._get_inv_factors(xtx, neighbour_idx[rows], is_neighbour[rows])
+                # p_x column is the solution for zero rho * c - gamma
+                p_x[rows] = _solve_factorized(inv_factors[rows], xtx_column[rows])
+
+        factorize()
+
+        self.logger.debug("Main calculations")
+        mat_b, mat_c, mat_gamma = (matrix * is_neighbour for matrix in self._init_matrix(neighbours.shape))
+        r_primal = np.linalg.norm(mat_b - mat_c)
+        r_dual = np.linalg.norm(self.rho * mat_c)
+        eps_primal, eps_dual = 0.0, 0.0
+        iteration = 0
+        while (
+            r_primal > eps_primal or r_dual > eps_dual
+        ) and iteration < self.max_iteration:
+            iteration += 1
+            for rows in blocks:
+                mat_b[rows] = p_x[rows] + _solve_factorized(
+                    inv_factors[rows], self.rho * mat_c[rows] - mat_gamma[rows]
+                )
+            mat_b *= is_neighbour
+
+            prev_mat_c = mat_c
+            mat_c = mat_b + mat_gamma / self.rho
+            coef = self.lambda_1 / self.rho
+            mat_c = np.maximum(mat_c - coef, 0.0) - np.maximum(-mat_c - coef, 0.0)
+            mat_gamma += self.rho * (mat_b - mat_c)
+
+            r_primal = np.linalg.norm(mat_b - mat_c)
+            r_dual = np.linalg.norm(-self.rho * (mat_c - prev_mat_c))
+            eps_primal = self.eps_abs * items_count + self.eps_rel * max(
+                np.linalg.norm(mat_b), np.linalg.norm(mat_c)
+            )
+            eps_dual = self.eps_abs * items_count + self.eps_rel * np.linalg.norm(mat_gamma)
+            if r_primal > self.threshold * r_dual:
+                self.rho *= self.multiplicator
+                factorize()
+            elif self.threshold * r_primal < r_dual:
+                self.rho /= self.multiplicator
+                factorize()
+            result_message = (
+                f"Iteration: {iteration}. primal gap: "
+                f"{r_primal - eps_primal:.5}; dual gap: "
+                f" {r_dual - eps_dual:.5}; rho: {self.rho}"
+            )
+            self.logger.debug(result_message)
+
+        is_similar = is_neighbour & (mat_c != 0)
+        return coo_matrix(
+            (mat_c[is_similar], (neighbours[is_similar], columns[is_similar])),
+            shape=(items_count, items_count),
         )
-        self.similarity.cache().count()
+
+    def _get_neighbours(self, xtx: csr_matrix) -> np.ndarray:
+        """
+        Candidate neighbours of each item with the largest co-occurrence,
+        rows are padded with ``-1``.
+        """
+        co_occurrence = xtx.tocoo()
+        not_diagonal = (co_occurrence.row != co_occurrence.col) & (co_occurrence.data != 0)
+        rows, cols = co_occurrence.col[not_diagonal], co_occurrence.row[not_diagonal]
+        values = np.abs(co_occurrence.data[not_diagonal])
+        order = np.lexsort((cols, -values, rows))
+        rows, cols = rows[order], cols[order]
+        row_starts = np.searchsorted(rows, np.arange(xtx.shape[0]))
+        positions = np.arange(len(rows)) - row_starts[rows]
+        is_kept = positions < self.num_neighbours
+        num_neighbours = max(int(np.bincount(rows[is_kept], minlength=1).max(initial=0)), 1)
+        neighbours = np.full((xtx.shape[0], num_neighbours), -1)
+        neighbours[rows[is_kept], positions[is_kept]] = cols[is_kept]
+        return neighbours
+
+    def _get_inv_factors(self, xtx: csr_matrix, neighbour_idx: np.ndarray, is_neighbour: np.ndarray) -> np.ndarray:
+        """
+        Inverse Cholesky factors ``L^-1`` of ``XtX[S_j, S_j] + (lambda_2 + rho) I`` for a block of columns,
+        padding neighbours are replaced with identity.
+        """
+        num_neighbours = neighbour_idx.shape[1]
+        left = np.repeat(neighbour_idx, num_neighbours, axis=1).ravel()
+        right = np.tile(neighbour_idx, (1, num_neighbours)).ravel()
+        mask = is_neighbour[:, :, None] & is_neighbour[:, None, :]
+        matrices = np.asarray(xtx[left, right]).reshape(mask.shape) * mask
+        matrices += (self.lambda_2 + self.rho) * np.eye(num_neighbours)
+        matrices[~is_neighbour] = 0
+        matrices[np.nonzero(~is_neighbour) + (np.nonzero(~is_neighbour)[1],)] = 1
+        return np.linalg.inv(np.linalg.cholesky(matrices))
 
     def _init_matrix(
-        self, size: int
+        self, size: Union[int, Tuple[int, int]]
     ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
         """Matrix initialization"""
         if self.seed is not None:
             np.random.seed(self.seed)
-        mat_b = np.random.rand(size, size)  # type: ignore
-        mat_c = np.random.rand(size, size)  # type: ignore
-        mat_gamma = np.random.rand(size, size)  # type: ignore
+        shape = (size, size) if isinstance(size, int) else size
+        mat_b = np.random.rand(*shape)  # type: ignore
+        mat_c = np.random.rand(*shape)  # type: ignore
+        mat_gamma = np.random.rand(*shape)  # type: ignore
         return mat_b, mat_c, mat_gamma
+
+
+def _solve_factorized(inv_factors: np.ndarray, rhs: np.ndarray) -> np.ndarray:
+    """Solve systems ``A x = rhs`` for a batch of ``A = L L^T`` given ``L^-1``"""
+    return np.einsum("bji,bj->bi", inv_factors, np.einsum("bij,bj->bi", inv_factors, rhs))
@@ -1,5 +1,5 @@
 from abc import abstractmethod
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional
 
 import numpy as np
 import torch
@@ -14,7 +14,90 @@ from replay.experimental.utils.session_handler import State
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
 
 if PYSPARK_AVAILABLE:
+    from pyspark.broadcast import Broadcast
     from pyspark.sql import functions as sf
+    from pyspark.sql import types as st
+
+
+# pylint: disable=too-many-arguments
+def predict_top_k_by_query_batches(
+    history: SparkDataFrame,
+    model_broadcast: "Broadcast",
+    score_fn: Callable[[nn.Module, np.ndarray, List[np.ndarray], np.ndarray], torch.Tensor],
+    items_np: np.ndarray,
+    k: int,
+    filter_seen_items: bool,
+    batch_size: int,
+) -> SparkDataFrame:
+    """
+    Score queries by batches with a torch model and return top-k items for each query.
+
+    The model is broadcasted, so it is deserialized once per Python worker.
+    The broadcast is kept until the returned DataFrame is computed, so it is released by the caller.
+    Each batch of ``batch_size`` queries is scored with a single call of ``score_fn``,
+    seen items are masked and top-k is selected in torch.
+
+    :param history: DataFrame ``[user_idx, item_idx_history]``
+    :param model_broadcast: broadcasted trained model
+    :param score_fn: function of ``(model, user_idx, item_idx_history, items_np)``
+        returning relevance tensor of shape ``(len(user_idx), len(items_np))``
+    :param items_np: items available for recommendations
+    :param k: length of recommendation list
+    :param filter_seen_items: flag to remove items from ``item_idx_history`` from recommendations
+    :param batch_size: number of queries scored per forward pass
+    :return: DataFrame ``[user_idx , item_idx , relevance]``
+    """
+    items_np = np.asarray(items_np)
+    cnt = min(k, len(items_np))
+    item_positions = np.full(items_np.max(initial=-1) + 1, -1, dtype=np.int64)
+    item_positions[items_np] = np.arange(len(items_np))
+
+    def score_batch(user_idx: np.ndarray, item_history: List[np.ndarray]) -> PandasDataFrame:
+        model = model_broadcast.value
+        model.eval()
+        with torch.no_grad():
+            scores = score_fn(model, user_idx, item_history, items_np).float()
+            if filter_seen_items:
+                lengths = np.array([len(items) for items in item_history], dtype=np.int64)
+                seen = np.concatenate(item_history + [np.empty(0, dtype=np.int64)]).astype(np.int64)
+                rows = np.repeat(np.arange(len(user_idx)), lengths)
+                is_known = seen < len(item_positions)
+                columns = item_positions[seen[is_known]]
+                rows = rows[is_known][columns >= 0]
+                columns = columns[columns >= 0]
+                scores[torch.from_numpy(rows), torch.from_numpy(columns)] = -np.inf
+            relevance, positions = torch.topk(scores, cnt, dim=1)
+        relevance = relevance.numpy().ravel()
+        is_available = np.isfinite(relevance)
+        return PandasDataFrame(
+            {
+                "user_idx": np.repeat(user_idx, cnt)[is_available],
+                "item_idx": items_np[positions.numpy().ravel()][is_available],
+                "relevance": relevance[is_available].astype(np.float64),
+            }
+        )
+
+    def batch_map(iterator: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+        for pandas_df in iterator:
+            for start in range(0, len(pandas_df), batch_size):
+                batch = pandas_df.iloc[start : start + batch_size]
+                yield score_batch(
+                    batch["user_idx"].to_numpy(),
+                    [np.asarray(items, dtype=np.int64) for items in batch["item_idx_history"]],
+                )
+
+    rec_schema = get_schema(
+        query_column="user_idx",
+        item_column="item_idx",
+        rating_column="relevance",
+        has_timestamp=False,
+    )
+    return history.select(
+        "user_idx",
+        sf.coalesce(
+            "item_idx_history", sf.array().cast(st.ArrayType(st.IntegerType()))
+        ).alias("item_idx_history"),
+    ).mapInPandas(batch_map, rec_schema)
 
 
 class TorchRecommender(Recommender):
@@ -22,6 +105,9 @@ class TorchRecommender(Recommender):
 
     model: Any
     device: torch.device
+    # number of queries scored in a single forward pass during ``predict``
+    predict_batch_size: int = 1024
+    _model_broadcast: Optional["Broadcast"] = None
 
     def __init__(self):
         self.logger.info(
@@ -131,30 +217,33 @@ class TorchRecommender(Recommender):
     ) -> SparkDataFrame:
         items_consider_in_pred = items.toPandas()["item_idx"].values
         items_count = self._item_dim
-        model = self.model.cpu()
-        agg_fn = self._predict_by_user
+        score_fn = self._predict_by_user_batch
 
-        def grouped_map(pandas_df: PandasDataFrame) -> PandasDataFrame:
-            return agg_fn(
-                pandas_df, model, items_consider_in_pred, k, items_count
-            )[["user_idx", "item_idx", "relevance"]]
+        def batch_score_fn(
+            model: nn.Module,
+            user_idx: np.ndarray,
+            item_history: List[np.ndarray],
+            items_np: np.ndarray,
+        ) -> torch.Tensor:
+            return score_fn(model, user_idx, item_history, items_np, items_count)
 
         self.logger.debug("Predict started")
         # do not apply map on cold users for MultVAE predict
         join_type = "inner" if str(self) == "MultVAE" else "left"
-        rec_schema = get_schema(
-            query_column="user_idx",
-            item_column="item_idx",
-            rating_column="relevance",
-            has_timestamp=False,
-        )
-        recs = (
+        history = (
             users.join(log, how=join_type, on="user_idx")
-            .select("user_idx", "item_idx")
             .groupby("user_idx")
-            .applyInPandas(grouped_map, rec_schema)
+            .agg(sf.collect_list("item_idx").alias("item_idx_history"))
+        )
+        return predict_top_k_by_query_batches(
+            history=history,
+            model_broadcast=self._broadcast_model(),
+            score_fn=batch_score_fn,
+            items_np=items_consider_in_pred,
+            k=k,
+            filter_seen_items=filter_seen_items,
+            batch_size=self._get_predict_batch_size(len(items_consider_in_pred)),
         )
-        return recs
 
     def _predict_pairs(
         self,
@@ -198,22 +287,22 @@ class TorchRecommender(Recommender):
 
     @staticmethod
     @abstractmethod
-    def _predict_by_user(
-        pandas_df: PandasDataFrame,
+    def _predict_by_user_batch(
         model: nn.Module,
+        user_idx: np.ndarray,
+        item_history: List[np.ndarray],
         items_np: np.ndarray,
-        k: int,
         item_count: int,
-    ) -> PandasDataFrame:
+    ) -> torch.Tensor:
         """
-        Calculate predictions.
+        Calculate relevance for a batch of users in a single forward pass.
 
-        :param pandas_df: DataFrame with user-item interactions ``[user_idx, item_idx]``
-        :param model: trained model
+        :param model: trained model in evaluation mode
+        :param user_idx: users of the batch
+        :param item_history: items interacted by each user of the batch
         :param items_np: items available for recommendations
-        :param k: length of recommendation list
         :param item_count: total number of items
-        :return: DataFrame ``[user_idx , item_idx , relevance]``
+        :return: relevance tensor of shape ``(len(user_idx), len(items_np))``
         """
 
     @staticmethod
@@ -233,6 +322,34 @@ class TorchRecommender(Recommender):
         :return: DataFrame ``[user_idx , item_idx , relevance]``
         """
 
+    def _get_predict_batch_size(self, num_items: int) -> int:
+        """
+        Number of queries scored in a single forward pass.
+
+        :param num_items: number of items scored for every query
+        :return: batch size
+        """
+        return self.predict_batch_size
+
+    def _broadcast_model(self) -> "Broadcast":
+        self._unpersist_model_broadcast()
+        self._model_broadcast = State().session.sparkContext.broadcast(self.model.cpu())
+        return self._model_broadcast
+
+    def _unpersist_model_broadcast(self) -> None:
+        if self._model_broadcast is not None:
+            self._model_broadcast.unpersist()
+            self._model_broadcast = None
+
+    def _clear_cache(self):
+        self._unpersist_model_broadcast()
+
+    def _predict_wrap(self, *args, **kwargs) -> Optional[SparkDataFrame]:
+        output = super()._predict_wrap(*args, **kwargs)
+        # recommendations are materialized, workers fetch the model from the driver again if they are recomputed
+        self._unpersist_model_broadcast()
+        return output
+
     def load_model(self, path: str) -> None:
         """
         Load model from file
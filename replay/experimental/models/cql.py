@@ -1,11 +1,12 @@
 """
 Using CQL implementation from `d3rlpy` package.
 """
+import hashlib
 import io
 import logging
 import tempfile
 import timeit
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
 
 import d3rlpy.algos.cql as CQL_d3rlpy
 import numpy as np
@@ -31,6 +32,9 @@ if PYSPARK_AVAILABLE:
 
 timer = timeit.default_timer
 
+# policies deserialized by the current python worker, by the hash of serialized policy
+_policies: Dict[str, "torch.jit.ScriptModule"] = {}
+
 
 class CQL(Recommender):
     """Conservative Q-Learning algorithm.
@@ -258,23 +262,29 @@ class CQL(Recommender):
         mdp_dataset: MDPDataset = self.mdp_dataset_builder.build(log)
         self.model.fit(mdp_dataset, n_epochs=self.n_epochs)
 
-    @staticmethod
-    def _predict_pairs_inner(
-        model: bytes,
-        user_idx: int,
-        items: np.ndarray,
-    ) -> PandasDataFrame:
-        user_item_pairs = PandasDataFrame({
-            'user_idx': np.repeat(user_idx, len(items)),
-            'item_idx': items
-        })
-
-        # deserialize model policy and predict items relevance for the user
-        policy = CQL._deserialize_policy(model)
-        items_batch = user_item_pairs.to_numpy()
-        user_item_pairs['relevance'] = CQL._predict_relevance_with_policy(policy, items_batch)
-
-        return user_item_pairs
+    def _score_pairs(self, pairs: SparkDataFrame) -> SparkDataFrame:
+        """
+        Score user-item pairs with the policy in batches of Arrow records,
+        policy is deserialized once per python worker.
+        """
+        policy_bytes = self._serialize_policy()
+        policy_key = hashlib.sha1(policy_bytes).hexdigest()
+
+        def score(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            policy = CQL._get_policy(policy_key, policy_bytes)
+            for batch in batches:
+                batch["relevance"] = CQL._predict_relevance_with_policy(
+                    policy, batch[["user_idx", "item_idx"]].to_numpy()
+                )
+                yield batch
+
+        rec_schema = get_schema(
+            query_column="user_idx",
+            item_column="item_idx",
+            rating_column="relevance",
+            has_timestamp=False,
+        )
+        return pairs.select("user_idx", "item_idx").mapInPandas(score, rec_schema)
 
     # pylint: disable=too-many-arguments
     def _predict(
@@ -287,26 +297,10 @@ class CQL(Recommender):
         item_features: Optional[SparkDataFrame] = None,
         filter_seen_items: bool = True,
     ) -> SparkDataFrame:
-        available_items = items.toPandas()["item_idx"].values
-        policy_bytes = self._serialize_policy()
-
-        def grouped_map(log_slice: PandasDataFrame) -> PandasDataFrame:
-            return CQL._predict_pairs_inner(
-                model=policy_bytes,
-                user_idx=log_slice["user_idx"][0],
-                items=available_items,
-            )[["user_idx", "item_idx", "relevance"]]
-
         # predict relevance for all available items and return them as is;
         # `filter_seen_items` and top `k` params are ignored
         self.logger.debug("Predict started")
-        rec_schema = get_schema(
-            query_column="user_idx",
-            item_column="item_idx",
-            rating_column="relevance",
-            has_timestamp=False,
-        )
-        return users.groupby("user_idx").applyInPandas(grouped_map, rec_schema)
+        return self._score_pairs(users.select("user_idx").crossJoin(items.select("item_idx")))
 
     def _predict_pairs(
         self,
@@ -315,29 +309,9 @@ class CQL(Recommender):
         user_features: Optional[SparkDataFrame] = None,
         item_features: Optional[SparkDataFrame] = None,
     ) -> SparkDataFrame:
-        policy_bytes = self._serialize_policy()
-
-        def grouped_map(user_log: PandasDataFrame) -> PandasDataFrame:
-            return CQL._predict_pairs_inner(
-                model=policy_bytes,
-                user_idx=user_log["user_idx"][0],
-                items=np.array(user_log["item_idx_to_pred"][0]),
-            )[["user_idx", "item_idx", "relevance"]]
-
         self.logger.debug("Calculate relevance for user-item pairs")
-        rec_schema = get_schema(
-            query_column="user_idx",
-            item_column="item_idx",
-            rating_column="relevance",
-            has_timestamp=False,
-        )
-        return (
-            pairs
-            .groupBy("user_idx")
-            .agg(sf.collect_list("item_idx").alias("item_idx_to_pred"))
-            .join(log.select("user_idx").distinct(), on="user_idx", how="inner")
-            .groupby("user_idx")
-            .applyInPandas(grouped_map, rec_schema)
+        return self._score_pairs(
+            pairs.join(log.select("user_idx").distinct(), on="user_idx", how="inner")
         )
 
     @property
@@ -391,6 +365,14 @@ class CQL(Recommender):
             with open(tmp.name, 'rb') as policy_file:
                 return policy_file.read()
 
+    @staticmethod
+    def _get_policy(policy_key: str, policy: bytes) -> torch.jit.ScriptModule:
+        if policy_key not in _policies:
+            # keep only the latest policy to not accumulate models in long-living workers
+            _policies.clear()
+            _policies[policy_key] = CQL._deserialize_policy(policy)
+        return _policies[policy_key]
+
     @staticmethod
     def _deserialize_policy(policy: bytes) -> torch.jit.ScriptModule:
         with io.BytesIO(policy) as buffer:
@@ -463,10 +445,13 @@ class MdpDatasetBuilder:
         terminal_condition = sf.row_number().over(
             Window
             .partitionBy('user_idx')
-            .orderBy(sf.desc('timestamp'))
+            .orderBy(sf.desc('timestamp'), sf.desc('item_idx'))
         ) == 1
 
-        user_logs = (
+        # range partitioning keeps every user episode within a partition and partitions
+        # in the order of users, so partitions are packed to numpy arrays on executors
+        # and concatenated on the driver in the order of transitions
+        transitions = (
             log
             .withColumn("reward", sf.when(reward_condition, sf.lit(1)).otherwise(sf.lit(0)))
             .withColumn("terminal", sf.when(terminal_condition, sf.lit(1)).otherwise(sf.lit(0)))
@@ -474,15 +459,19 @@ class MdpDatasetBuilder:
                 "action",
                 sf.col("relevance").cast("float") + sf.randn() * self.action_randomization_scale
             )
-            .orderBy(['user_idx', 'timestamp'], ascending=True)
-            .select(['user_idx', 'item_idx', 'action', 'reward', 'terminal'])
-            .toPandas()
+            .select(['user_idx', 'item_idx', 'timestamp', 'action', 'reward', 'terminal'])
+            .repartitionByRange('user_idx')
+            .sortWithinPartitions(['user_idx', 'timestamp', 'item_idx'])
+            .drop('timestamp')
+            .mapInPandas(_pack_transitions, "transitions binary")
+            .collect()
         )
+        arrays = [np.load(io.BytesIO(row["transitions"])) for row in transitions]
         train_dataset = MDPDataset(
-            observations=np.array(user_logs[['user_idx', 'item_idx']]),
-            actions=user_logs['action'].to_numpy()[:, None],
-            rewards=user_logs['reward'].to_numpy(),
-            terminals=user_logs['terminal'].to_numpy()
+            **{
+                name: np.concatenate([batch[name] for batch in arrays])
+                for name in ["observations", "actions", "rewards", "terminals"]
+            }
         )
 
         prepare_time = timer() - start_time
@@ -495,3 +484,17 @@ class MdpDatasetBuilder:
             "top_k": self.top_k,
             "action_randomization_scale": self.action_randomization_scale,
         }
+
+
+def _pack_transitions(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+    """Pack batches of transitions to serialized numpy arrays of MDP dataset"""
+    for batch in batches:
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            observations=batch[["user_idx", "item_idx"]].to_numpy(),
+            actions=batch["action"].to_numpy()[:, None],
+            rewards=batch["reward"].to_numpy(),
+            terminals=batch["terminal"].to_numpy(),
+        )
+        yield PandasDataFrame({"transitions": [buffer.getvalue()]})
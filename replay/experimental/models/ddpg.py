@@ -1,7 +1,6 @@
 # pylint: disable=too-many-lines
-from collections import defaultdict
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 import scipy.sparse as sp
@@ -12,11 +11,13 @@ from torch import nn
 from torch.distributions.gamma import Gamma
 
 from replay.data import get_schema
-from replay.experimental.models.base_torch_rec import Recommender
+from replay.experimental.models.base_torch_rec import Recommender, predict_top_k_by_query_batches
+from replay.experimental.utils.session_handler import State
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
 from replay.utils.spark_utils import convert2spark
 
 if PYSPARK_AVAILABLE:
+    from pyspark.broadcast import Broadcast
     from pyspark.sql import functions as sf
 
 
@@ -33,11 +34,13 @@ class ReplayBuffer:
     In this implementation we compute state using embedding of user
     and embeddings of `memory_size` latest relevant items.
     Thereby in this ReplayBuffer we store (user, memory) instead of state.
+    Transitions are kept in preallocated tensors used as a ring buffer.
     """
 
     # pylint: disable=too-many-arguments
     def __init__(self, device, capacity, memory_size, embedding_dim):
         self.capacity = capacity
+        self.device = device
 
         self.buffer = {
             "user": torch.zeros((capacity,), device=device),
@@ -64,48 +67,36 @@ class ReplayBuffer:
         done,
         sample_weight,
     ):
-        """Add transition to buffer."""
+        """Add transition to buffer, the oldest transitions are overwritten when buffer is full."""
 
         batch_size = user.shape[0]
+        indices = (
+            torch.arange(self.pos, self.pos + batch_size, device=self.device)
+            % self.capacity
+        )
 
-        self.buffer["user"][self.pos : self.pos + batch_size] = user
-        self.buffer["memory"][self.pos : self.pos + batch_size] = memory
-        self.buffer["action"][self.pos : self.pos + batch_size] = action
-        self.buffer["reward"][self.pos : self.pos + batch_size] = reward
-        self.buffer["next_user"][self.pos : self.pos + batch_size] = next_user
-        self.buffer["next_memory"][
-            self.pos : self.pos + batch_size
-        ] = next_memory
-        self.buffer["done"][self.pos : self.pos + batch_size] = done
-        self.buffer["sample_weight"][
-            self.pos : self.pos + batch_size
-        ] = sample_weight
+        self.buffer["user"][indices] = user
+        self.buffer["memory"][indices] = memory
+        self.buffer["action"][indices] = action
+        self.buffer["reward"][indices] = reward
+        self.buffer["next_user"][indices] = next_user
+        self.buffer["next_memory"][indices] = next_memory
+        self.buffer["done"][indices] = done
+        self.buffer["sample_weight"][indices] = sample_weight
 
         new_pos = self.pos + batch_size
         if new_pos >= self.capacity:
             self.is_filled = True
         self.pos = new_pos % self.capacity
 
-    # pylint: disable=too-many-locals
     def sample(self, batch_size):
         """Sample transition from buffer."""
-        current_buffer_len = len(self)
-
-        indices = np.random.choice(current_buffer_len, batch_size)
+        indices = torch.randint(len(self), (batch_size,), device=self.device)
 
-        return {
-            "user": self.buffer["user"][indices],
-            "memory": self.buffer["memory"][indices],
-            "action": self.buffer["action"][indices],
-            "reward": self.buffer["reward"][indices],
-            "next_user": self.buffer["next_user"][indices],
-            "next_memory": self.buffer["next_memory"][indices],
-            "done": self.buffer["done"][indices],
-            "sample_weight": self.buffer["sample_weight"][indices],
-        }
+        return {key: value[indices] for key, value in self.buffer.items()}
 
     def __len__(self):
-        return self.capacity if self.is_filled else self.pos + 1
+        return self.capacity if self.is_filled else self.pos
 
 
 # pylint: disable=too-many-instance-attributes,too-many-arguments,not-callable
@@ -300,6 +291,61 @@ class CriticDRR(nn.Module):
         return out
 
 
+# pylint: disable=too-many-locals
+def _sample_negatives(
+    related_keys: np.ndarray,
+    num_rele: np.ndarray,
+    width: int,
+    item_count: int,
+    replace: bool,
+    max_rounds: int = 20,
+) -> np.ndarray:
+    """
+    Sample non-relevant items for a batch of users with rejection sampling.
+
+    :param related_keys: sorted keys ``row * item_count + item`` of relevant items
+    :param num_rele: number of relevant items of each user,
+        first ``num_rele`` positions of a row are left for relevant items
+    :param width: number of items in a row
+    :param item_count: items are sampled from ``[0, item_count)``
+    :param replace: whether items of a row may repeat
+    :param max_rounds: rows with rejected items left after this number of rounds
+        are sampled from the explicit list of candidates
+    :return: array of shape ``(len(num_rele), width)``
+    """
+    batch_size = len(num_rele)
+    samples = np.zeros((batch_size, width), dtype=np.int64)
+    rows, cols = np.nonzero(np.arange(width) >= num_rele.reshape(-1, 1))
+    rejected = np.ones(len(rows), dtype=bool)
+
+    for _ in range(max_rounds):
+        samples[rows[rejected], cols[rejected]] = np.random.randint(
+            item_count, size=rejected.sum()
+        )
+        keys = rows * item_count + samples[rows, cols]
+        rejected = np.isin(keys, related_keys)
+        if not replace:
+            _, first_occurrences = np.unique(keys, return_index=True)
+            is_repeated = np.ones(len(keys), dtype=bool)
+            is_repeated[first_occurrences] = False
+            rejected |= is_repeated
+        if not rejected.any():
+            return samples
+
+    for row in np.unique(rows[rejected]):
+        row_related = related_keys[
+            (related_keys >= row * item_count)
+            & (related_keys < (row + 1) * item_count)
+        ]
+        candidates = np.setdiff1d(
+            np.arange(item_count), row_related - row * item_count
+        )
+        samples[row, num_rele[row] :] = np.random.choice(
+            candidates, size=width - num_rele[row], replace=replace
+        )
+    return samples
+
+
 # pylint: disable=too-many-instance-attributes, not-callable
 class Env:
     """
@@ -313,6 +359,8 @@ class Env:
     :param memory_size: maximum number of items in memory
     :param memory: torch.tensor with users' latest relevant items
     :param matrix: sparse matrix with users-item ratings
+    :param related_indptr: CSR row offsets of users' relevant items
+    :param related_indices: CSR column indices of users' relevant items
     :param user_ids: user ids from the batch
     :param related_items: relevant items for current users
     :param nonrelated_items: non-relevant items for current users
@@ -322,7 +370,9 @@ class Env:
     :param gamma: param of Gamma distibution for sample weights
     """
 
-    matrix: np.array
+    matrix: sp.csr_matrix
+    related_indptr: np.ndarray
+    related_indices: np.ndarray
     related_items: torch.Tensor
     nonrelated_items: torch.Tensor
     available_items: torch.Tensor  # B x i
@@ -367,64 +417,58 @@ class Env:
             self.item_count = item_count
         if matrix is not None:
             self.matrix = matrix.copy()
+            related = sp.csr_matrix(self.matrix > 0)
+            related.sort_indices()
+            self.related_indptr = related.indptr.astype(np.int64)
+            self.related_indices = related.indices.astype(np.int64)
 
     def reset(self, user_ids):
         """
         :param user_id: batch of user ids
         :return: user, memory
         """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
         self.user_batch_size = len(user_ids)
 
         self.user_ids = torch.tensor(
             user_ids, dtype=torch.int64, device=self.device
         )
 
-        self.max_num_rele = max(
-            (self.matrix[user_ids] > 0).sum(1).max(), self.min_trajectory_len
-        )
-        self.available_items = torch.zeros(
-            (self.user_batch_size, 2 * self.max_num_rele),
-            dtype=torch.int64,
-            device=self.device,
-        )
-        self.available_items_mask = torch.ones_like(
-            self.available_items, device=self.device
+        starts = self.related_indptr[user_ids]
+        num_rele = self.related_indptr[user_ids + 1] - starts
+        self.max_num_rele = max(int(num_rele.max()), self.min_trajectory_len)
+
+        # positions of related items in the flat CSR indices and in the batch
+        rows = np.repeat(np.arange(self.user_batch_size), num_rele)
+        cols = np.arange(num_rele.sum()) - np.repeat(
+            np.cumsum(num_rele) - num_rele, num_rele
         )
+        related_items = self.related_indices[
+            np.repeat(starts, num_rele) + cols
+        ]
 
         # padding with non-existent items
-        self.related_items = torch.full(
-            (self.user_batch_size, self.max_num_rele),
-            -1,  # maybe define new constant
-            device=self.device,
+        related = np.full((self.user_batch_size, self.max_num_rele), -1)
+        related[rows, cols] = related_items
+        self.related_items = torch.tensor(related, device=self.device)
+
+        available_items = _sample_negatives(
+            rows * (self.item_count + 1) + related_items,
+            num_rele,
+            width=2 * self.max_num_rele,
+            item_count=self.item_count + 1,
+            replace=bool(2 * self.max_num_rele > self.item_count),
         )
+        available_items[rows, cols] = related_items
+        perm = np.argsort(np.random.random(available_items.shape), axis=1)
+        available_items = np.take_along_axis(available_items, perm, axis=1)
 
-        for idx, user_id in enumerate(user_ids):
-            user_related_items = torch.tensor(
-                np.argwhere(self.matrix[user_id] > 0)[:, 1], device=self.device
-            )
-
-            user_num_rele = len(user_related_items)
-
-            self.related_items[idx, :user_num_rele] = user_related_items
-
-            replace = bool(2 * self.max_num_rele > self.item_count)
-
-            nonrelated_items = torch.tensor(
-                np.random.choice(
-                    list(
-                        set(range(self.item_count + 1))
-                        - set(user_related_items.tolist())
-                    ),
-                    replace=replace,
-                    size=2 * self.max_num_rele - user_num_rele,
-                )
-            ).to(self.device)
-
-            self.available_items[idx, :user_num_rele] = user_related_items
-            self.available_items[idx, user_num_rele:] = nonrelated_items
-            self.available_items[self.available_items == -1] = self.item_count
-            perm = torch.randperm(self.available_items.shape[1])
-            self.available_items[idx] = self.available_items[idx, perm]
+        self.available_items = torch.tensor(
+            available_items, dtype=torch.int64, device=self.device
+        )
+        self.available_items_mask = torch.ones_like(
+            self.available_items, device=self.device
+        )
 
         return self.user_ids, self.memory[self.user_ids]
 
@@ -437,12 +481,15 @@ class Env:
             torch.arange(self.available_items.shape[0]), actions
         ]
         rewards = (global_actions.reshape(-1, 1) == self.related_items).sum(1)
-        for idx, reward in enumerate(rewards):
-            if reward:
-                user_id = self.user_ids[idx]
-                self.memory[user_id] = torch.tensor(
-                    list(self.memory[user_id][1:]) + [global_actions[idx]]
-                )
+        rewarded = rewards > 0
+        rewarded_users = self.user_ids[rewarded]
+        self.memory[rewarded_users] = torch.cat(
+            [
+                self.memory[rewarded_users, 1:],
+                global_actions[rewarded].reshape(-1, 1).to(self.memory.dtype),
+            ],
+            dim=1,
+        )
 
         self.available_items_mask[
             torch.arange(self.available_items_mask.shape[0]), actions
@@ -535,6 +582,8 @@ class DDPG(Recommender):
     """
 
     batch_size: int = 512
+    # number of users scored in a single forward pass during ``predict``
+    predict_batch_size: int = 1024
     embedding_dim: int = 8
     hidden_dim: int = 16
     value_lr: float = 1e-5
@@ -546,6 +595,7 @@ class DDPG(Recommender):
     min_value: int = -10
     max_value: int = 10
     buffer_size: int = 1000000
+    _model_broadcast: Optional["Broadcast"] = None
     _search_space = {
         "noise_sigma": {"type": "uniform", "args": [0.1, 0.6]},
         "gamma": {"type": "uniform", "args": [0.7, 1.0]},
@@ -700,6 +750,23 @@ class DDPG(Recommender):
                 }
             )
 
+    @staticmethod
+    # pylint: disable=not-callable
+    def _predict_by_user_batch(
+        model,
+        user_idx: np.ndarray,
+        item_history: List[np.ndarray],
+        items_np: np.ndarray,
+    ) -> torch.Tensor:
+        user_batch = torch.tensor(user_idx, dtype=torch.int64)
+        memory = model.environment.memory[user_batch]
+        action_emb = model(user_batch, memory)
+        items = torch.tensor(items_np, dtype=torch.int64).expand(len(user_idx), -1)
+        scores, _ = model.get_action(
+            action_emb, items, torch.full_like(items, True), True
+        )
+        return scores
+
     # pylint: disable=too-many-arguments
     def _predict(
         self,
@@ -712,29 +779,22 @@ class DDPG(Recommender):
         filter_seen_items: bool = True,
     ) -> SparkDataFrame:
         items_consider_in_pred = items.toPandas()["item_idx"].values
-        model = self.model.cpu()
-
-        def grouped_map(pandas_df: PandasDataFrame) -> PandasDataFrame:
-            return DDPG._predict_pairs_inner(
-                model=model,
-                user_idx=pandas_df["user_idx"][0],
-                items_np=items_consider_in_pred,
-            )[["user_idx", "item_idx", "relevance"]]
 
         self.logger.debug("Predict started")
-        rec_schema = get_schema(
-            query_column="user_idx",
-            item_column="item_idx",
-            rating_column="relevance",
-            has_timestamp=False,
-        )
-        recs = (
+        history = (
             users.join(log, how="left", on="user_idx")
-            .select("user_idx", "item_idx")
             .groupby("user_idx")
-            .applyInPandas(grouped_map, rec_schema)
+            .agg(sf.collect_list("item_idx").alias("item_idx_history"))
+        )
+        return predict_top_k_by_query_batches(
+            history=history,
+            model_broadcast=self._broadcast_model(),
+            score_fn=DDPG._predict_by_user_batch,
+            items_np=items_consider_in_pred,
+            k=k,
+            filter_seen_items=filter_seen_items,
+            batch_size=self.predict_batch_size,
         )
-        return recs
 
     def _predict_pairs(
         self,
@@ -778,16 +838,19 @@ class DDPG(Recommender):
         :param data: pandas DataFrame
         """
         data = data[["user_idx", "item_idx", "relevance"]]
-        train_data = data.values.tolist()
 
         user_num = data["user_idx"].max() + 1
         item_num = data["item_idx"].max() + 1
 
-        train_mat = defaultdict(float)
-        for user, item, rel in train_data:
-            train_mat[user, item] = rel
-        train_matrix = sp.dok_matrix((user_num, item_num), dtype=np.float32)
-        dict.update(train_matrix, train_mat)
+        # the last rating of duplicated pairs is kept
+        ratings = data.drop_duplicates(["user_idx", "item_idx"], keep="last")
+        train_matrix = sp.csr_matrix(
+            (
+                ratings["relevance"].to_numpy(dtype=np.float32),
+                (ratings["user_idx"].to_numpy(), ratings["item_idx"].to_numpy()),
+            ),
+            shape=(user_num, item_num),
+        )
 
         appropriate_users = data["user_idx"].unique()
 
@@ -961,6 +1024,25 @@ class DDPG(Recommender):
 
         self._save_model(self.log_dir / "model_final.pt")
 
+    def _broadcast_model(self) -> "Broadcast":
+        self._unpersist_model_broadcast()
+        self._model_broadcast = State().session.sparkContext.broadcast(self.model.cpu())
+        return self._model_broadcast
+
+    def _unpersist_model_broadcast(self) -> None:
+        if self._model_broadcast is not None:
+            self._model_broadcast.unpersist()
+            self._model_broadcast = None
+
+    def _clear_cache(self):
+        self._unpersist_model_broadcast()
+
+    def _predict_wrap(self, *args, **kwargs) -> Optional[SparkDataFrame]:
+        output = super()._predict_wrap(*args, **kwargs)
+        # recommendations are materialized, workers fetch the model from the driver again if they are recomputed
+        self._unpersist_model_broadcast()
+        return output
+
     def _save_model(self, path: str) -> None:
         self.logger.debug(
             "-- Saving model to file (user_num=%d, item_num=%d)",
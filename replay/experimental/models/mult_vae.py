@@ -2,7 +2,7 @@
 MultVAE implementation
 (Variational Autoencoders for Collaborative Filtering)
 """
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import numpy as np
 import torch
@@ -307,20 +307,12 @@ class MultVAE(TorchRecommender):
         items_np_history: np.ndarray,
         items_np_to_pred: np.ndarray,
         item_count: int,
-        cnt: Optional[int] = None,
     ) -> SparkDataFrame:
         model.eval()
         with torch.no_grad():
             user_batch = torch.zeros((1, item_count))
             user_batch[0, items_np_history] = 1
             user_recs = F.softmax(model(user_batch)[0][0].detach(), dim=0)
-            if cnt is not None:
-                best_item_idx = (
-                    torch.argsort(
-                        user_recs[items_np_to_pred], descending=True
-                    )[:cnt]
-                ).numpy()
-                items_np_to_pred = items_np_to_pred[best_item_idx]
             return PandasDataFrame(
                 {
                     "user_idx": np.array(
@@ -332,21 +324,17 @@ class MultVAE(TorchRecommender):
             )
 
     @staticmethod
-    def _predict_by_user(
-        pandas_df: PandasDataFrame,
+    def _predict_by_user_batch(
         model: nn.Module,
+        user_idx: np.ndarray,
+        item_history: List[np.ndarray],
         items_np: np.ndarray,
-        k: int,
         item_count: int,
-    ) -> PandasDataFrame:
-        return MultVAE._predict_pairs_inner(
-            model=model,
-            user_idx=pandas_df["user_idx"][0],
-            items_np_history=pandas_df["item_idx"].values,
-            items_np_to_pred=items_np,
-            item_count=item_count,
-            cnt=min(len(pandas_df) + k, len(items_np)),
-        )
+    ) -> torch.Tensor:
+        user_batch = torch.zeros((len(user_idx), item_count))
+        rows = np.repeat(np.arange(len(item_history)), [len(items) for items in item_history])
+        user_batch[rows, np.concatenate(item_history + [np.empty(0, dtype=np.int64)])] = 1
+        return F.softmax(model(user_batch)[0], dim=1)[:, items_np]
 
     @staticmethod
     def _predict_by_user_pairs(
@@ -360,7 +348,6 @@ class MultVAE(TorchRecommender):
             items_np_history=np.array(pandas_df["item_idx_history"][0]),
             items_np_to_pred=np.array(pandas_df["item_idx_to_pred"][0]),
             item_count=item_count,
-            cnt=None,
         )
 
     def _load_model(self, path: str):
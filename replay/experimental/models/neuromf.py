@@ -227,6 +227,8 @@ class NeuroMF(TorchRecommender):
     n_saved: int = 2
     valid_split_size: float = 0.1
     seed: int = 42
+    # maximal number of user-item pairs passed through the model at once during ``predict``
+    predict_pairs_block_size: int = 2**20
     _search_space = {
         "embedding_gmf_dim": {"type": "int", "args": [EMBED_DIM, EMBED_DIM]},
         "embedding_mlp_dim": {"type": "int", "args": [EMBED_DIM, EMBED_DIM]},
@@ -397,7 +399,6 @@ class NeuroMF(TorchRecommender):
         model: nn.Module,
         user_idx: int,
         items_np: np.ndarray,
-        cnt: Optional[int] = None,
     ) -> SparkDataFrame:
         model.eval()
         with torch.no_grad():
@@ -409,12 +410,6 @@ class NeuroMF(TorchRecommender):
                     -1,
                 ],
             )
-            if cnt is not None:
-                best_item_idx = (
-                    torch.argsort(user_recs, descending=True)[:cnt]
-                ).numpy()
-                user_recs = user_recs[best_item_idx]
-                items_np = items_np[best_item_idx]
 
             return PandasDataFrame(
                 {
@@ -425,19 +420,20 @@ class NeuroMF(TorchRecommender):
             )
 
     @staticmethod
-    def _predict_by_user(
-        pandas_df: PandasDataFrame,
+    def _predict_by_user_batch(
         model: nn.Module,
+        user_idx: np.ndarray,
+        item_history: List[np.ndarray],
         items_np: np.ndarray,
-        k: int,
         item_count: int,
-    ) -> PandasDataFrame:
-        return NeuroMF._predict_pairs_inner(
-            model=model,
-            user_idx=pandas_df["user_idx"][0],
-            items_np=items_np,
-            cnt=min(len(pandas_df) + k, len(items_np)),
-        )
+    ) -> torch.Tensor:
+        user_batch = LongTensor(np.repeat(user_idx, len(items_np)))
+        item_batch = LongTensor(np.tile(items_np, len(user_idx)))
+        return torch.reshape(model(user_batch, item_batch), [len(user_idx), len(items_np)])
+
+    def _get_predict_batch_size(self, num_items: int) -> int:
+        # every user of a batch is paired with all items in a single forward pass
+        return max(1, min(self.predict_batch_size, self.predict_pairs_block_size // max(num_items, 1)))
 
     @staticmethod
     def _predict_by_user_pairs(
@@ -447,7 +443,6 @@ class NeuroMF(TorchRecommender):
             model=model,
             user_idx=pandas_df["user_idx"][0],
             items_np=np.array(pandas_df["item_idx_to_pred"][0]),
-            cnt=None,
         )
 
     def _load_model(self, path: str):
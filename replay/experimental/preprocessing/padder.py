@@ -1,6 +1,9 @@
 from collections.abc import Iterable
-from typing import List, Optional, Union
+from itertools import chain
+from typing import Dict, Iterator, List, Optional, Tuple, Union
 
+import numpy as np
+import pandas as pd
 from pandas.api.types import is_object_dtype
 
 from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, SparkDataFrame
@@ -65,6 +68,7 @@ class Padder:
         array_size: Optional[int] = None,
         cut_array: Optional[bool] = True,
         cut_side: Optional[str] = "right",
+        columnar: bool = False,
     ):
         """
         :param pad_columns: Name of columns to pad.
@@ -78,6 +82,10 @@ class Padder:
             default: ``True``.
         :param cut_side: side of array on which to cut to needed length. Can be "right" or "left",
                 default: ``right``.
+        :param columnar: pad all arrays of a column with a single numpy operation.
+            Padded values of pandas dataframes are numpy arrays instead of lists,
+            Spark dataframes are padded with ``mapInPandas``.
+            default: ``False``.
         """
         self.pad_columns = (
             pad_columns if (isinstance(pad_columns, Iterable) and not isinstance(pad_columns, str)) else [pad_columns]
@@ -108,6 +116,7 @@ class Padder:
 
         self.cut_array = cut_array
         self.cut_side = cut_side
+        self.columnar = columnar
 
     def transform(self, interactions: DataFrameLike) -> DataFrameLike:
         """Pad dataframe.
@@ -121,7 +130,7 @@ class Padder:
         is_spark = isinstance(interactions, SparkDataFrame)
         column_dtypes = dict(df_transformed.dtypes)
 
-        for col, pad_value in zip(self.pad_columns, self.padding_value):
+        for col in self.pad_columns:
             if col not in df_transformed.columns:
                 raise ValueError(f"Column {col} not in DataFrame columns.")
             if is_spark is True and not column_dtypes[col].startswith("array"):
@@ -129,6 +138,12 @@ class Padder:
             if is_spark is False and not is_object_dtype(df_transformed[col]):
                 raise ValueError(f"Column {col} should have object dtype to be padded.")
 
+        if self.columnar:
+            if is_spark is True:
+                return self._transform_spark_columnar(df_transformed)
+            return self._transform_pandas_columnar(df_transformed)
+
+        for col, pad_value in zip(self.pad_columns, self.padding_value):
             if is_spark is True:
                 df_transformed = self._transform_spark(df_transformed, col, pad_value)
             else:
@@ -136,6 +151,24 @@ class Padder:
 
         return df_transformed
 
+    def transform_to_arrays(self, interactions: PandasDataFrame) -> Dict[str, np.ndarray]:
+        """Pad columns of pandas dataframe to fixed-shape arrays, e.g. to create torch tensors from them.
+
+        :param interactions: pandas DataFrame with array columns with names pad_columns.
+
+        :returns: dictionary of padded columns with arrays of shape ``(len(interactions), array_size)``.
+
+        """
+        arrays = {}
+        for col, pad_value in zip(self.pad_columns, self.padding_value):
+            if col not in interactions.columns:
+                raise ValueError(f"Column {col} not in DataFrame columns.")
+            padded = self._pad_column(interactions[col], pad_value, self._get_max_array_size(interactions[col]))
+            if isinstance(padded, list):
+                raise ValueError(f"Arrays of column {col} are longer than array_size and cut_array is False.")
+            arrays[col] = padded
+        return arrays
+
     def _transform_pandas(
         self, df_transformed: PandasDataFrame, col: str, pad_value: Union[str, float, int, List, None]
     ) -> PandasDataFrame:
@@ -177,6 +210,50 @@ class Padder:
 
         return res
 
+    def _get_max_array_size(self, column: pd.Series) -> int:
+        if self.array_size == -1:
+            return int(column.map(_sequence_len).max()) if len(column) > 0 else 0
+        return self.array_size
+
+    def _pad_column(
+        self, column: pd.Series, pad_value: Union[str, float, int, List, None], max_array_size: int
+    ) -> Union[np.ndarray, List[np.ndarray]]:
+        values, padded_lengths = _pad_sequences(
+            column,
+            max_array_size,
+            pad_value,
+            padding_side=self.padding_side,
+            cut_array=self.cut_array,
+            cut_side=self.cut_side,
+        )
+        if (padded_lengths == max_array_size).all():
+            return values.reshape(len(column), max_array_size)
+        return np.split(values, np.cumsum(padded_lengths)[:-1])
+
+    def _transform_pandas_columnar(self, interactions: PandasDataFrame) -> PandasDataFrame:
+        res = interactions.copy()
+        for col, pad_value in zip(self.pad_columns, self.padding_value):
+            res[col] = list(self._pad_column(res[col], pad_value, self._get_max_array_size(res[col])))
+        return res
+
+    def _transform_spark_columnar(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        if self.array_size == -1:
+            max_array_sizes = (
+                interactions.agg(*[sf.max(sf.size(col)) for col in self.pad_columns]).collect()[0]
+            )
+            max_array_sizes = [max(size or 0, 0) for size in max_array_sizes]
+        else:
+            max_array_sizes = [self.array_size] * len(self.pad_columns)
+        columns_to_pad = list(zip(self.pad_columns, self.padding_value, max_array_sizes))
+
+        def pad_batches(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            for batch in batches:
+                for col, pad_value, max_array_size in columns_to_pad:
+                    batch[col] = list(self._pad_column(batch[col], pad_value, max_array_size))
+                yield batch
+
+        return interactions.mapInPandas(pad_batches, interactions.schema)
+
     def _transform_spark(
         self, df_transformed: SparkDataFrame, col: str, pad_value: Union[str, float, int, List, None]
     ) -> SparkDataFrame:
@@ -229,3 +306,55 @@ class Padder:
         )
 
         return df_transformed
+
+
+def _sequence_len(sequence) -> int:
+    return len(sequence) if isinstance(sequence, (list, np.ndarray)) else 0
+
+
+# pylint: disable=too-many-arguments, too-many-locals
+def _pad_sequences(
+    sequences: pd.Series,
+    max_array_size: int,
+    pad_value: Union[str, float, int, List, None],
+    padding_side: str = "right",
+    cut_array: bool = True,
+    cut_side: str = "right",
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pad and cut all sequences at once.
+    Values of sequences are concatenated into a flat array and copied to their positions
+    in the flat array of padded sequences with offsets arithmetic.
+
+    :return: flat array of padded sequences and lengths of padded sequences
+    """
+    lengths = sequences.map(_sequence_len).to_numpy(dtype=np.int64)
+    values = np.array(
+        list(chain.from_iterable(sequence for sequence in sequences if isinstance(sequence, (list, np.ndarray))))
+    )
+
+    kept_lengths = np.minimum(lengths, max_array_size) if cut_array else lengths
+    padded_lengths = np.maximum(kept_lengths, max_array_size)
+
+    source_starts = np.cumsum(lengths) - lengths
+    if cut_side == "right":
+        source_starts += lengths - kept_lengths
+    target_starts = np.cumsum(padded_lengths) - padded_lengths
+    if padding_side == "left":
+        target_starts += padded_lengths - kept_lengths
+
+    kept_starts = np.cumsum(kept_lengths) - kept_lengths
+    positions = np.arange(kept_lengths.sum()) - np.repeat(kept_starts, kept_lengths)
+
+    pad_dtype = np.asarray(pad_value).dtype
+    if len(values) == 0:
+        dtype = pad_dtype
+    elif values.dtype.kind in "biuf" and pad_dtype.kind in "biuf":
+        dtype = np.result_type(values.dtype, pad_dtype)
+    else:
+        dtype = object
+    padded = np.full(padded_lengths.sum(), pad_value, dtype=dtype)
+    padded[np.repeat(target_starts, kept_lengths) + positions] = values[
+        np.repeat(source_starts, kept_lengths) + positions
+    ]
+    return padded, padded_lengths
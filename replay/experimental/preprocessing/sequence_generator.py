@@ -1,5 +1,6 @@
-from typing import List, Optional, Union
+from typing import Iterator, List, Optional, Union
 
+import numpy as np
 import pandas as pd
 
 from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, SparkDataFrame
@@ -7,6 +8,7 @@ from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, Spar
 if PYSPARK_AVAILABLE:
     from pyspark.sql import Column, Window
     from pyspark.sql import functions as sf
+    from pyspark.sql.types import ArrayType, IntegerType, StructField, StructType
 
 
 # pylint: disable=too-many-instance-attributes, too-few-public-methods
@@ -76,6 +78,7 @@ class SequenceGenerator:
         label_suffix: Optional[str] = None,
         get_list_len: Optional[bool] = False,
         list_len_column: str = "list_len",
+        columnar: bool = False,
     ):
         """
         :param groupby_column: Name of column to group by.
@@ -99,6 +102,11 @@ class SequenceGenerator:
             default: ``False``.
         :param list_len_column: List length column name. Used if get_list_len.
             default: ``list_len``.
+        :param columnar: build sequences of all rows at once with numpy offset arrays.
+            Sequences of pandas dataframes are numpy arrays instead of lists,
+            Spark dataframes are processed with ``mapInPandas`` over partitions grouped by groupby_column
+            instead of ``collect_list`` over a window.
+            default: ``False``.
         """
         self.groupby_column = groupby_column if not isinstance(groupby_column, str) else [groupby_column]
         self.orderby_column: Union[List, Column, None]
@@ -118,6 +126,7 @@ class SequenceGenerator:
 
         self.get_list_len = get_list_len
         self.list_len_column = list_len_column
+        self.columnar = columnar
 
     def transform(self, interactions: DataFrameLike) -> DataFrameLike:
         """Create sequences from given interactions.
@@ -135,10 +144,102 @@ class SequenceGenerator:
             )
 
         if isinstance(interactions, SparkDataFrame):
+            if self.columnar:
+                return self._transform_spark_columnar(interactions)
             return self._transform_spark(interactions)
 
+        if self.columnar:
+            return self._transform_pandas_columnar(interactions)
         return self._transform_pandas(interactions)
 
+    def _get_select_columns(self) -> List[str]:
+        assert self.transform_columns is not None
+        transformed_columns = list(
+            map(lambda x: self.sequence_prefix + x + self.sequence_suffix, self.transform_columns)
+        )
+        label_columns = list(map(lambda x: self.label_prefix + x + self.label_suffix, self.transform_columns))
+        select_columns = self.groupby_column + transformed_columns + label_columns
+        if self.get_list_len:
+            select_columns += [self.list_len_column]
+        return select_columns
+
+    def _get_sequences(self, sorted_interactions: PandasDataFrame) -> PandasDataFrame:
+        """
+        Sequences of interactions sorted by groupby_column and orderby_column.
+        Every sequence is a slice of the column values, so indices of all sequence values
+        are computed at once from group offsets.
+        """
+        assert self.transform_columns is not None
+        positions = np.arange(len(sorted_interactions))
+        group_ids = sorted_interactions.groupby(self.groupby_column, sort=False).ngroup().to_numpy()
+        is_group_start = np.ones(len(sorted_interactions), dtype=bool)
+        is_group_start[1:] = group_ids[1:] != group_ids[:-1]
+        group_starts = np.maximum.accumulate(np.where(is_group_start, positions, 0))
+
+        lengths = np.minimum(positions - group_starts, self.len_window)
+        rows = np.flatnonzero(lengths > 0)
+        lengths = lengths[rows]
+        sequence_starts = np.cumsum(lengths) - lengths
+        value_indices = np.repeat(rows - lengths - sequence_starts, lengths) + np.arange(lengths.sum())
+        split_points = np.cumsum(lengths)[:-1]
+
+        result = sorted_interactions[self.groupby_column].iloc[rows].reset_index(drop=True)
+        for transform_col in self.transform_columns:
+            values = sorted_interactions[transform_col].to_numpy()[value_indices]
+            sequences = np.split(values, split_points) if len(rows) > 0 else []
+            result[self.sequence_prefix + transform_col + self.sequence_suffix] = sequences
+        for transform_col in self.transform_columns:
+            result[self.label_prefix + transform_col + self.label_suffix] = (
+                sorted_interactions[transform_col].iloc[rows].to_numpy()
+            )
+        if self.get_list_len:
+            result[self.list_len_column] = lengths
+
+        return result[self._get_select_columns()]
+
+    def _transform_pandas_columnar(self, interactions: PandasDataFrame) -> PandasDataFrame:
+        sort_columns = self.groupby_column + (self.orderby_column or [])
+        return self._get_sequences(interactions.sort_values(sort_columns, kind="stable"))
+
+    def _transform_spark_columnar(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        assert self.transform_columns is not None
+        fields = {field.name: field for field in interactions.schema.fields}
+        schema = StructType(
+            [fields[col] for col in self.groupby_column]
+            + [
+                StructField(self.sequence_prefix + col + self.sequence_suffix, ArrayType(fields[col].dataType))
+                for col in self.transform_columns
+            ]
+            + [
+                StructField(self.label_prefix + col + self.label_suffix, fields[col].dataType)
+                for col in self.transform_columns
+            ]
+            + ([StructField(self.list_len_column, IntegerType())] if self.get_list_len else [])
+        )
+        groupby_column = self.groupby_column
+
+        def get_sequences(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            # rows of a group are adjacent within a partition but may be split between batches,
+            # so the last group of a batch is carried over to the next one
+            carry = None
+            for batch in batches:
+                if carry is not None:
+                    batch = pd.concat([carry, batch], ignore_index=True)
+                if batch.empty:
+                    continue
+                is_last_group = (batch[groupby_column] == batch[groupby_column].iloc[-1]).all(axis=1).to_numpy()
+                carry = batch[is_last_group]
+                if not is_last_group.all():
+                    yield self._get_sequences(batch[~is_last_group])
+            if carry is not None and not carry.empty:
+                yield self._get_sequences(carry)
+
+        return (
+            interactions.repartition(*self.groupby_column)
+            .sortWithinPartitions(*(self.groupby_column + (self.orderby_column or [])))
+            .mapInPandas(get_sequences, schema)
+        )
+
     def _transform_pandas(self, interactions: PandasDataFrame) -> PandasDataFrame:
         assert self.transform_columns is not None
         processed_interactions = interactions.copy(deep=True)
@@ -146,12 +247,13 @@ class SequenceGenerator:
         def seq_rolling(col: pd.Series) -> List:
             return [window.to_list()[:-1] for window in col.rolling(self.len_window + 1)]
 
-        for transform_col in self.transform_columns:
-            if self.orderby_column is not None:
-                processed_interactions.sort_values(by=self.orderby_column, inplace=True)
-            else:
-                processed_interactions.sort_values(by=self.groupby_column, inplace=True)
+        # rows of a group have to be adjacent, so that rolling windows of groups align with the rows
+        sort_columns = self.groupby_column + [
+            column for column in (self.orderby_column or []) if column not in self.groupby_column
+        ]
+        processed_interactions.sort_values(by=sort_columns, kind="stable", inplace=True)
 
+        for transform_col in self.transform_columns:
             processed_interactions[self.sequence_prefix + transform_col + self.sequence_suffix] = [
                 item
                 for sublist in processed_interactions.groupby(self.groupby_column, sort=False)[transform_col].apply(
@@ -1,8 +1,9 @@
 import warnings
 from abc import ABC, abstractmethod
-from typing import Any, Dict, List, Mapping, Union
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Tuple, Union
 
 import numpy as np
+import pandas as pd
 
 from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, SparkDataFrame
 
@@ -23,9 +24,60 @@ class MetricDuplicatesWarning(Warning):
     """Recommendations contain duplicates"""
 
 
+def _get_hits_matrices(
+    ground_truth: pd.Series, pred: pd.Series, max_k: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Build relevance indicators for a batch of queries without a per-query Python loop.
+
+    :param ground_truth: series of ground truth item arrays, one per query.
+    :param pred: series of recommended item arrays sorted by score, one per query.
+        Only the first ``max_k`` items of each array are taken into account.
+    :param max_k: the largest depth cut-off.
+    :return: tuple of
+        ``hits`` -- boolean matrix ``(queries, max_k)``, ``True`` if the item at the position is relevant,
+        ``unique_hits`` -- the same as ``hits`` but only the first occurrence of every item is marked,
+        ``pred_len`` -- the number of recommended items for every query (truncated by ``max_k``),
+        ``ground_truth_len`` -- the number of ground truth items for every query.
+    """
+    num_queries = len(pred)
+    pred_len = np.minimum(np.fromiter(map(len, pred), dtype=np.int64, count=num_queries), max_k)
+    ground_truth_len = np.fromiter(map(len, ground_truth), dtype=np.int64, count=num_queries)
+    hits = np.zeros((num_queries, max_k), dtype=bool)
+    unique_hits = np.zeros((num_queries, max_k), dtype=bool)
+    if pred_len.sum() == 0 or ground_truth_len.sum() == 0:
+        return hits, unique_hits, pred_len, ground_truth_len
+
+    pred_flat = np.concatenate([items[:max_k] for items in pred])
+    ground_truth_flat = np.concatenate(list(ground_truth))
+    codes, uniques = pd.factorize(np.concatenate([pred_flat, ground_truth_flat]))
+    pred_rows = np.repeat(np.arange(num_queries), pred_len)
+    ground_truth_rows = np.repeat(np.arange(num_queries), ground_truth_len)
+    pred_keys = pred_rows * len(uniques) + codes[: len(pred_flat)]
+    ground_truth_keys = ground_truth_rows * len(uniques) + codes[len(pred_flat) :]
+
+    positions = np.arange(len(pred_flat)) - np.repeat(np.cumsum(pred_len) - pred_len, pred_len)
+    is_hit = np.isin(pred_keys, ground_truth_keys)
+    is_first = np.zeros(len(pred_flat), dtype=bool)
+    is_first[np.unique(pred_keys, return_index=True)[1]] = True
+    hits[pred_rows, positions] = is_hit
+    unique_hits[pred_rows, positions] = is_hit & is_first
+    return hits, unique_hits, pred_len, ground_truth_len
+
+
 class Metric(ABC):
     """Base metric class"""
 
+    # Optional vectorized metric calculation for a batch of users, which is applied
+    # to Arrow batches on Spark instead of ``_get_metric_value_by_user``.
+    # Metrics that depend only on the positions of relevant items set it to a staticmethod
+    # ``(ks, hits, unique_hits, ground_truth_len) -> values``, where ``hits`` is a boolean matrix
+    # ``(users, max(ks))`` marking relevant recommendations, ``unique_hits`` is the same matrix
+    # without repeated recommendations of the same item, ``ground_truth_len`` is the number
+    # of relevant items for every user and ``values`` is a matrix ``(users, len(ks))``.
+    # The result must be equal to ``_get_metric_value_by_user`` for every user.
+    _get_metric_values_by_hits: Optional[Callable[..., np.ndarray]] = None
+
     def __init__(  # pylint: disable=too-many-arguments
         self,
         topk: Union[List[int], int],
@@ -225,10 +277,16 @@ class Metric(ABC):
         recommendations: SparkDataFrame,
         ground_truth: SparkDataFrame,
     ) -> SparkDataFrame:
-        true_items_by_users = ground_truth.groupby(self.query_column).agg(
-            sf.collect_set(self.item_column).alias("ground_truth")
-        )
+        return self._join_ground_truth_items(recommendations, self._get_ground_truth_items(ground_truth))
+
+    def _get_ground_truth_items(self, ground_truth: SparkDataFrame) -> SparkDataFrame:
+        return ground_truth.groupby(self.query_column).agg(sf.collect_set(self.item_column).alias("ground_truth"))
 
+    def _join_ground_truth_items(
+        self,
+        recommendations: SparkDataFrame,
+        true_items_by_users: SparkDataFrame,
+    ) -> SparkDataFrame:
         sorted_by_score_recommendations = self._get_items_list_per_user(recommendations)
 
         enriched_recommendations = sorted_by_score_recommendations.join(
@@ -284,6 +342,8 @@ class Metric(ABC):
         return self._spark_compute(recs)
 
     def _get_metric_distribution(self, recs: SparkDataFrame) -> SparkDataFrame:
+        if self._has_hits_kernel and {"ground_truth", "pred_item_id"}.issubset(recs.columns):
+            return self._get_metric_distribution_by_hits(recs)
         cur_class = self.__class__
         distribution = recs.rdd.flatMap(  # pragma: no cover, due to incorrect work of coverage tool
             lambda x: [(x[0], cur_class._get_metric_value_by_user(x[-1], *x[1:-1]))]
@@ -294,6 +354,48 @@ class Metric(ABC):
         )
         return distribution
 
+    @property
+    def _has_hits_kernel(self) -> bool:
+        return self._get_metric_values_by_hits is not None
+
+    def _get_metric_distribution_by_hits(self, recs: SparkDataFrame) -> SparkDataFrame:
+        """
+        Calculating metric values for all users with the vectorized ``_get_metric_values_by_hits``
+        kernel applied to Arrow batches instead of calling ``_get_metric_value_by_user`` for every user.
+        """
+        cur_class = self.__class__
+        ks = self.topk
+        max_k = max(ks)
+        query_column = self.query_column
+        pred_type = recs.schema["pred_item_id"].dataType
+
+        def grouped_map(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            for batch in batches:
+                if batch.empty:
+                    continue
+                hits, unique_hits, pred_len, ground_truth_len = _get_hits_matrices(
+                    batch["ground_truth"], batch["pred_item_id"], max_k
+                )
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    values = cur_class._get_metric_values_by_hits(
+                        ks, hits, unique_hits, ground_truth_len
+                    ).astype(np.float64)
+                values[(pred_len == 0) | (ground_truth_len == 0)] = 0.0
+                yield PandasDataFrame({"user_id": batch[query_column], "value": list(values)})
+
+        return recs.select(
+            query_column,
+            "ground_truth",
+            sf.coalesce(
+                sf.slice("pred_item_id", 1, max_k), sf.array().cast(pred_type)
+            ).alias("pred_item_id"),
+        ).mapInPandas(
+            grouped_map,
+            StructType()
+            .add("user_id", recs.schema[query_column].dataType, False)
+            .add("value", ArrayType(DoubleType()), False),
+        )
+
     @staticmethod
     @abstractmethod
     def _get_metric_value_by_user(  # pylint: disable=invalid-name
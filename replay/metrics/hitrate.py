@@ -1,5 +1,7 @@
 from typing import List
 
+import numpy as np
+
 from .base_metric import Metric
 
 
@@ -76,3 +78,10 @@ class HitRate(Metric):
             else:
                 res.append(0.0)
         return res
+
+    @staticmethod
+    def _get_metric_values_by_hits(
+        ks: List[int], hits: np.ndarray, unique_hits: np.ndarray, ground_truth_len: np.ndarray
+    ) -> np.ndarray:
+        hits_cum = np.logical_or.accumulate(hits, axis=1)
+        return np.stack([hits_cum[:, k - 1] for k in ks], axis=1).astype(np.float64)
@@ -1,5 +1,7 @@
 from typing import List
 
+import numpy as np
+
 from .base_metric import Metric
 
 
@@ -81,3 +83,14 @@ class MAP(Metric):
                     result += tp_cum / (i + 1)
             res.append(result / max_good)
         return res
+
+    @staticmethod
+    def _get_metric_values_by_hits(
+        ks: List[int], hits: np.ndarray, unique_hits: np.ndarray, ground_truth_len: np.ndarray
+    ) -> np.ndarray:
+        tp_cum = np.cumsum(hits, axis=1)
+        precisions = np.cumsum(hits * tp_cum / np.arange(1, hits.shape[1] + 1), axis=1)
+        res = []
+        for k in ks:
+            res.append(precisions[:, k - 1] / np.minimum(k, ground_truth_len))
+        return np.stack(res, axis=1)
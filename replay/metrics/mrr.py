@@ -1,5 +1,7 @@
 from typing import List
 
+import numpy as np
+
 from .base_metric import Metric
 
 
@@ -71,3 +73,13 @@ class MRR(Metric):
                     break
             res.append(ans)
         return res
+
+    @staticmethod
+    def _get_metric_values_by_hits(
+        ks: List[int], hits: np.ndarray, unique_hits: np.ndarray, ground_truth_len: np.ndarray
+    ) -> np.ndarray:
+        first_hit = np.where(hits.any(axis=1), hits.argmax(axis=1), hits.shape[1])
+        res = []
+        for k in ks:
+            res.append(np.where(first_hit < k, 1 / (first_hit + 1), 0.0))
+        return np.stack(res, axis=1)
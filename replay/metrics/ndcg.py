@@ -1,6 +1,8 @@
 import math
 from typing import List
 
+import numpy as np
+
 from .base_metric import Metric
 
 
@@ -96,3 +98,16 @@ class NDCG(Metric):
             idcg = sum(denom[:ground_truth_len])
             res.append(dcg / idcg)
         return res
+
+    @staticmethod
+    def _get_metric_values_by_hits(
+        ks: List[int], hits: np.ndarray, unique_hits: np.ndarray, ground_truth_len: np.ndarray
+    ) -> np.ndarray:
+        denom = np.array([1 / math.log2(i + 2) for i in range(hits.shape[1])])
+        dcg = np.cumsum(hits * denom, axis=1)
+        idcg = np.cumsum(denom)
+        res = []
+        for k in ks:
+            ground_truth_cut = np.clip(np.minimum(k, ground_truth_len), 1, None)
+            res.append(dcg[:, k - 1] / idcg[ground_truth_cut - 1])
+        return np.stack(res, axis=1)
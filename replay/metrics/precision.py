@@ -1,5 +1,7 @@
 from typing import List
 
+import numpy as np
+
 from .base_metric import Metric
 
 
@@ -73,3 +75,10 @@ class Precision(Metric):
             ans = len(set(pred[:k]) & set_gt)
             res.append(ans / k)
         return res
+
+    @staticmethod
+    def _get_metric_values_by_hits(
+        ks: List[int], hits: np.ndarray, unique_hits: np.ndarray, ground_truth_len: np.ndarray
+    ) -> np.ndarray:
+        tp_cum = np.cumsum(unique_hits, axis=1)
+        return np.stack([tp_cum[:, k - 1] / k for k in ks], axis=1)
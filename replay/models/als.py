@@ -1,14 +1,18 @@
 from os.path import join
-from typing import Optional, Tuple
+from typing import Iterator, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
 
 from replay.data import Dataset
 from replay.models.base_rec import ItemVectorModel, Recommender
-from replay.utils import PYSPARK_AVAILABLE, SparkDataFrame
+from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
+from replay.utils.native import query_blocks, top_k_dense
+from replay.utils.session_handler import State
 
 if PYSPARK_AVAILABLE:
     import pyspark.sql.functions as sf
     from pyspark.ml.recommendation import ALS, ALSModel
-    from pyspark.sql.types import DoubleType
 
     from replay.utils.spark_utils import list_to_vector_udf
 
@@ -20,6 +24,7 @@ class ALSWrap(Recommender, ItemVectorModel):
     """
 
     _seed: Optional[int] = None
+    _item_factors = None
     _search_space = {
         "rank": {"type": "loguniform_int", "args": [8, 256]},
     }
@@ -97,6 +102,37 @@ class ALSWrap(Recommender, ItemVectorModel):
         if hasattr(self, "model"):
             self.model.itemFactors.unpersist()
             self.model.userFactors.unpersist()
+        self._unpersist_item_factors()
+
+    def _unpersist_item_factors(self):
+        if self._item_factors is not None:
+            self._item_factors.unpersist()
+            self._item_factors = None
+
+    def _broadcast_item_factors(self, items: Optional[SparkDataFrame] = None):
+        """
+        Broadcast factors of ``items`` as numpy arrays of sorted ids and factors.
+        Factors of all fitted items are broadcasted if ``items`` is ``None``.
+        """
+        item_factors = self.model.itemFactors
+        if items is not None:
+            item_factors = item_factors.join(
+                items.select(sf.col(self.item_column).alias("id")), on="id", how="left_semi"
+            )
+        item_factors = item_factors.toPandas().sort_values("id")
+        factors = (
+            np.stack(item_factors["features"].to_numpy()).astype(np.float64)
+            if len(item_factors) > 0
+            else np.empty((0, self.model.rank))
+        )
+        self._unpersist_item_factors()
+        self._item_factors = State().session.sparkContext.broadcast((item_factors["id"].to_numpy(), factors))
+        return self._item_factors
+
+    def _get_query_factors(self, queries: SparkDataFrame) -> SparkDataFrame:
+        return self.model.userFactors.select(
+            sf.col("id").alias(self.query_column), sf.col("features").alias("query_factors")
+        ).join(queries, on=self.query_column, how="left_semi")
 
     # pylint: disable=too-many-arguments
     def _predict(
@@ -107,38 +143,24 @@ class ALSWrap(Recommender, ItemVectorModel):
         items: SparkDataFrame,
         filter_seen_items: bool = True,
     ) -> SparkDataFrame:
+        item_factors = self._broadcast_item_factors(items)
+        query_factors = self._get_query_factors(queries)
+        filter_seen = filter_seen_items and dataset is not None
+        if filter_seen:
+            query_factors = query_factors.join(dataset.get_seen_items(queries), on=self.query_column, how="left")
+        query_column, item_column, rating_column = self.query_column, self.item_column, self.rating_column
 
-        if (items.count() == self.fit_items.count()) and (
-            items.join(self.fit_items, on=self.item_column, how="inner").count()
-            == self.fit_items.count()
-        ):
-            max_seen = 0
-            if filter_seen_items and dataset is not None:
-                max_seen_in_interactions = (
-                    dataset.interactions.join(queries, on=self.query_column)
-                    .groupBy(self.query_column)
-                    .agg(sf.count(self.query_column).alias("num_seen"))
-                    .select(sf.max("num_seen"))
-                    .collect()[0][0]
-                )
-                max_seen = max_seen_in_interactions if max_seen_in_interactions is not None else 0
-
-            recs_als = self.model.recommendForUserSubset(queries, k + max_seen)
-            return (
-                recs_als.withColumn(
-                    "recommendations", sf.explode("recommendations")
-                )
-                .withColumn(self.item_column, sf.col(f"recommendations.{self.item_column}"))
-                .withColumn(
-                    self.rating_column,
-                    sf.col("recommendations.rating").cast(DoubleType()),
+        def score(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            item_ids, factors = item_factors.value
+            for batch in batches:
+                seen_items = batch["seen_items"] if filter_seen else None
+                query_ids, recs_item_ids, ratings = _top_k_by_factors(
+                    batch[query_column].to_numpy(), batch["query_factors"], seen_items, item_ids, factors, k
                 )
-                .select(self.query_column, self.item_column, self.rating_column)
-            )
+                yield PandasDataFrame({query_column: query_ids, item_column: recs_item_ids, rating_column: ratings})
 
-        return self._predict_pairs(
-            pairs=queries.crossJoin(items).withColumn(self.rating_column, sf.lit(1)),
-            dataset=dataset,
+        return query_factors.mapInPandas(
+            score, f"{self.query_column} int, {self.item_column} int, {self.rating_column} double"
         )
 
     def _predict_pairs(
@@ -146,10 +168,28 @@ class ALSWrap(Recommender, ItemVectorModel):
         pairs: SparkDataFrame,
         dataset: Optional[Dataset] = None,
     ) -> SparkDataFrame:
+        item_factors = self._broadcast_item_factors()
+        query_column, item_column, rating_column = self.query_column, self.item_column, self.rating_column
+
+        def score(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            item_ids, factors = item_factors.value
+            for batch in batches:
+                pair_item_ids = batch[item_column].to_numpy()
+                positions = np.searchsorted(item_ids, pair_item_ids).clip(max=max(len(item_ids) - 1, 0))
+                is_known = item_ids[positions] == pair_item_ids if len(item_ids) > 0 else positions < 0
+                query_factors = _stack_factors(batch["query_factors"][is_known], factors.shape[1])
+                yield PandasDataFrame(
+                    {
+                        query_column: batch[query_column].to_numpy()[is_known],
+                        item_column: pair_item_ids[is_known],
+                        rating_column: np.einsum("ij,ij->i", query_factors, factors[positions[is_known]]),
+                    }
+                )
+
         return (
-            self.model.transform(pairs)
-            .withColumn(self.rating_column, sf.col("prediction").cast(DoubleType()))
-            .drop("prediction")
+            pairs.select(self.query_column, self.item_column)
+            .join(self._get_query_factors(pairs.select(self.query_column)), on=self.query_column)
+            .mapInPandas(score, f"{self.query_column} int, {self.item_column} int, {self.rating_column} double")
         )
 
     def _get_features(
@@ -172,3 +212,54 @@ class ALSWrap(Recommender, ItemVectorModel):
             sf.col("id").alias(self.item_column),
             list_to_vector_udf(sf.col("features")).alias("item_vector"),
         )
+
+
+def _stack_factors(factors, rank: int) -> np.ndarray:
+    return np.stack(factors.to_numpy()).astype(np.float64) if len(factors) > 0 else np.empty((0, rank))
+
+
+# pylint: disable=too-many-arguments
+def _top_k_by_factors(
+    query_ids: np.ndarray,
+    query_factors,
+    seen_items,
+    item_ids: np.ndarray,
+    item_factors: np.ndarray,
+    k: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Top-k items by dot products of factors for a batch of queries,
+    items seen by a query are never selected.
+
+    :param query_ids: ids of queries
+    :param query_factors: series of query factors
+    :param seen_items: series of arrays of items seen by queries or ``None``
+    :param item_ids: sorted ids of candidate items
+    :param item_factors: factors of ``item_ids``
+    :param k: number of recommendations for each query
+    :return: query ids, item ids and ratings of recommendations
+    """
+    query_factors = _stack_factors(query_factors, item_factors.shape[1])
+    seen = None
+    if seen_items is not None:
+        lengths = seen_items.map(lambda items: 0 if items is None else len(items)).to_numpy()
+        items = (
+            np.concatenate([items for items in seen_items if items is not None and len(items) > 0])
+            if lengths.sum() > 0
+            else np.empty(0, dtype=item_ids.dtype)
+        )
+        positions = np.searchsorted(item_ids, items).clip(max=max(len(item_ids) - 1, 0))
+        is_found = item_ids[positions] == items if len(item_ids) > 0 else np.zeros(len(items), dtype=bool)
+        seen = csr_matrix(
+            (np.ones(is_found.sum()), (np.repeat(np.arange(len(query_ids)), lengths)[is_found], positions[is_found])),
+            shape=(len(query_ids), len(item_ids)),
+        )
+    recs = [(np.empty(0, dtype=query_ids.dtype), np.empty(0, dtype=item_ids.dtype), np.empty(0))]
+    for block in query_blocks(len(query_ids), len(item_ids)):
+        scores = query_factors[block] @ item_factors.T
+        if seen is not None:
+            seen_rows, seen_cols = seen[block].nonzero()
+            scores[seen_rows, seen_cols] = np.nan
+        rows, cols = top_k_dense(scores, k)
+        recs.append((query_ids[block][rows], item_ids[cols], scores[rows, cols]))
+    return tuple(np.concatenate(values) for values in zip(*recs))
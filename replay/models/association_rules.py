@@ -9,7 +9,9 @@ from replay.utils import PYSPARK_AVAILABLE, SparkDataFrame
 
 if PYSPARK_AVAILABLE:
     import pyspark.sql.functions as sf
-    from pyspark.sql.window import Window
+    from pyspark.sql import Window
+
+    from replay.utils.spark_utils import get_top_k_by_columns
 
 
 # pylint: disable=too-many-ancestors, too-many-instance-attributes
@@ -102,6 +104,12 @@ class AssociationRulesItemRec(NeighbourRec):
     can_predict_item_to_item = True
     item_to_item_metrics: List[str] = ["lift", "confidence", "confidence_gain"]
     similarity: SparkDataFrame
+    session_items: Optional[SparkDataFrame] = None
+    item_stats: Optional[SparkDataFrame] = None
+    pair_stats: Optional[SparkDataFrame] = None
+    num_sessions: int
+    _refit_dataframes = ("session_items", "item_stats", "pair_stats")
+    _session_samplings = ("random", "rating")
     can_change_metric = True
     _search_space = {
         "min_item_count": {"type": "int", "args": [3, 10]},
@@ -124,6 +132,8 @@ class AssociationRulesItemRec(NeighbourRec):
         use_rating: bool = False,
         similarity_metric: str = "confidence",
         index_builder: Optional[IndexBuilder] = None,
+        max_session_items: Optional[int] = None,
+        session_sampling: str = "random",
     ) -> None:
         """
         :param session_column: name of column to group sessions.
@@ -139,7 +149,17 @@ class AssociationRulesItemRec(NeighbourRec):
             one of [``lift``, ``confidence``, ``confidence_gain``]
         :param index_builder: `IndexBuilder` instance that adds ANN functionality.
             If not set, then ann will not be used.
+        :param max_session_items: maximal number of frequent items of a session to count pairs of,
+            longer sessions are sampled. Item counts are always calculated over whole sessions.
+            If ``None``, pairs of all frequent items are counted.
+        :param session_sampling: how items of long sessions are sampled, one of [``random``, ``rating``].
+            ``random`` takes pseudo-random items determined by session and item ids,
+            ``rating`` takes items with the highest rating, ties are resolved pseudo-randomly.
         """
+        if max_session_items is not None and max_session_items <= 0:
+            raise ValueError("max_session_items must be positive")
+        if session_sampling not in self._session_samplings:
+            raise ValueError(f"session_sampling must be one of {list(self._session_samplings)}")
 
         self.session_column = session_column
         self.min_item_count = min_item_count
@@ -147,6 +167,8 @@ class AssociationRulesItemRec(NeighbourRec):
         self.num_neighbours = num_neighbours
         self.use_rating = use_rating
         self.similarity_metric = similarity_metric
+        self.max_session_items = max_session_items
+        self.session_sampling = session_sampling
         if isinstance(index_builder, (IndexBuilder, type(None))):
             self.index_builder = index_builder
         elif isinstance(index_builder, dict):
@@ -161,6 +183,8 @@ class AssociationRulesItemRec(NeighbourRec):
             "num_neighbours": self.num_neighbours,
             "use_rating": self.use_rating,
             "similarity_metric": self.similarity_metric,
+            "max_session_items": self.max_session_items,
+            "session_sampling": self.session_sampling,
         }
 
     def _fit(
@@ -172,7 +196,20 @@ class AssociationRulesItemRec(NeighbourRec):
         2) Calculate items support, pairs confidence, lift and confidence_gain defined as
             confidence(a, b)/confidence(!a, b).
         """
-        interactions = (
+        interactions = self._get_session_items(dataset).cache()
+        self.num_sessions = interactions.select(self.session_column).distinct().count()
+
+        # counts are kept before thresholds are applied to update them with refit
+        self.session_items = interactions
+        self.item_stats = self._get_item_stats(interactions).cache()
+        frequent_items_interactions = interactions.join(
+            self._get_frequent_items(self.item_stats).select(self.item_column), on=self.item_column
+        )
+        self.pair_stats = self._get_pair_stats(frequent_items_interactions).cache()
+        self._calc_similarity()
+
+    def _get_session_items(self, dataset: Dataset) -> SparkDataFrame:
+        return (
             dataset.interactions.withColumn(
                 self.rating_column,
                 sf.col(self.rating_column) if self.use_rating else sf.lit(1),
@@ -180,54 +217,75 @@ class AssociationRulesItemRec(NeighbourRec):
             .select(self.session_column, self.item_column, self.rating_column)
             .distinct()
         )
-        num_sessions = interactions.select(self.session_column).distinct().count()
-
-        frequent_items_cached = (
-            interactions.groupBy(self.item_column)
-            .agg(
-                sf.count(self.item_column).alias("item_count"),
-                sf.sum(self.rating_column).alias("item_rating"),
-            )
-            .filter(sf.col("item_count") >= self.min_item_count)
-            .drop("item_count")
-        ).cache()
 
-        frequent_items_interactions = interactions.join(
-            frequent_items_cached.select(self.item_column), on=self.item_column
+    def _get_item_stats(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        """
+        :param interactions: distinct session items `[session_id, item_id, rating]`
+        :return: item counts and ratings `[item_id, item_count, item_rating]`
+        """
+        return interactions.groupBy(self.item_column).agg(
+            sf.count(self.item_column).alias("item_count"),
+            sf.sum(self.rating_column).alias("item_rating"),
         )
 
-        frequent_item_pairs = (
-            frequent_items_interactions.withColumnRenamed(self.item_column, "antecedent")
-            .withColumnRenamed(self.rating_column, "antecedent_rel")
-            .join(
-                frequent_items_interactions.withColumnRenamed(
-                    self.session_column, self.session_column + "_cons"
+    def _get_frequent_items(self, item_stats: SparkDataFrame) -> SparkDataFrame:
+        return item_stats.filter(sf.col("item_count") >= self.min_item_count).drop("item_count")
+
+    def _get_pair_stats(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        """
+        Pairs are generated from sorted arrays of session items without a self-join
+        and counted with partial aggregation.
+        Samples of long sessions depend only on their items, so that refit subtracts the same pairs.
+
+        :param interactions: distinct session items `[session_id, item_id, rating]`
+        :return: pair counts and ratings `[antecedent, consequent, pair_count, pair_rating]`,
+            where antecedent < consequent
+        """
+        if self.max_session_items is not None:
+            order = [sf.xxhash64(self.session_column, self.item_column, self.rating_column)]
+            if self.session_sampling == "rating":
+                order.insert(0, sf.desc(self.rating_column))
+            interactions = (
+                interactions.withColumn(
+                    "item_rank", sf.row_number().over(Window.partitionBy(self.session_column).orderBy(*order))
                 )
-                .withColumnRenamed(self.item_column, "consequent")
-                .withColumnRenamed(self.rating_column, "consequent_rel"),
-                on=[
-                    sf.col(self.session_column)
-                    == sf.col(self.session_column + "_cons"),
-                    sf.col("antecedent") < sf.col("consequent"),
-                ],
-            )
-            # taking minimal rating of item for pair
-            .withColumn(
-                self.rating_column,
-                sf.least(sf.col("consequent_rel"), sf.col("antecedent_rel")),
-            )
-            .drop(
-                self.session_column + "_cons", "consequent_rel", "antecedent_rel"
+                .filter(sf.col("item_rank") <= self.max_session_items)
+                .drop("item_rank")
             )
+
+        sessions = interactions.groupBy(self.session_column).agg(
+            sf.array_sort(
+                sf.collect_list(
+                    sf.struct(sf.col(self.item_column).alias("item"), sf.col(self.rating_column).alias("rating"))
+                )
+            ).alias("items")
         )
+        # taking minimal rating of item for pair
+        pairs = sessions.select(
+            sf.explode(
+                sf.expr(
+                    "flatten(transform(items, (x, i) -> transform("
+                    "filter(slice(items, i + 2, size(items)), y -> y.item > x.item), "
+                    "y -> named_struct('antecedent', x.item, 'consequent', y.item, "
+                    "'rating', least(x.rating, y.rating)))))"
+                )
+            ).alias("pair")
+        ).select("pair.*")
 
-        pairs_count = (
-            frequent_item_pairs.groupBy("antecedent", "consequent")
-            .agg(
-                sf.count("consequent").alias("pair_count"),
-                sf.sum(self.rating_column).alias("pair_rating"),
-            )
-            .filter(sf.col("pair_count") >= self.min_pair_count)
+        return pairs.groupBy("antecedent", "consequent").agg(
+            sf.count("consequent").alias("pair_count"),
+            sf.sum("rating").alias("pair_rating"),
+        )
+
+    def _calc_similarity(self) -> None:
+        """
+        Calculate confidence, lift and confidence_gain from saved item and pair statistics.
+        """
+        num_sessions = self.num_sessions
+        frequent_items_cached = self._get_frequent_items(self.item_stats).cache()
+
+        pairs_count = self.pair_stats.filter(
+            sf.col("pair_count") >= self.min_pair_count
         ).drop("pair_count")
 
         pairs_metrics = pairs_count.unionByName(
@@ -263,18 +321,8 @@ class AssociationRulesItemRec(NeighbourRec):
         )
 
         if self.num_neighbours is not None:
-            pairs_metrics = (
-                pairs_metrics.withColumn(
-                    "similarity_order",
-                    sf.row_number().over(
-                        Window.partitionBy("antecedent").orderBy(
-                            sf.col("lift").desc(),
-                            sf.col("consequent").desc(),
-                        )
-                    ),
-                )
-                .filter(sf.col("similarity_order") <= self.num_neighbours)
-                .drop("similarity_order")
+            pairs_metrics = get_top_k_by_columns(
+                pairs_metrics, "antecedent", ["lift", "consequent"], self.num_neighbours
             )
 
         self.similarity = pairs_metrics.withColumn(
@@ -297,6 +345,96 @@ class AssociationRulesItemRec(NeighbourRec):
         self.similarity.cache().count()
         frequent_items_cached.unpersist()
 
+    def refit(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        """Iteratively refit with new part of interactions.
+
+        Item and pair counts saved by ``fit`` are updated with the sessions
+        of the new interactions only, pairs of earlier sessions are recounted only
+        for sessions with items, which become frequent. Metrics are recalculated from the updated counts,
+        because ``lift`` depends on the number of sessions.
+
+        :param dataset: new interactions with query/item features
+            ``[user_id, item_id, timestamp, rating]``
+        :return:
+        """
+        if self._is_fitted_native:
+            raise ValueError("refit is supported only for models fitted on Spark datasets")
+        self._refit_entities(dataset.interactions)
+
+        new_interactions = self._get_session_items(dataset)
+        sessions = new_interactions.select(self.session_column).distinct()
+        old_interactions = self.session_items.join(sessions, on=self.session_column, how="left_semi")
+        interactions = old_interactions.unionByName(new_interactions).distinct()
+        other_interactions = self.session_items.join(sessions, on=self.session_column, how="left_anti")
+        num_new_sessions = sessions.join(old_interactions, on=self.session_column, how="left_anti").count()
+
+        old_frequent_items = self._get_frequent_items(self.item_stats).select(self.item_column)
+        item_stats = self._subtract_stats(
+            self.item_stats.unionByName(self._get_item_stats(interactions)),
+            self._get_item_stats(old_interactions),
+            [self.item_column],
+            ["item_count", "item_rating"],
+        ).cache()
+        frequent_items = self._get_frequent_items(item_stats).select(self.item_column)
+        new_frequent_items = frequent_items.join(old_frequent_items, on=self.item_column, how="left_anti")
+
+        # pairs of the earlier sessions with items which become frequent are recounted:
+        # a session sample of ``max_session_items`` depends on the frequent items,
+        # so pairs of the old sample are subtracted and pairs of the new one are added
+        affected_interactions = other_interactions.join(
+            other_interactions.join(new_frequent_items, on=self.item_column, how="left_semi")
+            .select(self.session_column)
+            .distinct(),
+            on=self.session_column,
+            how="left_semi",
+        )
+        pair_stats = self._subtract_stats(
+            self.pair_stats.unionByName(
+                self._get_pair_stats(interactions.join(frequent_items, on=self.item_column, how="left_semi"))
+            ).unionByName(
+                self._get_pair_stats(affected_interactions.join(frequent_items, on=self.item_column, how="left_semi"))
+            ),
+            self._get_pair_stats(
+                old_interactions.unionByName(affected_interactions).join(
+                    old_frequent_items, on=self.item_column, how="left_semi"
+                )
+            ),
+            ["antecedent", "consequent"],
+            ["pair_count", "pair_rating"],
+        ).cache()
+        session_items = (
+            self.session_items.join(sessions, on=self.session_column, how="left_anti")
+            .unionByName(interactions)
+            .cache()
+        )
+        for dataframe in [item_stats, pair_stats, session_items]:
+            dataframe.count()
+
+        self._clear_cache()
+        self.session_items = session_items
+        self.item_stats = item_stats
+        self.pair_stats = pair_stats
+        self.num_sessions += num_new_sessions
+        self._calc_similarity()
+        self._refit_index()
+
+    def _save_model(self, path: str, additional_params: Optional[dict] = None):
+        super()._save_model(path, additional_params={"num_sessions": self.num_sessions})
+
+    @staticmethod
+    def _subtract_stats(
+        stats: SparkDataFrame, subtracted: SparkDataFrame, keys: List[str], values: List[str]
+    ) -> SparkDataFrame:
+        return (
+            stats.unionByName(subtracted.select(*keys, *[(-sf.col(value)).alias(value) for value in values]))
+            .groupBy(*keys)
+            .agg(*[sf.sum(value).alias(value) for value in values])
+            .filter(sf.col(values[0]) > 0)
+        )
+
     @property
     def get_similarity(self):
         """
@@ -367,6 +505,3 @@ class AssociationRulesItemRec(NeighbourRec):
             on="item_idx_one",
         )
 
-    @property
-    def _dataframes(self):
-        return {"similarity": self.similarity}
@@ -5,12 +5,16 @@ Part of set of abstract classes (from base_rec.py)
 """
 
 from abc import ABC
-from typing import Any, Dict, Iterable, Optional, Union
+from typing import Any, Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
 
 from replay.data.dataset import Dataset
 from replay.models.base_rec import Recommender
 from replay.models.extensions.ann.ann_mixin import ANNMixin
-from replay.utils import PYSPARK_AVAILABLE, MissingImportType, SparkDataFrame
+from replay.utils import PYSPARK_AVAILABLE, MissingImportType, PandasDataFrame, SparkDataFrame
+from replay.utils.native import sparse_product
 
 if PYSPARK_AVAILABLE:
     from pyspark.sql import functions as sf
@@ -23,19 +27,55 @@ class NeighbourRec(Recommender, ANNMixin, ABC):
     """Base class that requires interactions at prediction time"""
 
     similarity: Optional[SparkDataFrame]
+    _native_similarity: csr_matrix
     can_predict_item_to_item: bool = True
     can_predict_cold_queries: bool = True
     can_change_metric: bool = False
     item_to_item_metrics = ["similarity"]
     _similarity_metric = "similarity"
 
+    # statistics saved by ``fit`` to update the model with ``refit``
+    _refit_dataframes: Tuple[str, ...] = ()
+
     @property
     def _dataframes(self):
-        return {"similarity": self.similarity}
+        return {
+            "similarity": self.similarity,
+            **{name: getattr(self, name, None) for name in self._refit_dataframes},
+        }
 
     def _clear_cache(self):
-        if hasattr(self, "similarity"):
-            self.similarity.unpersist()
+        for name in ("similarity", *self._refit_dataframes):
+            if getattr(self, name, None) is not None:
+                getattr(self, name).unpersist()
+
+    def _refit_entities(self, interactions: SparkDataFrame) -> None:
+        """
+        Add queries and items of new interactions to the fitted ones.
+
+        :param interactions: new interactions ``[user_id, item_id, ...]``
+        """
+        if any(getattr(self, name, None) is None for name in self._refit_dataframes):
+            raise ValueError(f"{type(self).__name__} statistics required for refit were not saved by fit")
+        self.fit_queries = sf.broadcast(
+            self.fit_queries.unionByName(interactions.select(self.query_column)).distinct()
+        )
+        self.fit_items = sf.broadcast(
+            self.fit_items.unionByName(interactions.select(self.item_column)).distinct()
+        )
+        self._num_queries = self.fit_queries.count()
+        self._num_items = self.fit_items.count()
+        self._query_dim_size = self.fit_queries.agg({self.query_column: "max"}).collect()[0][0] + 1
+        self._item_dim_size = self.fit_items.agg({self.item_column: "max"}).collect()[0][0] + 1
+
+    def _refit_index(self) -> None:
+        """
+        Rebuild ANN index with the refitted similarity.
+        """
+        if self._use_ann:
+            vectors = self._get_vectors_to_build_ann(self.fit_items)
+            ann_params = self._get_ann_build_params(self.fit_items)
+            self.index_builder.build_index(vectors, **ann_params)
 
     # pylint: disable=missing-function-docstring
     @property
@@ -115,6 +155,49 @@ class NeighbourRec(Recommender, ANNMixin, ABC):
             queries=queries,
         )
 
+    # pylint: disable=too-many-arguments
+    def _predict_native_wrap(
+        self,
+        dataset: Optional[Dataset],
+        k: int,
+        queries: Optional[Union[PandasDataFrame, Iterable]] = None,
+        items: Optional[Union[PandasDataFrame, Iterable]] = None,
+        filter_seen_items: bool = True,
+    ) -> PandasDataFrame:
+        if dataset is None:
+            raise ValueError("interactions is not provided, but it is required for prediction")
+        return super()._predict_native_wrap(dataset, k, queries, items, filter_seen_items)
+
+    def _predict_pairs_native_wrap(
+        self,
+        pairs: PandasDataFrame,
+        dataset: Optional[Dataset] = None,
+        k: Optional[int] = None,
+    ) -> PandasDataFrame:
+        if dataset is None:
+            raise ValueError("interactions is not provided, but it is required for prediction")
+        return super()._predict_pairs_native_wrap(pairs, dataset, k)
+
+    def _predict_native(self, history: csr_matrix, queries: np.ndarray, items: np.ndarray) -> csr_matrix:
+        """
+        Scores are sums of similarities of items from query history, like in ``_predict_pairs_inner``.
+        ``_native_similarity`` is a sparse item-item matrix set by ``_fit_native``.
+        """
+        similarity = self._native_similarity
+        num_items = similarity.shape[0]
+        if history.shape[1] > num_items:
+            history = history.tocsc()[:, :num_items].tocsr()
+        else:
+            history = csr_matrix((history.data, history.indices, history.indptr), shape=(history.shape[0], num_items))
+        scores = sparse_product(history, similarity).tocsc()
+
+        is_known = items < num_items
+        known_scores = scores[:, items[is_known]].tocoo()
+        return csr_matrix(
+            (known_scores.data, (known_scores.row, np.flatnonzero(is_known)[known_scores.col])),
+            shape=(len(queries), len(items)),
+        )
+
     def _predict_pairs(
         self,
         pairs: SparkDataFrame,
@@ -19,14 +19,24 @@ from os.path import join
 from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Union
 
 import numpy as np
+import pandas as pd
 from numpy.random import default_rng
-from optuna import create_study
+from optuna import create_study, delete_study
 from optuna.samplers import TPESampler
+from optuna.storages import JournalFileStorage, JournalStorage
+from scipy.sparse import csr_matrix
 
 from replay.data import Dataset, get_schema
 from replay.metrics import NDCG, Metric
-from replay.optimization.optuna_objective import MainObjective, SplitData
+from replay.optimization.optuna_objective import (
+    ConcurrentObjective,
+    MainObjective,
+    SplitData,
+    prepare_ground_truth,
+)
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
+from replay.utils.instrumentation import Instrumentation, instrumented_stage, instrumented_stage_of
+from replay.utils.native import get_ids, interactions_to_csr, query_blocks, to_dense_scores, top_k_dense
 from replay.utils.session_handler import State
 
 if PYSPARK_AVAILABLE:
@@ -39,7 +49,7 @@ if PYSPARK_AVAILABLE:
         cosine_similarity,
         drop_temp_view,
         filter_cold,
-        get_top_k,
+        get_top_k_by_columns,
         get_top_k_recs,
         get_unique_entities,
         load_pickled_from_parquet,
@@ -156,6 +166,8 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
     _objective = MainObjective
     study = None
     criterion = None
+    # set to ``Instrumentation()`` to record timings and Spark statistics of fit/predict stages
+    instrumentation: Optional[Instrumentation] = None
     fit_queries: SparkDataFrame
     fit_items: SparkDataFrame
     _num_queries: int
@@ -173,6 +185,8 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         k: int = 10,
         budget: int = 10,
         new_study: bool = True,
+        n_jobs: int = 1,
+        storage_path: Optional[str] = None,
     ) -> Optional[Dict[str, Any]]:
         """
         Searches the best parameters with optuna.
@@ -187,6 +201,13 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         :param k: recommendation list length
         :param budget: number of points to try
         :param new_study: keep searching with previous study or start a new study
+        :param n_jobs: number of trials to run concurrently from a thread pool.
+            Each trial submits Spark jobs into its own scheduler pool,
+            set ``spark.scheduler.mode`` to ``FAIR`` to share the cluster between them.
+        :param storage_path: path to a local journal file to store the study in.
+            Several processes optimizing the same model with the same file share one study,
+            processes joining the study should pass ``new_study=False``,
+            as ``new_study=True`` removes the study stored in the file.
         :return: dictionary with best parameters
         """
         self.query_column = train_dataset.feature_schema.query_id_column
@@ -208,8 +229,20 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
             return None
 
         if self.study is None or new_study:
+            storage = None
+            if storage_path is not None:
+                storage = JournalStorage(JournalFileStorage(storage_path))
+                if new_study:
+                    try:
+                        delete_study(study_name=str(self), storage=storage)
+                    except KeyError:
+                        pass
             self.study = create_study(
-                direction="maximize", sampler=TPESampler()
+                direction="maximize",
+                sampler=TPESampler(),
+                storage=storage,
+                study_name=str(self) if storage is not None else None,
+                load_if_exists=storage is not None,
             )
 
         search_space = self._prepare_param_borders(param_borders)
@@ -220,6 +253,12 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
             self.study.enqueue_trial(self._init_args)
 
         split_data = self._prepare_split_data(train_dataset, test_dataset)
+        # every trial reads the same data, so it is cached once for the whole study
+        dataframes_to_cache = [
+            dataframe for dataframe in self._get_split_data_dataframes(split_data) if not dataframe.is_cached
+        ]
+        for dataframe in dataframes_to_cache:
+            dataframe.cache()
         objective = self._objective(
             search_space=search_space,
             split_data=split_data,
@@ -227,8 +266,14 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
             criterion=self.criterion,
             k=k,
         )
-
-        self.study.optimize(objective, budget)
+        if n_jobs != 1:
+            objective = ConcurrentObjective(objective)
+
+        try:
+            self.study.optimize(objective, budget, n_jobs=n_jobs)
+        finally:
+            for dataframe in dataframes_to_cache:
+                dataframe.unpersist()
         best_params = self.study.best_params
         self.set_params(**best_params)
         return best_params
@@ -329,6 +374,7 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
     ) -> SplitData:
         """
         This method converts data to spark and packs it into a named tuple to pass into optuna.
+        Items of the test queries are grouped for the criterion once for all trials.
 
         :param train_dataset: train data
         :param test_dataset: test data
@@ -343,9 +389,23 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
             test,
             queries,
             items,
+            prepare_ground_truth(self.criterion, test.interactions),
         )
         return split_data
 
+    @staticmethod
+    def _get_split_data_dataframes(split_data: SplitData) -> List[SparkDataFrame]:
+        dataframes = [split_data.queries, split_data.items]
+        if split_data.ground_truth is not None:
+            dataframes.append(split_data.ground_truth)
+        for dataset in (split_data.train_dataset, split_data.test_dataset):
+            dataframes.extend(
+                dataframe
+                for dataframe in (dataset.interactions, dataset.query_features, dataset.item_features)
+                if dataframe is not None
+            )
+        return dataframes
+
     @staticmethod
     def _filter_dataset_features(
         dataset: Dataset,
@@ -385,6 +445,7 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
             categorical_encoded=False,
         )
 
+    @instrumented_stage("fit")
     def _fit_wrap(
         self,
         dataset: Dataset,
@@ -401,6 +462,9 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         self.rating_column = dataset.feature_schema.interactions_rating_column
         self.timestamp_column = dataset.feature_schema.interactions_timestamp_column
         self.logger.debug("Starting fit %s", type(self).__name__)
+        if dataset.is_pandas and self._can_fit_native:
+            self._fit_native_wrap(dataset)
+            return
         if dataset.query_features is None:
             queries = dataset.interactions.select(self.query_column).distinct()
         else:
@@ -442,54 +506,194 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         :return:
         """
 
-    def _filter_seen(
-        self, recs: SparkDataFrame, interactions: SparkDataFrame, k: int, queries: SparkDataFrame
-    ):
+    def _fit_native_wrap(self, dataset: Dataset) -> None:
         """
-        Filter seen items (presented in interactions) out of the queries' recommendations.
-        For each query return from `k` to `k + number of seen by query` recommendations.
+        Fit the model in-process on a pandas dataset.
+        Fitted queries and items are stored as pandas dataframes.
         """
-        queries_interactions = interactions.join(queries, on=self.query_column)
-        self._cache_model_temp_view(queries_interactions, "filter_seen_queries_interactions")
-        num_seen = queries_interactions.groupBy(self.query_column).agg(
-            sf.count(self.item_column).alias("seen_count")
+        entities = {}
+        for entity, column, features in [
+            ("query", self.query_column, dataset.query_features),
+            ("item", self.item_column, dataset.item_features),
+        ]:
+            ids = dataset.interactions[column]
+            if features is not None:
+                ids = pd.concat([ids, features[column]])
+            entities[entity] = PandasDataFrame({column: get_ids(ids, column)})
+        self.fit_queries, self.fit_items = entities["query"], entities["item"]
+        self._num_queries = len(self.fit_queries)
+        self._num_items = len(self.fit_items)
+        self._query_dim_size = int(self.fit_queries[self.query_column].max()) + 1
+        self._item_dim_size = int(self.fit_items[self.item_column].max()) + 1
+        self._fit_native(dataset)
+
+    def _fit_native(self, dataset: Dataset) -> None:
+        """
+        Inner method where model fits on a pandas dataset with numpy and scipy.
+
+        :param dataset: historical interactions with query/item features
+            ``[user_idx, item_idx, timestamp, rating]`` as pandas dataframes
+        """
+        raise NotImplementedError(f"{type(self).__name__} can be fitted only on Spark datasets")
+
+    def _predict_native(
+        self, history: csr_matrix, queries: np.ndarray, items: np.ndarray
+    ) -> Union[np.ndarray, csr_matrix]:
+        """
+        Inner method where model fitted on a pandas dataset calculates scores.
+
+        :param history: interactions counts of ``queries``, rows correspond to ``queries``,
+            columns to item ids
+        :param queries: sorted query ids
+        :param items: sorted item ids to score
+        :return: dense ``len(queries) x len(items)`` scores, ``NaN`` means the item is not recommended,
+            or a sparse matrix of the same shape with scores of recommended items only
+        """
+        raise NotImplementedError(f"{type(self).__name__} can predict only on Spark datasets")
+
+    def _get_native_history(self, interactions: Optional[PandasDataFrame], queries: np.ndarray) -> csr_matrix:
+        num_items = self._item_dim_size
+        if interactions is None or interactions.empty:
+            return csr_matrix((len(queries), num_items))
+        interactions = interactions[interactions[self.query_column].isin(queries)]
+        if not interactions.empty:
+            num_items = max(num_items, int(interactions[self.item_column].max()) + 1)
+        return interactions_to_csr(
+            interactions.assign(**{self.query_column: np.searchsorted(queries, interactions[self.query_column])}),
+            self.query_column,
+            self.item_column,
+            shape=(len(queries), num_items),
         )
-        self._cache_model_temp_view(num_seen, "filter_seen_num_seen")
 
-        # count maximal number of items seen by queries
-        max_seen = 0
-        if num_seen.count() > 0:
-            max_seen = num_seen.select(sf.max("seen_count")).collect()[0][0]
+    def _filter_cold_native(self, ids: np.ndarray, entity: str) -> np.ndarray:
+        can_predict_cold = self.can_predict_cold_queries if entity == "query" else self.can_predict_cold_items
+        if can_predict_cold:
+            return ids
+        fit_entities = self.fit_queries if entity == "query" else self.fit_items
+        column = self.query_column if entity == "query" else self.item_column
+        is_warm = np.isin(ids, fit_entities[column].to_numpy())
+        if not is_warm.all():
+            self.logger.info("%s model can't predict cold %ss, they will be ignored", self, entity)
+        return ids[is_warm]
+
+    def _get_native_scores(
+        self, history: csr_matrix, queries: np.ndarray, items: np.ndarray, filter_seen_items: bool
+    ) -> np.ndarray:
+        scores = to_dense_scores(self._predict_native(history, queries, items))
+        if filter_seen_items:
+            items_in_history = items[items < history.shape[1]]
+            seen = history[:, items_in_history].tocoo()
+            scores[seen.row, seen.col] = np.nan
+        return scores
 
-        # crop recommendations to first k + max_seen items for each query
-        recs = recs.withColumn(
-            "temp_rank",
-            sf.row_number().over(
-                Window.partitionBy(self.query_column).orderBy(
-                    sf.col(self.rating_column).desc()
+    # pylint: disable=too-many-arguments
+    def _predict_native_wrap(
+        self,
+        dataset: Optional[Dataset],
+        k: int,
+        queries: Optional[Union[PandasDataFrame, Iterable]] = None,
+        items: Optional[Union[PandasDataFrame, Iterable]] = None,
+        filter_seen_items: bool = True,
+    ) -> PandasDataFrame:
+        """
+        Predict in-process for a model fitted on a pandas dataset,
+        scores of query blocks are calculated by ``_predict_native``.
+        Ties are resolved by the smaller item id.
+        """
+        interactions = dataset.interactions if dataset is not None else None
+        query_ids = get_ids(queries, self.query_column)
+        if query_ids is None:
+            query_ids = get_ids(interactions if interactions is not None else self.fit_queries, self.query_column)
+        query_ids = self._filter_cold_native(query_ids, "query")
+        item_ids = get_ids(items, self.item_column)
+        if item_ids is None:
+            item_ids = self.fit_items[self.item_column].to_numpy()
+        item_ids = self._filter_cold_native(item_ids, "item")
+
+        history = self._get_native_history(interactions, query_ids)
+        recs = []
+        for block in query_blocks(len(query_ids), len(item_ids)):
+            scores = self._get_native_scores(
+                history[block], query_ids[block], item_ids, filter_seen_items and interactions is not None
+            )
+            rows, cols = top_k_dense(scores, k)
+            recs.append(
+                PandasDataFrame(
+                    {
+                        self.query_column: query_ids[block][rows],
+                        self.item_column: item_ids[cols],
+                        self.rating_column: scores[rows, cols],
+                    }
                 )
-            ),
-        ).filter(sf.col("temp_rank") <= sf.lit(max_seen + k))
-
-        # leave k + number of items seen by query recommendations in recs
-        recs = (
-            recs.join(num_seen, on=self.query_column, how="left")
-            .fillna(0)
-            .filter(sf.col("temp_rank") <= sf.col("seen_count") + sf.lit(k))
-            .drop("temp_rank", "seen_count")
-        )
+            )
+        if not recs:
+            return PandasDataFrame(columns=[self.query_column, self.item_column, self.rating_column])
+        return pd.concat(recs, ignore_index=True)
 
-        # filter recommendations presented in interactions interactions
-        recs = recs.join(
-            queries_interactions.withColumnRenamed(self.item_column, "item")
-            .withColumnRenamed(self.query_column, "query")
-            .select("query", "item"),
-            on=(sf.col(self.query_column) == sf.col("query"))
-            & (sf.col(self.item_column) == sf.col("item")),
-            how="anti",
-        ).drop("query", "item")
+    def _predict_pairs_native_wrap(
+        self,
+        pairs: PandasDataFrame,
+        dataset: Optional[Dataset] = None,
+        k: Optional[int] = None,
+    ) -> PandasDataFrame:
+        """
+        Predict in-process for query-item ``pairs`` with a model fitted on a pandas dataset.
+        Pairs which the model can't score are removed.
+        """
+        pairs = pairs[[self.query_column, self.item_column]]
+        pairs = pairs[
+            pairs[self.query_column].isin(self._filter_cold_native(get_ids(pairs, self.query_column), "query"))
+            & pairs[self.item_column].isin(self._filter_cold_native(get_ids(pairs, self.item_column), "item"))
+        ]
+        query_ids = get_ids(pairs, self.query_column)
+        item_ids = get_ids(pairs, self.item_column)
+        history = self._get_native_history(dataset.interactions if dataset is not None else None, query_ids)
+
+        ratings = np.full(len(pairs), np.nan)
+        pair_rows = np.searchsorted(query_ids, pairs[self.query_column].to_numpy())
+        pair_cols = np.searchsorted(item_ids, pairs[self.item_column].to_numpy())
+        for block in query_blocks(len(query_ids), len(item_ids)):
+            in_block = (pair_rows >= block.start) & (pair_rows < block.stop)
+            scores = self._get_native_scores(history[block], query_ids[block], item_ids, filter_seen_items=False)
+            ratings[in_block] = scores[pair_rows[in_block] - block.start, pair_cols[in_block]]
+
+        pred = pairs.assign(**{self.rating_column: ratings})
+        pred = pred[np.isfinite(ratings)]
+        if k:
+            pred = (
+                pred.sort_values(
+                    [self.query_column, self.rating_column, self.item_column], ascending=[True, False, True]
+                )
+                .groupby(self.query_column)
+                .head(k)
+            )
+        return pred.reset_index(drop=True)
 
-        return recs
+    @staticmethod
+    def _return_native_recs(recs: PandasDataFrame, recs_file_path: Optional[str]) -> Optional[PandasDataFrame]:
+        if recs_file_path is None:
+            return recs
+        recs.to_parquet(recs_file_path)
+        return None
+
+    @instrumented_stage("filter_seen")
+    def _filter_seen(self, recs: SparkDataFrame, seen_items: SparkDataFrame) -> SparkDataFrame:
+        """
+        Filter seen items out of the queries' recommendations.
+
+        :param recs: recommendations ``[user_idx, item_idx, rating]``
+        :param seen_items: sorted arrays of items seen by queries ``[user_idx, seen_items]``,
+            see ``Dataset.get_seen_items``
+        :return: recommendations without seen items
+        """
+        return (
+            recs.join(seen_items, on=self.query_column, how="left")
+            .filter(
+                sf.col("seen_items").isNull()
+                | ~sf.array_contains(sf.col("seen_items"), sf.col(self.item_column))
+            )
+            .drop("seen_items")
+        )
 
     def _filter_interactions_queries_items_dataframes(
         self,
@@ -547,6 +751,7 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         return dataset, queries, items
 
     # pylint: disable=too-many-arguments
+    @instrumented_stage("predict")
     def _predict_wrap(
         self,
         dataset: Optional[Dataset],
@@ -579,29 +784,38 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         :return: cached recommendation dataframe with columns ``[user_idx, item_idx, rating]``
             or None if `file_path` is provided
         """
+        if self._is_fitted_native:
+            recs = self._predict_native_wrap(dataset, k, queries, items, filter_seen_items)
+            return self._return_native_recs(recs, recs_file_path)
+
         dataset, queries, items = self._filter_interactions_queries_items_dataframes(
             dataset, k, queries, items
         )
+        # seen items of the predicted queries only, the aggregate is not cached, so nothing is left after predict
+        seen_items = dataset.get_seen_items(queries) if filter_seen_items and dataset is not None else None
+
+        with instrumented_stage_of(self, "score"):
+            recs = self._predict(
+                dataset,
+                k,
+                queries,
+                items,
+                filter_seen_items,
+            )
+        if seen_items is not None:
+            recs = self._filter_seen(recs=recs, seen_items=seen_items)
 
-        recs = self._predict(
-            dataset,
-            k,
-            queries,
-            items,
-            filter_seen_items,
-        )
-        if filter_seen_items and dataset is not None:
-            recs = self._filter_seen(recs=recs, interactions=dataset.interactions, queries=queries, k=k)
-
-        recs = get_top_k_recs(recs, k=k, query_column=self.query_column, rating_column=self.rating_column).select(
+        recs = get_top_k_recs(
+            recs, k=k, query_column=self.query_column, rating_column=self.rating_column, item_column=self.item_column
+        ).select(
             self.query_column, self.item_column, self.rating_column
         )
 
-        output = return_recs(recs, recs_file_path)
-        self._clear_model_temp_view("filter_seen_queries_interactions")
-        self._clear_model_temp_view("filter_seen_num_seen")
+        with instrumented_stage_of(self, "return_recs"):
+            output = return_recs(recs, recs_file_path)
         return output
 
+    @instrumented_stage("filter_cold_for_predict")
     def _filter_cold_for_predict(
         self,
         main_df: SparkDataFrame,
@@ -661,6 +875,20 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
             ``[user_idx, item_idx, rating]``
         """
 
+    @property
+    def _can_fit_native(self) -> bool:
+        """
+        :returns: whether the model has an in-process implementation for pandas datasets
+        """
+        return type(self)._fit_native is not BaseRecommender._fit_native
+
+    @property
+    def _is_fitted_native(self) -> bool:
+        """
+        :returns: whether the model was fitted on a pandas dataset
+        """
+        return isinstance(getattr(self, "fit_queries", None), PandasDataFrame)
+
     def _get_fit_counts(self, entity: str) -> int:
         num_entities = "_num_queries" if entity == "query" else "_num_items"
         fit_entities = self.fit_queries if entity == "query" else self.fit_items
@@ -756,6 +984,9 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         :return: cached dataframe with columns ``[user_idx, item_idx, rating]``
             or None if `file_path` is provided
         """
+        if self._is_fitted_native:
+            return self._return_native_recs(self._predict_pairs_native_wrap(pairs, dataset, k), recs_file_path)
+
         if dataset is not None:
             interactions, query_features, item_features, pairs = [
                 convert2spark(df)
@@ -781,13 +1012,12 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         )
 
         if k:
-            pred = get_top_k(
-                dataframe=pred,
-                partition_by_col=sf.col(self.query_column),
-                order_by_col=[
-                    sf.col(self.rating_column).desc(),
-                ],
+            pred = get_top_k_recs(
+                pred,
                 k=k,
+                query_column=self.query_column,
+                rating_column=self.rating_column,
+                item_column=self.item_column,
             )
 
         if recs_file_path is not None:
@@ -881,14 +1111,8 @@ class BaseRecommender(RecommenderCommons, IsSavable, ABC):
         )
 
         rel_col_name = metric if metric is not None else "similarity"
-        nearest_items = get_top_k(
-            dataframe=nearest_items_to_filter,
-            partition_by_col=sf.col("item_idx_one"),
-            order_by_col=[
-                sf.col(rel_col_name).desc(),
-                sf.col("item_idx_two").desc(),
-            ],
-            k=k,
+        nearest_items = get_top_k_by_columns(
+            nearest_items_to_filter, "item_idx_one", [rel_col_name, "item_idx_two"], k
         )
 
         nearest_items = nearest_items.withColumnRenamed(
@@ -1455,6 +1679,37 @@ class NonPersonalizedRecommender(Recommender, ABC):
         if vals.count() > 0:
             raise ValueError("Rating values in interactions must be 0 or 1")
 
+    @staticmethod
+    def _check_rating_native(dataset: Dataset):
+        ratings = dataset.interactions[dataset.feature_schema.interactions_rating_column]
+        if not ratings.isin([0, 1]).all():
+            raise ValueError("Rating values in interactions must be 0 or 1")
+
+    def _set_native_item_popularity(self, items: np.ndarray, popularity: np.ndarray, fill: Optional[float] = None):
+        """
+        Store popularity of items fitted on a pandas dataset as an array indexed by item id.
+
+        :param items: item ids
+        :param popularity: popularity of ``items``
+        :param fill: rating of cold items, the minimal popularity multiplied by ``cold_weight`` if ``None``
+        """
+        self._native_item_popularity = np.full(self._item_dim_size, np.nan)
+        self._native_item_popularity[items] = popularity
+        self.fill = float(np.min(popularity)) * self.cold_weight if fill is None else fill
+
+    @property
+    def _can_fit_native(self) -> bool:
+        # sampling of recommendations is implemented only with Spark
+        return super()._can_fit_native and not self.sample
+
+    def _predict_native(self, history: csr_matrix, queries: np.ndarray, items: np.ndarray) -> np.ndarray:
+        scores = np.full(len(items), np.nan)
+        is_known = items < len(self._native_item_popularity)
+        scores[is_known] = self._native_item_popularity[items[is_known]]
+        if self.add_cold_items:
+            scores[np.isnan(scores)] = self.fill
+        return np.broadcast_to(scores, (len(queries), len(items)))
+
     def _get_selected_item_popularity(self, items: SparkDataFrame) -> SparkDataFrame:
         """
         Choose only required item from `item_popularity` dataframe
@@ -81,6 +81,11 @@ class ANNMixin(BaseRecommender):
             ann_params = self._get_ann_build_params(dataset.interactions)
             self.index_builder.build_index(vectors, **ann_params)
 
+    @property
+    def _can_fit_native(self) -> bool:
+        # index is built and inferred only with Spark
+        return super()._can_fit_native and not self._use_ann
+
     @abstractmethod
     def _get_vectors_to_infer_ann_inner(
         self, interactions: SparkDataFrame, queries: SparkDataFrame
@@ -144,9 +149,17 @@ class ANNMixin(BaseRecommender):
         filter_seen_items: bool = True,
         recs_file_path: Optional[str] = None,
     ) -> Optional[SparkDataFrame]:
+        if self._is_fitted_native:
+            return super()._predict_wrap(dataset, k, queries, items, filter_seen_items, recs_file_path)
+
         dataset, queries, items = self._filter_interactions_queries_items_dataframes(
             dataset, k, queries, items
         )
+        seen_items = (
+            dataset.get_seen_items(queries)
+            if filter_seen_items and dataset is not None and not self._use_ann
+            else None
+        )
 
         if self._use_ann:
             vectors = self._get_vectors_to_infer_ann(
@@ -165,17 +178,14 @@ class ANNMixin(BaseRecommender):
             )
 
         if not self._use_ann:
-            if filter_seen_items and dataset.interactions:
-                recs = self._filter_seen(recs=recs, interactions=dataset.interactions, queries=queries, k=k)
+            if seen_items is not None:
+                recs = self._filter_seen(recs=recs, seen_items=seen_items)
 
             recs = get_top_k_recs(recs, k=k, query_column=self.query_column, rating_column=self.rating_column).select(
                 self.query_column, self.item_column, self.rating_column
             )
 
-        output = return_recs(recs, recs_file_path)
-        self._clear_model_temp_view("filter_seen_queries_interactions")
-        self._clear_model_temp_view("filter_seen_num_seen")
-        return output
+        return return_recs(recs, recs_file_path)
 
     def _save_index(self, path):
         self.index_builder.index_store.dump_index(path)
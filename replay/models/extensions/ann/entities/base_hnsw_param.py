@@ -13,6 +13,10 @@ class BaseHnswParam:
     ef_c: int = 20000
     post: int = 0
     ef_s: Optional[int] = None
+    # Number of threads used by the index to answer queries of one batch
+    num_threads: int = 1
+    # Max number of queries per index call, the whole Arrow batch is used if None
+    batch_size: Optional[int] = None
 
     def init_meta_as_dict(self) -> dict:
         """
@@ -28,5 +32,7 @@ class BaseHnswParam:
                 "ef_c": self.ef_c,
                 "post": self.post,
                 "ef_s": self.ef_s,
+                "num_threads": self.num_threads,
+                "batch_size": self.batch_size,
             },
         }
@@ -18,7 +18,7 @@ class HnswlibParam(BaseHnswParam):
                      post=0,\
                      ef_s=2000,\
         )
-    HnswlibParam(space='ip', m=100, ef_c=200, post=0, ef_s=2000, dim=None, max_elements=None)
+    HnswlibParam(space='ip', m=100, ef_c=200, post=0, ef_s=2000, num_threads=1, batch_size=None, dim=None, max_elements=None)
 
     or
 
@@ -27,8 +27,10 @@ class HnswlibParam(BaseHnswParam):
                      ef_c=200,\
                      post=0,\
                      ef_s=2000,\
+                     num_threads=4,\
+                     batch_size=1024,\
         )
-    HnswlibParam(space='ip', m=100, ef_c=200, post=0, ef_s=2000, dim=None, max_elements=None)
+    HnswlibParam(space='ip', m=100, ef_c=200, post=0, ef_s=2000, num_threads=4, batch_size=1024, dim=None, max_elements=None)
 
     The "space" parameter described on the page https://github.com/nmslib/hnswlib/blob/master/README.md#supported-distances
     Parameters "m", "ef_s" and "ef_c" are described at https://github.com/nmslib/hnswlib/blob/master/ALGO_PARAMS.md
@@ -52,6 +54,13 @@ class HnswlibParam(BaseHnswParam):
 
     note: even in a case with a long training time,
     profit from ann could be obtained while inference will be used multiple times.
+
+    Parameters "num_threads" and "batch_size" are used at the inference stage:
+    queries are sent to the index in batches of ``batch_size`` vectors
+    (the whole Arrow batch of a Spark task if ``None``)
+    and every batch is processed with ``num_threads`` threads.
+    Set ``num_threads`` close to the number of cores available to a Spark task
+    (see ``spark.task.cpus``) to avoid oversubscription of executors.
     """
 
     space: Literal["l2", "ip", "cosine"] = "ip"
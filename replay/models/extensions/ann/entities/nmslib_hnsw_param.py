@@ -19,7 +19,7 @@ class NmslibHnswParam(BaseHnswParam):
                         ef_c=200,\
                         post=0,\
         )
-    NmslibHnswParam(space='negdotprod_sparse', m=10, ef_c=200, post=0, ef_s=200, items_count=None)
+    NmslibHnswParam(space='negdotprod_sparse', m=10, ef_c=200, post=0, ef_s=200, num_threads=1, batch_size=None, items_count=None)
 
     or
 
@@ -28,8 +28,10 @@ class NmslibHnswParam(BaseHnswParam):
                         ef_s=200,\
                         ef_c=200,\
                         post=0,\
+                        num_threads=4,\
+                        batch_size=1024,\
         )
-    NmslibHnswParam(space='negdotprod_sparse', m=10, ef_c=200, post=0, ef_s=200, items_count=None)
+    NmslibHnswParam(space='negdotprod_sparse', m=10, ef_c=200, post=0, ef_s=200, num_threads=4, batch_size=1024, items_count=None)
 
     The reasonable range of values for `m` parameter is 5-100,
     for `ef_c` and `ef_s` is 100-2000.
@@ -51,6 +53,13 @@ class NmslibHnswParam(BaseHnswParam):
     note: even in a case with a long training time,
     profit from ann could be obtained while inference will be used multiple times.
 
+    Parameters "num_threads" and "batch_size" are used at the inference stage:
+    queries are sent to the index in batches of ``batch_size`` vectors
+    (the whole Arrow batch of a Spark task if ``None``)
+    and every batch is processed with ``num_threads`` threads.
+    Set ``num_threads`` close to the number of cores available to a Spark task
+    (see ``spark.task.cpus``) to avoid oversubscription of executors.
+
     For more details see https://github.com/nmslib/nmslib/blob/master/manual/methods.md.
     """
 
@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 
 from replay.models.extensions.ann.index_inferers.base_inferer import IndexInferer
+from replay.models.extensions.ann.index_inferers.utils import get_batch_slices
 from replay.models.extensions.ann.utils import create_hnswlib_index_instance
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
 from replay.utils.session_handler import State
@@ -39,26 +40,30 @@ class HnswlibFilterIndexInferer(IndexInferer):
                 else None,
             )
 
-            # max number of items to retrieve per batch
-            max_items_to_retrieve = num_items.max()
-
-            labels, distances = index.knn_query(
-                np.stack(vectors.values),
-                k=k + max_items_to_retrieve,
-                num_threads=1,
-            )
-
+            vectors_np = np.stack(vectors.values)
             filtered_labels = []
             filtered_distances = []
-            for i, item_ids in enumerate(labels):
-                non_seen_item_indexes = ~np.isin(
-                    item_ids, seen_item_ids[i], assume_unique=True
-                )
-                filtered_labels.append((item_ids[non_seen_item_indexes])[:k])
-                filtered_distances.append(
-                    (distances[i][non_seen_item_indexes])[:k]
+            for batch in get_batch_slices(len(vectors_np), index_params.batch_size):
+                # max number of items to retrieve per batch
+                max_items_to_retrieve = num_items.iloc[batch].max()
+
+                labels, distances = index.knn_query(
+                    vectors_np[batch],
+                    k=k + max_items_to_retrieve,
+                    num_threads=index_params.num_threads,
                 )
 
+                for item_ids, item_distances, seen in zip(
+                    labels, distances, seen_item_ids.iloc[batch]
+                ):
+                    non_seen_item_indexes = ~np.isin(
+                        item_ids, seen, assume_unique=True
+                    )
+                    filtered_labels.append((item_ids[non_seen_item_indexes])[:k])
+                    filtered_distances.append(
+                        (item_distances[non_seen_item_indexes])[:k]
+                    )
+
             pd_res = pd.DataFrame(
                 {
                     "item_idx": filtered_labels,
@@ -2,6 +2,7 @@ import numpy as np
 import pandas as pd
 
 from replay.models.extensions.ann.index_inferers.base_inferer import IndexInferer
+from replay.models.extensions.ann.index_inferers.utils import get_batch_slices
 from replay.models.extensions.ann.utils import create_hnswlib_index_instance
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
 from replay.utils.session_handler import State
@@ -35,15 +36,18 @@ class HnswlibIndexInferer(IndexInferer):
                 else None,
             )
 
-            labels, distances = index.knn_query(
-                np.stack(vectors.values),
-                k=k,
-                num_threads=1,
-            )
-
-            pd_res = pd.DataFrame(
-                {"item_idx": list(labels), "distance": list(distances)}
-            )
+            vectors_np = np.stack(vectors.values)
+            labels, distances = [], []
+            for batch in get_batch_slices(len(vectors_np), index_params.batch_size):
+                batch_labels, batch_distances = index.knn_query(
+                    vectors_np[batch],
+                    k=k,
+                    num_threads=index_params.num_threads,
+                )
+                labels.extend(batch_labels)
+                distances.extend(batch_distances)
+
+            pd_res = pd.DataFrame({"item_idx": labels, "distance": distances})
 
             return pd_res
 
@@ -2,7 +2,7 @@ import numpy as np
 import pandas as pd
 
 from replay.models.extensions.ann.index_inferers.base_inferer import IndexInferer
-from replay.models.extensions.ann.index_inferers.utils import get_csr_matrix
+from replay.models.extensions.ann.index_inferers.utils import get_batch_slices, get_csr_matrix
 from replay.models.extensions.ann.utils import create_nmslib_index_instance
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
 from replay.utils.session_handler import State
@@ -46,30 +46,33 @@ class NmslibFilterIndexInferer(IndexInferer):
                 else None,
             )
 
-            # max number of items to retrieve per batch
-            max_items_to_retrieve = num_items.max()
-
             user_vectors = get_csr_matrix(
                 user_idx, vector_items, vector_ratings
             )
 
-            neighbours = index.knnQueryBatch(
-                user_vectors[user_idx.values, :],
-                k=k + max_items_to_retrieve,
-                num_threads=1,
-            )
-
             neighbours_filtered = []
-            for i, (item_idxs, distances) in enumerate(neighbours):
-                non_seen_item_indexes = ~np.isin(
-                    item_idxs, seen_item_ids[i], assume_unique=True
+            for batch in get_batch_slices(len(user_idx), index_params.batch_size):
+                # max number of items to retrieve per batch
+                max_items_to_retrieve = num_items.iloc[batch].max()
+
+                neighbours = index.knnQueryBatch(
+                    user_vectors[user_idx.values[batch], :],
+                    k=k + max_items_to_retrieve,
+                    num_threads=index_params.num_threads,
                 )
-                neighbours_filtered.append(
-                    (
-                        (item_idxs[non_seen_item_indexes])[:k],
-                        (distances[non_seen_item_indexes])[:k],
+
+                for (item_idxs, distances), seen in zip(
+                    neighbours, seen_item_ids.iloc[batch]
+                ):
+                    non_seen_item_indexes = ~np.isin(
+                        item_idxs, seen, assume_unique=True
+                    )
+                    neighbours_filtered.append(
+                        (
+                            (item_idxs[non_seen_item_indexes])[:k],
+                            (distances[non_seen_item_indexes])[:k],
+                        )
                     )
-                )
 
             pd_res = PandasDataFrame(
                 neighbours_filtered, columns=["item_idx", "distance"]
@@ -1,7 +1,7 @@
 import pandas as pd
 
 from replay.models.extensions.ann.index_inferers.base_inferer import IndexInferer
-from replay.models.extensions.ann.index_inferers.utils import get_csr_matrix
+from replay.models.extensions.ann.index_inferers.utils import get_batch_slices, get_csr_matrix
 from replay.models.extensions.ann.utils import create_nmslib_index_instance
 from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
 from replay.utils.session_handler import State
@@ -46,9 +46,15 @@ class NmslibIndexInferer(IndexInferer):
             user_vectors = get_csr_matrix(
                 user_idx, vector_items, vector_ratings
             )
-            neighbours = index.knnQueryBatch(
-                user_vectors[user_idx.values, :], k=k, num_threads=1
-            )
+            neighbours = []
+            for batch in get_batch_slices(len(user_idx), index_params.batch_size):
+                neighbours.extend(
+                    index.knnQueryBatch(
+                        user_vectors[user_idx.values[batch], :],
+                        k=k,
+                        num_threads=index_params.num_threads,
+                    )
+                )
 
             pd_res = PandasDataFrame(neighbours, columns=["item_idx", "distance"])
 
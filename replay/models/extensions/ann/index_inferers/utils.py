@@ -1,3 +1,5 @@
+from typing import Iterator, Optional
+
 import pandas as pd
 from scipy.sparse import csr_matrix
 
@@ -28,3 +30,13 @@ def get_csr_matrix(
             + 1,
         ),
     )
+
+
+def get_batch_slices(num_rows: int, batch_size: Optional[int]) -> Iterator[slice]:
+    """
+    Splits ``num_rows`` rows of a pandas batch into consecutive slices
+    of at most ``batch_size`` rows. The whole batch is a single slice if ``batch_size`` is ``None``.
+    """
+    step = batch_size if batch_size else max(num_rows, 1)
+    for start in range(0, num_rows, step):
+        yield slice(start, start + step)
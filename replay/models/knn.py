@@ -1,14 +1,20 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
 
 from replay.data import Dataset
 from replay.models.base_neighbour_rec import NeighbourRec
 from replay.models.extensions.ann.index_builders.base_index_builder import IndexBuilder
 from replay.optimization.optuna_objective import ItemKNNObjective
-from replay.utils import PYSPARK_AVAILABLE, SparkDataFrame
+from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
+from replay.utils.native import interactions_to_csr, sparse_product, top_k_sparse
 
 if PYSPARK_AVAILABLE:
     from pyspark.sql import functions as sf
-    from pyspark.sql.window import Window
+
+    from replay.utils.spark_utils import get_top_k_by_columns
 
 
 # pylint: disable=too-many-ancestors, too-many-instance-attributes
@@ -21,10 +27,13 @@ class ItemKNN(NeighbourRec):
         }
 
     all_items: Optional[SparkDataFrame]
-    dot_products: Optional[SparkDataFrame]
-    item_norms: Optional[SparkDataFrame]
+    query_item_ratings: Optional[SparkDataFrame] = None
+    dot_products: Optional[SparkDataFrame] = None
+    item_square_norms: Optional[SparkDataFrame] = None
+    _refit_dataframes = ("query_item_ratings", "dot_products", "item_square_norms")
     bm25_k1 = 1.2
     bm25_b = 0.75
+    _valid_similarity_backends = ("join", "sparse")
     _objective = ItemKNNObjective
     _search_space = {
         "num_neighbours": {"type": "int", "args": [1, 100]},
@@ -39,6 +48,7 @@ class ItemKNN(NeighbourRec):
         shrink: float = 0.0,
         weighting: str = None,
         index_builder: Optional[IndexBuilder] = None,
+        similarity_backend: str = "join",
     ):
         """
         :param num_neighbours: number of neighbours
@@ -47,6 +57,11 @@ class ItemKNN(NeighbourRec):
         :param weighting: item reweighting type, one of [None, 'tf_idf', 'bm25']
         :param index_builder: `IndexBuilder` instance that adds ANN functionality.
             If not set, then ann will not be used.
+        :param similarity_backend: how item dot products are calculated, one of ['join', 'sparse'].
+            'join' uses a self-join of interactions on the query column.
+            'sparse' groups interactions by query and multiplies query-item sparse blocks
+            with scipy on executors, so only partial item-pair sums are shuffled.
+            It is faster for interactions with heavy queries.
         """
         self.shrink = shrink
         self.use_rating = use_rating
@@ -56,6 +71,9 @@ class ItemKNN(NeighbourRec):
         if weighting not in valid_weightings:
             raise ValueError(f"weighting must be one of {valid_weightings}")
         self.weighting = weighting
+        if similarity_backend not in self._valid_similarity_backends:
+            raise ValueError(f"similarity_backend must be one of {list(self._valid_similarity_backends)}")
+        self.similarity_backend = similarity_backend
         if isinstance(index_builder, (IndexBuilder, type(None))):
             self.index_builder = index_builder
         elif isinstance(index_builder, dict):
@@ -69,6 +87,7 @@ class ItemKNN(NeighbourRec):
             "num_neighbours": self.num_neighbours,
             "weighting": self.weighting,
             "index_builder": self.index_builder.init_meta_as_dict() if self.index_builder else None,
+            "similarity_backend": self.similarity_backend,
         }
 
     @staticmethod
@@ -170,16 +189,13 @@ class ItemKNN(NeighbourRec):
 
         return idf
 
-    def _get_products(self, interactions: SparkDataFrame) -> SparkDataFrame:
+    def _get_dot_products_join(self, interactions: SparkDataFrame) -> SparkDataFrame:
         """
-        Calculate item dot products
+        Calculate item dot products with a self-join of interactions on the query column
 
         :param interactions: SparkDataFrame with interactions, `[user_id, item_id, rating]`
-        :return: similarity matrix `[item_idx_one, item_idx_two, norm1, norm2]`
+        :return: dot products `[item_idx_one, item_idx_two, dot_product]`
         """
-        if self.weighting:
-            interactions = self._reweight_interactions(interactions)
-
         left = interactions.withColumnRenamed(
             self.item_column, "item_idx_one"
         ).withColumnRenamed(self.rating_column, "rel_one")
@@ -187,7 +203,7 @@ class ItemKNN(NeighbourRec):
             self.item_column, "item_idx_two"
         ).withColumnRenamed(self.rating_column, "rel_two")
 
-        dot_products = (
+        return (
             left.join(right, how="inner", on=self.query_column)
             .filter(sf.col("item_idx_one") != sf.col("item_idx_two"))
             .withColumn(self.rating_column, sf.col("rel_one") * sf.col("rel_two"))
@@ -195,11 +211,99 @@ class ItemKNN(NeighbourRec):
             .agg(sf.sum(self.rating_column).alias("dot_product"))
         )
 
-        item_norms = (
+    def _get_dot_products_sparse(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        """
+        Calculate item dot products with sparse matrix products of query blocks.
+        Interactions are grouped by query, every Arrow batch of queries becomes
+        a sparse query-item matrix ``X`` and the partial item-pair sums are taken from ``X.T @ X``.
+
+        :param interactions: SparkDataFrame with interactions, `[user_id, item_id, rating]`
+        :return: dot products `[item_idx_one, item_idx_two, dot_product]`
+        """
+        item_type = interactions.schema[self.item_column].dataType.simpleString()
+
+        def block_products(batches: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            for batch in batches:
+                if batch.empty:
+                    continue
+                items_per_query = np.fromiter(map(len, batch["items"]), dtype=np.int64, count=len(batch))
+                item_codes, item_ids = pd.factorize(np.concatenate(batch["items"].values))
+                block = csr_matrix(
+                    (
+                        np.concatenate(batch["ratings"].values).astype(np.float64),
+                        (np.repeat(np.arange(len(batch)), items_per_query), item_codes),
+                    ),
+                    shape=(len(batch), len(item_ids)),
+                )
+                products = (block.T @ block).tocoo()
+                not_diagonal = products.row != products.col
+                yield PandasDataFrame(
+                    {
+                        "item_idx_one": item_ids[products.row[not_diagonal]],
+                        "item_idx_two": item_ids[products.col[not_diagonal]],
+                        "dot_product": products.data[not_diagonal],
+                    }
+                )
+
+        return (
+            interactions.groupBy(self.query_column)
+            .agg(
+                sf.collect_list(self.item_column).alias("items"),
+                sf.collect_list(sf.col(self.rating_column).cast("double")).alias("ratings"),
+            )
+            .select("items", "ratings")
+            .mapInPandas(
+                block_products,
+                f"item_idx_one {item_type}, item_idx_two {item_type}, dot_product double",
+            )
+            .groupBy("item_idx_one", "item_idx_two")
+            .agg(sf.sum("dot_product").alias("dot_product"))
+        )
+
+    def _get_products(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        """
+        Calculate item dot products
+
+        :param interactions: SparkDataFrame with interactions, `[user_id, item_id, rating]`
+        :return: similarity matrix `[item_idx_one, item_idx_two, norm1, norm2]`
+        """
+        if self.weighting:
+            interactions = self._reweight_interactions(interactions)
+
+        return self._join_norms(
+            self._get_dot_products(interactions), self._get_item_square_norms(interactions)
+        )
+
+    def _get_dot_products(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        """
+        Calculate item dot products with the chosen ``similarity_backend``
+
+        :param interactions: SparkDataFrame with interactions, `[user_id, item_id, rating]`
+        :return: dot products `[item_idx_one, item_idx_two, dot_product]`
+        """
+        if self.similarity_backend == "sparse":
+            return self._get_dot_products_sparse(interactions)
+        return self._get_dot_products_join(interactions)
+
+    def _get_item_square_norms(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        """
+        :param interactions: SparkDataFrame with interactions, `[user_id, item_id, rating]`
+        :return: squared item norms `[item_id, square_norm]`
+        """
+        return (
             interactions.withColumn(self.rating_column, sf.col(self.rating_column) ** 2)
             .groupBy(self.item_column)
             .agg(sf.sum(self.rating_column).alias("square_norm"))
-            .select(sf.col(self.item_column), sf.sqrt("square_norm").alias("norm"))
+        )
+
+    def _join_norms(self, dot_products: SparkDataFrame, item_square_norms: SparkDataFrame) -> SparkDataFrame:
+        """
+        :param dot_products: dot products `[item_idx_one, item_idx_two, dot_product]`
+        :param item_square_norms: squared item norms `[item_id, square_norm]`
+        :return: dot products with norms `[item_idx_one, item_idx_two, norm1, norm2]`
+        """
+        item_norms = item_square_norms.select(
+            sf.col(self.item_column), sf.sqrt("square_norm").alias("norm")
         )
         norm1 = item_norms.withColumnRenamed(
             self.item_column, "item_id1"
@@ -224,28 +328,174 @@ class ItemKNN(NeighbourRec):
         :param similarity_matrix: dataframe `[item_idx_one, item_idx_two, similarity]`
         :return: cropped similarity matrix
         """
-        return (
-            similarity_matrix.withColumn(
-                "similarity_order",
-                sf.row_number().over(
-                    Window.partitionBy("item_idx_one").orderBy(
-                        sf.col("similarity").desc(),
-                        sf.col("item_idx_two").desc(),
-                    )
-                ),
-            )
-            .filter(sf.col("similarity_order") <= self.num_neighbours)
-            .drop("similarity_order")
+        return get_top_k_by_columns(
+            similarity_matrix, "item_idx_one", ["similarity", "item_idx_two"], self.num_neighbours
         )
 
+    def _fit_native(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        interactions = dataset.interactions
+        matrix = interactions_to_csr(
+            interactions,
+            self.query_column,
+            self.item_column,
+            shape=(self._query_dim, self._item_dim),
+            rating_column=self.rating_column if self.use_rating else None,
+        )
+        if not self.use_rating:
+            matrix.data[:] = 1.0
+
+        if self.weighting:
+            matrix = self._reweight_native(matrix)
+
+        dot_products = sparse_product(matrix.T.tocsr(), matrix).tocoo()
+        not_diagonal = dot_products.row != dot_products.col
+        rows, cols = dot_products.row[not_diagonal], dot_products.col[not_diagonal]
+        norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=0)).ravel())
+        similarity = dot_products.data[not_diagonal] / (norms[rows] * norms[cols] + self.shrink)
+
+        self._native_similarity = top_k_sparse(
+            csr_matrix((similarity, (rows, cols)), shape=dot_products.shape),
+            self.num_neighbours,
+            ascending_ties=False,
+        )
+
+    def _reweight_native(self, matrix: csr_matrix) -> csr_matrix:
+        """
+        Reweight query-item matrix according to TD-IDF or BM25 weighting, like ``_reweight_interactions``.
+        """
+        matrix = matrix.tocoo()
+        queries_per_item = np.bincount(matrix.col, minlength=matrix.shape[1])
+        if self.weighting == "bm25":
+            avgdl = queries_per_item[queries_per_item > 0].mean()
+            matrix.data = (
+                matrix.data
+                * (self.bm25_k1 + 1)
+                / (
+                    matrix.data
+                    + self.bm25_k1 * (1 - self.bm25_b + self.bm25_b * queries_per_item[matrix.col] / avgdl)
+                )
+            )
+
+        items_per_query = np.bincount(matrix.row, minlength=matrix.shape[0])[matrix.row]
+        n_items = np.count_nonzero(queries_per_item)
+        if self.weighting == "tf_idf":
+            idf = np.log1p(n_items / items_per_query)
+        else:
+            idf = np.log1p((n_items - items_per_query + 0.5) / (items_per_query + 0.5))
+        matrix.data = matrix.data * idf
+        return matrix.tocsr()
+
     def _fit(
         self,
         dataset: Dataset,
     ) -> None:
+        df = self._get_interactions(dataset)
+        if self.weighting:
+            self.query_item_ratings = self.dot_products = self.item_square_norms = None
+            similarity_matrix = self._get_similarity(df)
+        else:
+            # without reweighting the statistics are additive, they are kept for refit
+            self.query_item_ratings = (
+                df.groupBy(self.query_column, self.item_column)
+                .agg(sf.sum(self.rating_column).alias(self.rating_column))
+                .cache()
+            )
+            self.dot_products = self._get_dot_products(self.query_item_ratings).cache()
+            self.item_square_norms = self._get_item_square_norms(df).cache()
+            similarity_matrix = self._shrink(
+                self._join_norms(self.dot_products, self.item_square_norms), self.shrink
+            )
+        self.similarity = self._get_k_most_similar(similarity_matrix)
+        self.similarity.cache().count()
+
+    def _get_interactions(self, dataset: Dataset) -> SparkDataFrame:
         df = dataset.interactions.select(self.query_column, self.item_column, self.rating_column)
         if not self.use_rating:
             df = df.withColumn(self.rating_column, sf.lit(1))
+        return df
 
-        similarity_matrix = self._get_similarity(df)
-        self.similarity = self._get_k_most_similar(similarity_matrix)
-        self.similarity.cache().count()
+    def refit(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        """Iteratively refit with new part of interactions.
+
+        Item dot products and norms saved by ``fit`` are updated with contributions
+        of the new interactions only, similarity and neighbours are recalculated
+        for items whose similarities changed.
+
+        :param dataset: new interactions with query/item features
+            ``[user_id, item_id, timestamp, rating]``
+        :return:
+        """
+        if self.weighting:
+            raise ValueError("refit is not supported with weighting, it depends on all interactions")
+        if self._is_fitted_native:
+            raise ValueError("refit is supported only for models fitted on Spark datasets")
+
+        df = self._get_interactions(dataset)
+        self._refit_entities(df)
+        new_ratings = df.groupBy(self.query_column, self.item_column).agg(
+            sf.sum(self.rating_column).alias(self.rating_column)
+        )
+        queries = new_ratings.select(self.query_column).distinct()
+        old_ratings = self.query_item_ratings.join(queries, on=self.query_column, how="left_semi")
+        ratings = (
+            old_ratings.unionByName(new_ratings)
+            .groupBy(self.query_column, self.item_column)
+            .agg(sf.sum(self.rating_column).alias(self.rating_column))
+        )
+
+        # products of refitted queries are replaced by the products of their updated ratings
+        old_dot_products = self._get_dot_products(old_ratings).withColumn(
+            "dot_product", -sf.col("dot_product")
+        )
+        dot_products = (
+            self.dot_products.unionByName(self._get_dot_products(ratings))
+            .unionByName(old_dot_products)
+            .groupBy("item_idx_one", "item_idx_two")
+            .agg(sf.sum("dot_product").alias("dot_product"))
+            .cache()
+        )
+        query_item_ratings = (
+            self.query_item_ratings.join(queries, on=self.query_column, how="left_anti")
+            .unionByName(ratings)
+            .cache()
+        )
+        item_square_norms = (
+            self.item_square_norms.unionByName(self._get_item_square_norms(df))
+            .groupBy(self.item_column)
+            .agg(sf.sum("square_norm").alias("square_norm"))
+            .cache()
+        )
+
+        # neighbours change for new items and for items similar to them
+        items = new_ratings.select(sf.col(self.item_column).alias("item_idx_one")).distinct()
+        items = items.unionByName(
+            dot_products.join(items, on="item_idx_one", how="left_semi").select(
+                sf.col("item_idx_two").alias("item_idx_one")
+            )
+        ).distinct()
+        similarity_matrix = self._shrink(
+            self._join_norms(
+                dot_products.join(items, on="item_idx_one", how="left_semi"), item_square_norms
+            ),
+            self.shrink,
+        )
+        similarity = (
+            self.similarity.join(items, on="item_idx_one", how="left_anti")
+            .unionByName(self._get_k_most_similar(similarity_matrix))
+            .cache()
+        )
+        for dataframe in [similarity, dot_products, query_item_ratings, item_square_norms]:
+            dataframe.count()
+
+        self._clear_cache()
+        self.similarity = similarity
+        self.dot_products = dot_products
+        self.query_item_ratings = query_item_ratings
+        self.item_square_norms = item_square_norms
+        self._refit_index()
@@ -135,3 +135,16 @@ class PopRec(NonPersonalizedRecommender):
 
         self.item_popularity.cache().count()
         self.fill = self._calc_fill(self.item_popularity, self.cold_weight, self.rating_column)
+
+    def _fit_native(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        item_groups = dataset.interactions.groupby(self.item_column)
+        if self.use_rating:
+            popularity = item_groups[self.rating_column].sum()
+        else:
+            popularity = item_groups[self.query_column].nunique()
+        self._set_native_item_popularity(
+            popularity.index.to_numpy(), popularity.to_numpy(dtype=float) / self.queries_count
+        )
@@ -12,6 +12,7 @@ from replay.utils import PYSPARK_AVAILABLE
 from replay.utils.session_handler import State
 
 if PYSPARK_AVAILABLE:
+    from pyspark.sql import functions as sf
     from pyspark.sql import types as st
 
 
@@ -30,12 +31,22 @@ class SLIM(NeighbourRec):
         "lambda_": {"type": "loguniform", "args": [1e-6, 2]},
     }
 
+    _valid_similarity_backends = ("driver", "gram")
+    _max_iter = 5000
+    _tol = 1e-6
+    # targets with consecutive ids solved in one group of the gram backend
+    _gram_targets_per_group = 256
+    # max number of elements of candidate dot products solved at once in a group
+    _gram_block_size = 2**22
+
+    # pylint: disable=too-many-arguments
     def __init__(
         self,
         beta: float = 0.01,
         lambda_: float = 0.01,
         seed: Optional[int] = None,
         index_builder: Optional[IndexBuilder] = None,
+        similarity_backend: str = "driver",
     ):
         """
         :param beta: l2 regularization
@@ -43,12 +54,22 @@ class SLIM(NeighbourRec):
         :param seed: random seed
         :param index_builder: `IndexBuilder` instance that adds ANN functionality.
             If not set, then ann will not be used.
+        :param similarity_backend: how ElasticNet problems of items are solved, one of ['driver', 'gram'].
+            'driver' collects the interaction matrix to the driver
+            and fits sklearn ElasticNet for each item on executors with a copy of the matrix.
+            'gram' keeps item-item dot products as a Spark dataframe
+            and solves the problem of each item with coordinate descent over the dot products
+            of items co-occurring with it, the interaction matrix is never collected.
+            It requires non-negative ratings.
         """
         if beta < 0 or lambda_ <= 0:
             raise ValueError("Invalid regularization parameters")
+        if similarity_backend not in self._valid_similarity_backends:
+            raise ValueError(f"similarity_backend must be one of {list(self._valid_similarity_backends)}")
         self.beta = beta
         self.lambda_ = lambda_
         self.seed = seed
+        self.similarity_backend = similarity_backend
         if isinstance(index_builder, (IndexBuilder, type(None))):
             self.index_builder = index_builder
         elif isinstance(index_builder, dict):
@@ -61,12 +82,17 @@ class SLIM(NeighbourRec):
             "lambda_": self.lambda_,
             "seed": self.seed,
             "index_builder": self.index_builder.init_meta_as_dict() if self.index_builder else None,
+            "similarity_backend": self.similarity_backend,
         }
 
     def _fit(
         self,
         dataset: Dataset,
     ) -> None:
+        if self.similarity_backend == "gram":
+            self._fit_gram(dataset)
+            return
+
         pandas_interactions = (
             dataset.interactions
             .select(self.query_column, self.item_column, self.rating_column)
@@ -131,3 +157,174 @@ class SLIM(NeighbourRec):
             "item_idx_one int, item_idx_two int, similarity double",
         )
         self.similarity.cache().count()
+
+    def _fit_gram(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        """
+        Fit ElasticNet of each item over item-item dot products.
+
+        Problem of item ``t`` is written with the Gram matrix ``G = X^T X`` of interaction matrix ``X``,
+        its right hand side is ``G[:, t]``. With non-negative ratings and coefficients
+        an item ``j`` gets a positive weight only if ``G[j, t]`` exceeds the l1 penalty,
+        so each problem needs the dot products between such candidates only.
+        Problems of ``_gram_targets_per_group`` targets with consecutive ids are solved in one group,
+        and coordinate descent sweeps blocks of them at once.
+        """
+        ratings = dataset.interactions.groupBy(self.query_column, self.item_column).agg(
+            sf.sum(self.rating_column).cast("double").alias("rating")
+        )
+        left = ratings.select(
+            self.query_column, sf.col(self.item_column).alias("item_one"), sf.col("rating").alias("r1")
+        )
+        right = ratings.select(
+            self.query_column, sf.col(self.item_column).alias("item_two"), sf.col("rating").alias("r2")
+        )
+        gram = (
+            left.join(right, on=self.query_column)
+            .groupBy("item_one", "item_two")
+            .agg(sf.sum(sf.col("r1") * sf.col("r2")).alias("gram"))
+            .cache()
+        )
+
+        # penalties of sklearn ElasticNet objective scaled by the number of samples
+        num_samples = self._query_dim
+        l1_penalty = num_samples * self.lambda_
+        l2_penalty = num_samples * self.beta
+        candidates = gram.filter(
+            (sf.col("item_one") != sf.col("item_two")) & (sf.col("gram") > l1_penalty)
+        ).select(
+            sf.col("item_two").alias("target"),
+            sf.col("item_one").alias("candidate"),
+            sf.col("gram").alias("target_gram"),
+        )
+        problems = (
+            candidates.join(
+                candidates.select(
+                    "target", sf.col("candidate").alias("candidate_two")
+                ),
+                on="target",
+            )
+            .join(
+                gram.withColumnRenamed("item_one", "candidate").withColumnRenamed("item_two", "candidate_two"),
+                on=["candidate", "candidate_two"],
+            )
+        )
+
+        max_iter = self._max_iter
+        tol = self._tol
+        block_size = self._gram_block_size
+
+        def slim_columns(pandas_df: pd.DataFrame) -> pd.DataFrame:   # pragma: no cover
+            """
+            fit similarity matrix columns of a group of targets
+            with coordinate descent over the dot products
+            :param pandas_df: pd.Dataframe
+            :return: pd.Dataframe
+            """
+            targets, target_rows = np.unique(pandas_df["target"].to_numpy(), return_inverse=True)
+            # every candidate has a row with itself, keys of candidates are sorted by target and candidate id
+            row_keys = target_rows * (np.int64(pandas_df["candidate"].max()) + 1)
+            candidate_keys, candidate_starts, row_positions = np.unique(
+                row_keys + pandas_df["candidate"].to_numpy(), return_index=True, return_inverse=True
+            )
+            candidate_targets = target_rows[candidate_starts]
+            candidate_counts = np.bincount(candidate_targets, minlength=len(targets))
+            target_offsets = np.r_[0, np.cumsum(candidate_counts)[:-1]]
+            # positions of candidates among the candidates of their target
+            row_positions -= target_offsets[target_rows]
+            row_positions_two = np.searchsorted(candidate_keys, row_keys + pandas_df["candidate_two"].to_numpy())
+            row_positions_two -= target_offsets[target_rows]
+            candidate_positions = np.arange(len(candidate_keys)) - target_offsets[candidate_targets]
+
+            similarity = []
+            order = np.argsort(candidate_counts, kind="stable")
+            start = 0
+            while start < len(order):
+                # targets with close numbers of candidates are padded to the same size and solved at once
+                stop = start + 1
+                while stop < len(order) and (stop - start + 1) * candidate_counts[order[stop]] ** 2 <= block_size:
+                    stop += 1
+                block = order[start:stop]
+                size = candidate_counts[block].max()
+                block_rows = np.full(len(targets), -1)
+                block_rows[block] = np.arange(len(block))
+
+                is_block_row = block_rows[target_rows] >= 0
+                item_gram = np.zeros((len(block), size, size))
+                item_gram[
+                    block_rows[target_rows[is_block_row]], row_positions[is_block_row], row_positions_two[is_block_row]
+                ] = pandas_df["gram"].to_numpy()[is_block_row]
+                is_block_candidate = block_rows[candidate_targets] >= 0
+                candidate_rows = block_rows[candidate_targets[is_block_candidate]]
+                positions = candidate_positions[is_block_candidate]
+                target_gram = np.zeros((len(block), size))
+                target_gram[candidate_rows, positions] = (
+                    pandas_df["target_gram"].to_numpy()[candidate_starts[is_block_candidate]]
+                )
+
+                weights = _fit_elastic_net_gram(item_gram, target_gram, l1_penalty, l2_penalty, max_iter, tol)
+                candidate_weights = weights[candidate_rows, positions]
+                is_similar = candidate_weights > 0
+                similarity.append(
+                    pd.DataFrame(
+                        {
+                            "item_idx_one": pandas_df["candidate"].to_numpy()[
+                                candidate_starts[is_block_candidate][is_similar]
+                            ],
+                            "item_idx_two": targets[candidate_targets[is_block_candidate][is_similar]],
+                            "similarity": candidate_weights[is_similar],
+                        }
+                    )
+                )
+                start = stop
+            return pd.concat(similarity, ignore_index=True)
+
+        self.similarity = problems.groupby(
+            sf.floor(sf.col("target") / self._gram_targets_per_group).alias("target_group")
+        ).applyInPandas(
+            slim_columns,
+            "item_idx_one int, item_idx_two int, similarity double",
+        )
+        self.similarity.cache().count()
+        gram.unpersist()
+
+
+# pylint: disable=too-many-arguments
+def _fit_elastic_net_gram(
+    gram: np.ndarray, target_gram: np.ndarray, l1_penalty: float, l2_penalty: float, max_iter: int, tol: float
+) -> np.ndarray:
+    """
+    Cyclic coordinate descent for non-negative ElasticNet
+    ``0.5 * ||y - Xw||^2 + l1_penalty * ||w||_1 + 0.5 * l2_penalty * ||w||^2``
+    given ``gram = X^T X`` and ``target_gram = X^T y`` of a batch of problems.
+    Every sweep updates a coordinate of all problems at once,
+    a problem is not updated anymore after its sweep changes weights less than ``tol``.
+
+    :param gram: dot products of candidates of each problem, shape ``(problems, n, n)``,
+        rows and columns of padding candidates are zero
+    :param target_gram: dot products of candidates with the target of each problem, shape ``(problems, n)``
+    :return: weights of candidates, shape ``(problems, n)``
+    """
+    weights = np.zeros(target_gram.shape)
+    gram_weights = np.zeros(target_gram.shape)
+    diagonal = np.diagonal(gram, axis1=1, axis2=2) + l2_penalty
+    is_updated = diagonal > 0
+    divisor = np.where(is_updated, diagonal, 1.0)
+    is_active = np.ones(len(target_gram), dtype=bool)
+    for _ in range(max_iter):
+        max_change = np.zeros(len(target_gram))
+        for j in range(target_gram.shape[1]):
+            rho = target_gram[:, j] - gram_weights[:, j] + gram[:, j, j] * weights[:, j]
+            weight = np.where(
+                is_updated[:, j] & is_active, np.maximum(rho - l1_penalty, 0.0) / divisor[:, j], weights[:, j]
+            )
+            change = weight - weights[:, j]
+            gram_weights += gram[:, :, j] * change[:, None]
+            weights[:, j] = weight
+            max_change = np.maximum(max_change, np.abs(change))
+        is_active &= max_change > tol * np.maximum(weights.max(axis=1, initial=0.0), 1.0)
+        if not is_active.any():
+            break
+    return weights
@@ -1,6 +1,8 @@
 import math
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
 from replay.data.dataset import Dataset
 from replay.metrics import NDCG, Metric
 from replay.models.base_rec import NonPersonalizedRecommender
@@ -147,6 +149,21 @@ class UCB(NonPersonalizedRecommender):
 
         self._calc_item_popularity()
 
+    def _fit_native(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        self._check_rating_native(dataset)
+
+        items_counts = dataset.interactions.groupby(self.item_column)[self.rating_column].agg(["sum", "count"])
+        pos, total = items_counts["sum"].to_numpy(dtype=float), items_counts["count"].to_numpy(dtype=float)
+        full_count = len(dataset.interactions)
+        self._set_native_item_popularity(
+            items_counts.index.to_numpy(),
+            pos / total + np.sqrt(self.coef * math.log(full_count) / total),
+            fill=1 + math.sqrt(self.coef * math.log(full_count)),
+        )
+
     def refit(
         self,
         dataset: Dataset,
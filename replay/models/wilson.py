@@ -1,5 +1,6 @@
 from typing import Optional
 
+import numpy as np
 from scipy.stats import norm
 
 from replay.data import Dataset
@@ -126,3 +127,17 @@ class Wilson(PopRec):
         self.item_popularity = items_counts.drop("pos", "total")
         self.item_popularity.cache().count()
         self.fill = self._calc_fill(self.item_popularity, self.cold_weight, self.rating_column)
+
+    def _fit_native(
+        self,
+        dataset: Dataset,
+    ) -> None:
+        self._check_rating_native(dataset)
+
+        items_counts = dataset.interactions.groupby(self.item_column)[self.rating_column].agg(["sum", "count"])
+        pos, total = items_counts["sum"].to_numpy(dtype=float), items_counts["count"].to_numpy(dtype=float)
+        crit = norm.isf(self.alpha / 2.0)
+        popularity = (pos + 0.5 * crit**2) / (total + crit**2) - crit / (total + crit**2) * np.sqrt(
+            (total - pos) * pos / total + crit**2 / 4
+        )
+        self._set_native_item_popularity(items_counts.index.to_numpy(), popularity)
@@ -1,10 +1,15 @@
-from typing import Any, Dict, Optional
+from typing import Any, Dict, Iterator, Optional
+
+import numpy as np
+from scipy.sparse import csr_matrix
 
 from replay.data import Dataset
 from replay.models.base_rec import ItemVectorModel, Recommender
 from replay.models.extensions.ann.ann_mixin import ANNMixin
 from replay.models.extensions.ann.index_builders.base_index_builder import IndexBuilder
-from replay.utils import PYSPARK_AVAILABLE, SparkDataFrame
+from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
+from replay.utils.native import query_blocks, top_k_dense
+from replay.utils.session_handler import State
 
 if PYSPARK_AVAILABLE:
     from pyspark.ml.feature import Word2Vec
@@ -58,6 +63,7 @@ class Word2VecRec(Recommender, ItemVectorModel, ANNMixin):
 
     idf: SparkDataFrame
     vectors: SparkDataFrame
+    _scoring_data = None
 
     can_predict_cold_queries = True
     _search_space = {
@@ -198,6 +204,12 @@ class Word2VecRec(Recommender, ItemVectorModel, ANNMixin):
         if hasattr(self, "idf") and hasattr(self, "vectors"):
             self.idf.unpersist()
             self.vectors.unpersist()
+        self._unpersist_scoring_data()
+
+    def _unpersist_scoring_data(self):
+        if self._scoring_data is not None:
+            self._scoring_data.unpersist()
+            self._scoring_data = None
 
     @property
     def _dataframes(self):
@@ -273,7 +285,50 @@ class Word2VecRec(Recommender, ItemVectorModel, ANNMixin):
         items: SparkDataFrame,
         filter_seen_items: bool = True,
     ) -> SparkDataFrame:
-        return self._predict_pairs_inner(queries.crossJoin(items), dataset)
+        if dataset is None:
+            raise ValueError(
+                f"interactions is not provided, {self} predict requires interactions."
+            )
+
+        # item vectors weighted with idf to embed queries and vectors of candidates
+        # are broadcasted as numpy arrays sorted by item id
+        vocabulary = (
+            self.vectors.join(self.idf.withColumnRenamed(self.item_column, "item"), on="item")
+            .select("item", "idf", vector_to_array("vector").alias("vector"))
+            .toPandas()
+            .sort_values("item")
+        )
+        vocabulary_ids = vocabulary["item"].to_numpy()
+        vectors = np.stack(vocabulary["vector"].to_numpy()) if len(vocabulary) > 0 else np.empty((0, self.rank))
+        is_candidate = np.isin(vocabulary_ids, items.toPandas()[self.item_column].to_numpy())
+        self._unpersist_scoring_data()
+        self._scoring_data = State().session.sparkContext.broadcast(
+            (
+                vocabulary_ids,
+                vectors * vocabulary["idf"].to_numpy()[:, None],
+                vocabulary_ids[is_candidate],
+                vectors[is_candidate],
+            )
+        )
+        scoring_data = self._scoring_data
+        query_column, item_column, rating_column = self.query_column, self.item_column, self.rating_column
+        rank = self.rank
+
+        def score(histories: Iterator[PandasDataFrame]) -> Iterator[PandasDataFrame]:
+            for batch in histories:
+                yield _score_histories(
+                    batch, *scoring_data.value, k, filter_seen_items, rank, query_column, item_column, rating_column
+                )
+
+        return (
+            dataset.interactions.join(queries, on=self.query_column, how="left_semi")
+            .groupBy(self.query_column)
+            .agg(sf.collect_list(self.item_column).alias("history"))
+            .mapInPandas(
+                score,
+                f"{self.query_column} int, {self.item_column} int, {self.rating_column} double",
+            )
+        )
 
     def _predict_pairs(
         self,
@@ -286,3 +341,61 @@ class Word2VecRec(Recommender, ItemVectorModel, ANNMixin):
         return self.vectors.withColumnRenamed(
             "vector", "item_vector"
         ).withColumnRenamed("item", self.item_column)
+
+
+# pylint: disable=too-many-arguments, too-many-locals
+def _score_histories(
+    histories: PandasDataFrame,
+    vocabulary_ids: np.ndarray,
+    weighted_vectors: np.ndarray,
+    candidate_ids: np.ndarray,
+    candidate_vectors: np.ndarray,
+    k: int,
+    filter_seen_items: bool,
+    rank: int,
+    query_column: str,
+    item_column: str,
+    rating_column: str,
+) -> PandasDataFrame:
+    """
+    Top-k recommendations for a batch of queries.
+    Query embedding is the mean of idf-weighted vectors of items from its history,
+    rating is the dot product of query embedding and item vector shifted by ``rank``.
+
+    :param histories: batch of queries with their histories ``[query_id, history]``
+    :param vocabulary_ids: sorted ids of items with vectors
+    :param weighted_vectors: vectors of ``vocabulary_ids`` multiplied by idf
+    :param candidate_ids: sorted ids of candidate items
+    :param candidate_vectors: vectors of ``candidate_ids``
+    :return: recommendations ``[query_id, item_id, rating]``
+    """
+    lengths = histories["history"].map(len).to_numpy()
+    items = np.concatenate(histories["history"].to_numpy()) if lengths.sum() > 0 else np.empty(0, dtype=np.int64)
+    rows = np.repeat(np.arange(len(histories)), lengths)
+
+    def positions_in(ids: np.ndarray):
+        positions = np.searchsorted(ids, items).clip(max=max(len(ids) - 1, 0))
+        is_found = ids[positions] == items if len(ids) > 0 else np.zeros(len(items), dtype=bool)
+        return csr_matrix(
+            (np.ones(is_found.sum()), (rows[is_found], positions[is_found])), shape=(len(histories), len(ids))
+        )
+
+    history = positions_in(vocabulary_ids)
+    counts = np.asarray(history.sum(axis=1)).ravel()
+    seen = positions_in(candidate_ids) if filter_seen_items else None
+
+    query_ids = histories[query_column].to_numpy()
+    recs = [(np.empty(0, dtype=query_ids.dtype), np.empty(0, dtype=candidate_ids.dtype), np.empty(0))]
+    for block in query_blocks(len(histories), len(candidate_ids)):
+        embeddings = (history[block] @ weighted_vectors) / np.maximum(counts[block], 1)[:, None]
+        scores = embeddings @ candidate_vectors.T + rank
+        # queries without known items in history have no embedding
+        scores[counts[block] == 0] = np.nan
+        if seen is not None:
+            seen_rows, seen_cols = seen[block].nonzero()
+            scores[seen_rows, seen_cols] = np.nan
+        block_rows, cols = top_k_dense(scores, k)
+        recs.append((query_ids[block][block_rows], candidate_ids[cols], scores[block_rows, cols]))
+    return PandasDataFrame(
+        {column: np.concatenate(values) for column, values in zip([query_column, item_column, rating_column], zip(*recs))}
+    )
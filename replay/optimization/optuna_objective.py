@@ -3,6 +3,8 @@ This class calculates loss function for optimization process
 """
 import collections
 import logging
+import threading
+from copy import copy
 from functools import partial
 from typing import Any, Callable, Dict, List, Optional, Union
 
@@ -10,14 +12,19 @@ from optuna import Trial
 
 from replay.metrics import Metric
 from replay.utils import PYSPARK_AVAILABLE, SparkDataFrame
+from replay.utils.session_handler import State
 
 if PYSPARK_AVAILABLE:
+    from py4j.clientserver import ClientServer
     from pyspark.sql import functions as sf
 
 
+# ``ground_truth`` holds items of the test queries grouped once for all trials, see ``prepare_ground_truth``,
+# if it is ``None``, the criterion groups the test interactions itself
 SplitData = collections.namedtuple(
     "SplitData",
-    "train_dataset test_dataset queries items",
+    "train_dataset test_dataset queries items ground_truth",
+    defaults=(None,),
 )
 
 
@@ -80,19 +87,46 @@ def suggest_params(
     return res
 
 
+def prepare_ground_truth(criterion: Metric, ground_truth: SparkDataFrame) -> Optional[SparkDataFrame]:
+    """
+    Group items of the test queries once for all trials of a study.
+
+    :param criterion: optimization metric
+    :param ground_truth: test data
+    :return: items of the test queries ``[user_idx, ground_truth]``
+        or ``None`` if the criterion uses its own ground truth preparation
+    """
+    # pylint: disable=protected-access
+    metric_type = type(criterion)
+    if (
+        metric_type._spark_call is not Metric._spark_call
+        or metric_type._get_enriched_recommendations is not Metric._get_enriched_recommendations
+    ):
+        return None
+    return criterion._get_ground_truth_items(ground_truth)
+
+
 def calculate_criterion_value(
     criterion: Metric,
     recommendations: SparkDataFrame,
-    ground_truth: SparkDataFrame
+    ground_truth: SparkDataFrame,
+    prepared_ground_truth: Optional[SparkDataFrame] = None,
 ) -> float:
     """
     Calculate criterion value for given parameters
     :param criterion: optimization metric
     :param recommendations: calculated recommendations
     :param ground_truth: test data
+    :param prepared_ground_truth: test data prepared with ``prepare_ground_truth``
     :return: criterion value
     """
-    result_dict = criterion(recommendations, ground_truth)
+    if prepared_ground_truth is None:
+        result_dict = criterion(recommendations, ground_truth)
+    else:
+        # pylint: disable=protected-access
+        result_dict = criterion._spark_compute(
+            criterion._join_ground_truth_items(recommendations, prepared_ground_truth)
+        )
     return list(result_dict.values())[0]
 
 
@@ -121,7 +155,10 @@ def eval_quality(
         items=split_data.items,
     )
     logger.debug("Calculating criterion")
-    criterion_value = calculate_criterion_value(criterion, recs, split_data.test_dataset.interactions)
+    criterion_value = calculate_criterion_value(
+        criterion, recs, split_data.test_dataset.interactions, split_data.ground_truth
+    )
+    recs.unpersist()
     logger.debug("%s=%.6f", criterion, criterion_value)
     return criterion_value
 
@@ -224,7 +261,10 @@ class ItemKNNObjective:
         )
         logger = logging.getLogger("replay")
         logger.debug("Calculating criterion")
-        criterion_value = calculate_criterion_value(criterion, recs, split_data.test_dataset.interactions)
+        criterion_value = calculate_criterion_value(
+            criterion, recs, split_data.test_dataset.interactions, split_data.ground_truth
+        )
+        recs.unpersist()
         logger.debug("%s=%.6f", criterion, criterion_value)
         return criterion_value
 
@@ -236,3 +276,53 @@ class ItemKNNObjective:
         :return: criterion value
         """
         return self.objective_calculator(trial=trial, **self.kwargs)
+
+
+# pylint: disable=too-few-public-methods
+class ConcurrentObjective:
+    """
+    Wrapper for ``MainObjective`` and ``ItemKNNObjective``
+    to run several trials at the same time from ``optuna`` threads.
+
+    Each trial works with a shallow copy of the recommender,
+    so parameters of one trial do not leak into another,
+    and submits its Spark jobs into a separate scheduler pool.
+    Pools share the cluster fairly if ``spark.scheduler.mode`` is ``FAIR``.
+
+    The pool is a local property of the thread, so PySpark has to run in the pinned thread mode
+    (``PYSPARK_PIN_THREAD``, enabled by default since PySpark 3.2), where every Python thread
+    has its own JVM thread. Otherwise trials share the default pool.
+    """
+
+    def __init__(self, objective: Union[ObjectiveWrapper, ItemKNNObjective]):
+        self.objective = objective
+        self._use_pools = isinstance(State().session.sparkContext._gateway, ClientServer)
+        if not self._use_pools:
+            logging.getLogger("replay").warning(
+                "PySpark does not run in the pinned thread mode, concurrent trials share the default scheduler pool"
+            )
+
+    def __call__(self, trial: Trial) -> float:
+        """
+        Calculate criterion for ``optuna``.
+
+        :param trial: current trial
+        :return: criterion value
+        """
+        kwargs = dict(self.objective.kwargs)
+        recommender = copy(kwargs["recommender"])
+        if getattr(recommender, "cached_dfs", None) is not None:
+            recommender.cached_dfs = set()
+        kwargs["recommender"] = recommender
+
+        if not self._use_pools:
+            return self.objective.objective_calculator(trial=trial, **kwargs)
+
+        spark_context = State().session.sparkContext
+        spark_context.setLocalProperty(
+            "spark.scheduler.pool", f"replay_optuna_{threading.current_thread().name}"
+        )
+        try:
+            return self.objective.objective_calculator(trial=trial, **kwargs)
+        finally:
+            spark_context.setLocalProperty("spark.scheduler.pool", None)
@@ -6,7 +6,7 @@ Contains classes for encoding categorical data
 ``LabelEncoder`` to apply multiple LabelEncodingRule to dataframe.
 """
 import abc
-from typing import Dict, List, Literal, Mapping, Optional, Sequence, Union
+from typing import Any, Dict, List, Literal, Mapping, Optional, Sequence, Tuple, Union
 
 from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, SparkDataFrame, get_spark_session
 
@@ -14,6 +14,8 @@ if PYSPARK_AVAILABLE:
     from pyspark.sql import functions as sf
     from pyspark.storagelevel import StorageLevel
 
+    from replay.utils.spark_utils import convert2spark
+
 HandleUnknownStrategies = Literal["error", "use_default_value"]
 
 
@@ -67,18 +69,29 @@ class LabelEncodingRule(BaseLabelEncodingRule):
     Implementation of the encoding rule for categorical variables of PySpark and Pandas Data Frames.
     Encodes target labels with value between 0 and n_classes-1 for the given column.
     It is recommended to use together with the LabelEncoder.
+
+    By default the mapping fitted on a PySpark DataFrame is collected to the driver as a dict.
+    For columns with a huge number of unique labels use ``distributed_mapping=True``:
+    the mapping is then kept as a persisted PySpark DataFrame, labels are numbered
+    with partition offsets on executors and ``transform``/``inverse_transform`` join with it directly.
+    The dict is collected only if ``get_mapping`` or ``get_inverse_mapping`` is called.
+    Set ``mapping_path`` to pickle such a rule without collecting the mapping:
+    it is written there as parquet and read back on the first use after unpickling.
     """
 
     _ENCODED_COLUMN_SUFFIX: str = "_encoded"
     _HANDLE_UNKNOWN_STRATEGIES = ("error", "use_default_value")
     _TRANSFORM_PERFORMANCE_THRESHOLD_FOR_PANDAS = 100_000
 
-    def __init__(
+    def __init__(  # pylint: disable=too-many-arguments
         self,
         column: str,
         mapping: Optional[Mapping] = None,
         handle_unknown: HandleUnknownStrategies = "error",
         default_value: Optional[Union[int, str]] = None,
+        distributed_mapping: bool = False,
+        broadcast_threshold: int = 1_000_000,
+        mapping_path: Optional[str] = None,
     ):
         """
         :param column: Name of the column to encode.
@@ -99,6 +112,18 @@ class LabelEncodingRule(BaseLabelEncodingRule):
             If ``int`` value, then fill by that value.
             If ``str`` value, should be \"last\" only, then fill by ``n_classes`` value.
             Default: ``None``.
+        :param distributed_mapping: If ``True``, the mapping fitted on a PySpark DataFrame
+            is stored as a persisted PySpark DataFrame instead of a dict on the driver.
+            Default: ``False``.
+        :param broadcast_threshold: Max number of labels in the distributed mapping
+            for which it is broadcast in ``transform`` and ``inverse_transform``.
+            A larger mapping is joined with a shuffle.
+            Used only if ``distributed_mapping`` is ``True``.
+            Default: ``1_000_000``.
+        :param mapping_path: Path where the distributed mapping is written as parquet
+            when the rule is pickled. If ``None``, the mapping is collected to the driver instead.
+            Used only if ``distributed_mapping`` is ``True``.
+            Default: ``None``.
         """
         if handle_unknown not in self._HANDLE_UNKNOWN_STRATEGIES:
             raise ValueError(f"handle_unknown should be either 'error' or 'use_default_value', got {handle_unknown}.")
@@ -115,25 +140,127 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         self._col = column
         self._target_col = column + self._ENCODED_COLUMN_SUFFIX
         self._mapping = mapping
+        self._distributed_mapping = distributed_mapping
+        self._broadcast_threshold = broadcast_threshold
+        self._mapping_on_spark: Optional[SparkDataFrame] = None
+        self._mapping_size = 0
+        self._mapping_path = mapping_path
+        self._is_mapping_saved = False
         self._is_fitted = False
         if self._mapping is not None:
             self._inverse_mapping = self._make_inverse_mapping()
             self._inverse_mapping_list = self._make_inverse_mapping_list()
 
+    def __getstate__(self) -> Dict[str, Any]:
+        # Spark dataframes can not be pickled, so a distributed mapping is written to ``mapping_path``
+        # or collected, and it is read or sent to Spark again on the first use after unpickling
+        if self._mapping_on_spark is not None and self._mapping is None:
+            if self._mapping_path is None:
+                self._collect_mapping()
+            elif not self._is_mapping_saved:
+                self._mapping_on_spark.write.mode("overwrite").parquet(self._mapping_path)
+                self._is_mapping_saved = True
+        state = self.__dict__.copy()
+        state["_mapping_on_spark"] = None
+        return state
+
     @property
     def column(self) -> str:
         return self._col
 
     def get_mapping(self) -> Mapping:
+        self._check_is_fitted()
         if self._mapping is None:
-            raise RuntimeError("Label encoder is not fitted")
+            self._collect_mapping()
         return self._mapping
 
     def get_inverse_mapping(self) -> Mapping:
+        self._check_is_fitted()
         if self._mapping is None:
-            raise RuntimeError("Label encoder is not fitted")
+            self._collect_mapping()
         return self._inverse_mapping
 
+    def _is_distributed(self) -> bool:
+        return self._mapping_on_spark is not None or self._is_mapping_saved
+
+    def _check_is_fitted(self) -> None:
+        if self._mapping is None and not self._is_distributed():
+            raise RuntimeError("Label encoder is not fitted")
+
+    def _get_mapping_size(self) -> int:
+        if self._is_distributed():
+            return self._mapping_size
+        return len(self.get_mapping())
+
+    def _collect_mapping(self) -> None:
+        self._mapping = {row[self._col]: row[self._target_col] for row in self._get_mapping_on_spark().collect()}
+        self._inverse_mapping = self._make_inverse_mapping()
+        self._inverse_mapping_list = self._make_inverse_mapping_list()
+
+    def _get_mapping_on_spark(self) -> SparkDataFrame:
+        if self._mapping_on_spark is not None:
+            return self._mapping_on_spark
+        if self._mapping is None:
+            # the mapping was written to ``mapping_path`` on pickling
+            self._mapping_on_spark = (
+                get_spark_session().read.parquet(self._mapping_path).persist(StorageLevel.MEMORY_AND_DISK)
+            )
+            return self._mapping_on_spark
+        mapping_on_spark = get_spark_session().createDataFrame(
+            data=list(self.get_mapping().items()), schema=[self._col, self._target_col]
+        )
+        if self._distributed_mapping:
+            # the mapping is given as a dict, so it is sent to Spark once and reused
+            self._mapping_size = len(self._mapping)
+            self._mapping_on_spark = mapping_on_spark.persist(StorageLevel.MEMORY_AND_DISK)
+        return mapping_on_spark
+
+    def _join_mapping(self, df: SparkDataFrame, on: str) -> SparkDataFrame:
+        mapping_on_spark = self._get_mapping_on_spark()
+        if self._mapping_on_spark is not None and self._mapping_size <= self._broadcast_threshold:
+            mapping_on_spark = sf.broadcast(mapping_on_spark)
+        return df.join(mapping_on_spark, on=on, how="left")
+
+    def _assign_ids_spark(self, unique_col_values: SparkDataFrame, offset: int) -> Tuple[SparkDataFrame, int]:
+        """
+        Numbers unique labels with consecutive ids starting from ``offset`` without collecting them.
+        Every label gets the id of its partition offset plus its position in the partition,
+        only the number of labels in each partition is collected to the driver.
+        The numbered labels are checkpointed, as the ids depend on the partitioning
+        and a recomputed partition could get other ones.
+
+        :param unique_col_values: dataframe with unique labels in ``column``.
+        :param offset: the first id.
+        :returns: persisted mapping dataframe and the number of numbered labels.
+        """
+        values_with_ids = unique_col_values.select(
+            self._col,
+            sf.spark_partition_id().alias("_partition_id"),
+            sf.monotonically_increasing_id().alias("_row_id"),
+        ).localCheckpoint(eager=True)
+
+        partition_offsets = []
+        for row in values_with_ids.groupBy("_partition_id").count().orderBy("_partition_id").collect():
+            # monotonically_increasing_id puts the partition id into the upper 31 bits
+            partition_offsets.append((row["_partition_id"], offset - (row["_partition_id"] << 33)))
+            offset += row["count"]
+        offsets_on_spark = get_spark_session().createDataFrame(
+            partition_offsets, schema="_partition_id int, _offset long"
+        )
+
+        mapping_on_spark = (
+            values_with_ids.join(sf.broadcast(offsets_on_spark), on="_partition_id")
+            .select(self._col, (sf.col("_row_id") + sf.col("_offset")).alias(self._target_col))
+            .persist(StorageLevel.MEMORY_AND_DISK)
+        )
+        values_count = mapping_on_spark.count()
+        return mapping_on_spark, values_count
+
+    def _fit_spark_distributed(self, df: SparkDataFrame) -> None:
+        self._mapping_on_spark, self._mapping_size = self._assign_ids_spark(
+            df.select(self._col).distinct(), offset=0
+        )
+
     def _make_inverse_mapping(self) -> Mapping:
         return {val: key for key, val in self.get_mapping().items()}
 
@@ -168,17 +295,21 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         :param df: input dataframe.
         :returns: fitted EncodingRule.
         """
-        if self._mapping is not None:
+        if self._mapping is not None or self._is_distributed():
             return self
 
         if isinstance(df, PandasDataFrame):
             self._fit_pandas(df)
+        elif self._distributed_mapping:
+            self._fit_spark_distributed(df)
         else:
             self._fit_spark(df)
-        self._inverse_mapping = self._make_inverse_mapping()
-        self._inverse_mapping_list = self._make_inverse_mapping_list()
+        if self._mapping is not None:
+            self._inverse_mapping = self._make_inverse_mapping()
+            self._inverse_mapping_list = self._make_inverse_mapping_list()
         if self._handle_unknown == "use_default_value":
-            if self._default_value in self._inverse_mapping:
+            # labels are encoded with consecutive values from 0 to n_classes-1
+            if isinstance(self._default_value, int) and 0 <= self._default_value < self._get_mapping_size():
                 raise ValueError(
                     "The used value for default_value "
                     f"{self._default_value} is one of the "
@@ -210,6 +341,21 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         self._inverse_mapping_list.extend(new_data.keys())
         new_unique_values.unpersist()
 
+    def _partial_fit_spark_distributed(self, df: SparkDataFrame) -> None:
+        previous_mapping = self._get_mapping_on_spark()
+        new_unique_values = (
+            df.select(self._col).distinct().join(previous_mapping, on=self._col, how="left_anti")
+        )
+        new_mapping, new_values_count = self._assign_ids_spark(new_unique_values, offset=self._mapping_size)
+        # the lineage is truncated, so it does not grow with every partial fit
+        self._mapping_on_spark = previous_mapping.unionByName(new_mapping).localCheckpoint(eager=True)
+        self._mapping_size += new_values_count
+        new_mapping.unpersist()
+        previous_mapping.unpersist()
+        # collected dict and saved parquet, if any, are outdated
+        self._mapping = None
+        self._is_mapping_saved = False
+
     def _partial_fit_pandas(self, df: PandasDataFrame) -> None:
         assert self._mapping is not None
 
@@ -226,10 +372,12 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         :param df: input dataframe.
         :returns: fitted EncodingRule.
         """
-        if self._mapping is None:
+        if self._mapping is None and not self._is_distributed():
             return self.fit(df)
 
-        if isinstance(df, SparkDataFrame):
+        if self._is_distributed() or (self._distributed_mapping and isinstance(df, SparkDataFrame)):
+            self._partial_fit_spark_distributed(convert2spark(df))
+        elif isinstance(df, SparkDataFrame):
             self._partial_fit_spark(df)
         else:
             self._partial_fit_pandas(df)
@@ -268,12 +416,7 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         return result_df
 
     def _transform_spark(self, df: SparkDataFrame, default_value: Optional[int]) -> SparkDataFrame:
-        mapping_on_spark = get_spark_session().createDataFrame(
-            data=list(self.get_mapping().items()), schema=[self._col, self._target_col]
-        )
-        transformed_df = df.join(mapping_on_spark, on=self._col, how="left").withColumn(
-            "unknown_mask", sf.isnull(self._target_col)
-        )
+        transformed_df = self._join_mapping(df, on=self._col).withColumn("unknown_mask", sf.isnull(self._target_col))
         unknown_label_count = transformed_df.select(sf.sum(sf.col("unknown_mask").cast("long"))).first()[
             0
         ]  # type: ignore
@@ -296,10 +439,9 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         :param df: input dataframe.
         :returns: transformed dataframe.
         """
-        if self._mapping is None:
-            raise RuntimeError("Label encoder is not fitted")
+        self._check_is_fitted()
 
-        default_value = len(self._mapping) if self._default_value == "last" else self._default_value
+        default_value = self._get_mapping_size() if self._default_value == "last" else self._default_value
 
         if isinstance(df, PandasDataFrame):
             transformed_df = self._transform_pandas(df, default_value)  # type: ignore
@@ -308,19 +450,16 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         return transformed_df
 
     def _inverse_transform_pandas(self, df: PandasDataFrame) -> PandasDataFrame:
+        if self._mapping is None:
+            self._collect_mapping()
         dff = df.copy()
         dff[self._col] = [self._inverse_mapping_list[i] for i in df[self._col]]
         return dff
 
     def _inverse_transform_spark(self, df: SparkDataFrame) -> SparkDataFrame:
-        mapping_on_spark = get_spark_session().createDataFrame(
-            data=list(self.get_mapping().items()), schema=[self._col, self._target_col]
-        )
-        transformed_df = (
-            df.withColumnRenamed(self._col, self._target_col)
-            .join(mapping_on_spark, on=self._target_col, how="left")
-            .drop(self._target_col)
-        )
+        transformed_df = self._join_mapping(
+            df.withColumnRenamed(self._col, self._target_col), on=self._target_col
+        ).drop(self._target_col)
         return transformed_df
 
     def inverse_transform(self, df: DataFrameLike) -> DataFrameLike:
@@ -330,8 +469,7 @@ class LabelEncodingRule(BaseLabelEncodingRule):
         :param df: transformed dataframe.
         :returns: initial dataframe.
         """
-        if self._mapping is None:
-            raise RuntimeError("Label encoder is not fitted")
+        self._check_is_fitted()
 
         if isinstance(df, PandasDataFrame):
             transformed_df = self._inverse_transform_pandas(df)
@@ -3,11 +3,12 @@ from typing import Optional
 import numpy as np
 import pandas as pd
 
-from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, SparkDataFrame
+from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, PandasDataFrame, SparkDataFrame, get_spark_session
 
 if PYSPARK_AVAILABLE:
     import pyspark.sql.functions as sf
     from pyspark.sql.window import Window
+    from pyspark.storagelevel import StorageLevel
 
 
 # pylint: disable=too-many-instance-attributes, too-few-public-methods
@@ -175,6 +176,51 @@ class Sessionizer:
 
         return res
 
+    def _get_users_cumulative_count_spark(self, data: SparkDataFrame) -> SparkDataFrame:
+        """
+        Cumulative number of interactions of users ordered by user id without a single-partition window.
+        Users are range-partitioned by the sort, the cumulative count is calculated inside each partition,
+        and only the totals of partitions are collected to the driver to get partition offsets.
+
+        The result is checkpointed locally instead of being persisted: it is read once by the lazy join
+        of ``transform``, and Spark releases its blocks as soon as the transformed dataframe is not referenced.
+
+        :param data: interactions.
+        :returns: locally checkpointed dataframe ``[user_column, cumsum_user_count]``.
+        """
+        sorted_users = (
+            data.groupBy(self.user_column)
+            .count()
+            .orderBy(self.user_column)
+            .withColumn("_partition_id", sf.spark_partition_id())
+            .persist(StorageLevel.MEMORY_AND_DISK)
+        )
+
+        partition_offsets = []
+        offset = 0
+        for row in sorted_users.groupBy("_partition_id").agg(sf.sum("count").alias("count")).orderBy(
+            "_partition_id"
+        ).collect():
+            partition_offsets.append((row["_partition_id"], offset))
+            offset += row["count"]
+        offsets_on_spark = get_spark_session().createDataFrame(
+            partition_offsets, schema="_partition_id int, _offset long"
+        )
+
+        users_with_cumsum = (
+            sorted_users.join(sf.broadcast(offsets_on_spark), on="_partition_id")
+            .select(
+                self.user_column,
+                (
+                    sf.col("_offset")
+                    + sf.sum("count").over(Window.partitionBy("_partition_id").orderBy(self.user_column))
+                ).alias("cumsum_user_count"),
+            )
+            .localCheckpoint(eager=True)
+        )
+        sorted_users.unpersist()
+        return users_with_cumsum
+
     def _create_sessions_spark(self, data: SparkDataFrame) -> SparkDataFrame:
         data_with_diff = data.withColumn(
             "timestamp_diff",
@@ -191,13 +237,7 @@ class Sessionizer:
                 Window.partitionBy(self.user_column).orderBy(sf.col(self.time_column), sf.col("timestamp_diff").desc())
             ),
         )
-        # data_with_sum_timediff.cache()
-
-        grouped_users = data_with_sum_timediff.groupBy(self.user_column).count()
-        grouped_users_with_cumsum = grouped_users.withColumn(
-            "cumsum_user_count",
-            sf.sum("count").over(Window.partitionBy(sf.lit(0)).orderBy(self.user_column)),
-        ).drop("count")
+        grouped_users_with_cumsum = self._get_users_cumulative_count_spark(data)
 
         result = (
             data_with_sum_timediff.join(grouped_users_with_cumsum, self.user_column, "left")
@@ -212,7 +252,6 @@ class Sessionizer:
             )
         )
 
-        # data_with_sum_timediff.unpersist()
         return result
 
     def _filter_sessions(self, interactions: DataFrameLike) -> DataFrameLike:
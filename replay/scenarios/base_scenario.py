@@ -7,6 +7,7 @@ from replay.data import Dataset
 from replay.metrics import NDCG, Metric
 from replay.preprocessing.filters import MinCountFilter
 from replay.models.base_rec import BaseRecommender
+from replay.scenarios.prediction_plan import PredictionPlan
 from replay.utils import DataFrameLike, SparkDataFrame
 from replay.utils.spark_utils import get_unique_entities
 
@@ -88,13 +89,6 @@ class BaseScenario(BaseRecommender):
             item_features=dataset.item_features,
         )
 
-        hot_pred = self._predict_wrap(
-            dataset=hot_dataset,
-            k=k,
-            queries=hot_queries,
-            items=items,
-            filter_seen_items=filter_seen_items,
-        )
         if dataset is not None:
             cold_data = dataset.interactions.join(self.hot_queries, how="anti", on=self.query_column)
         else:
@@ -108,14 +102,12 @@ class BaseScenario(BaseRecommender):
             item_features=dataset.item_features,
         )
 
-        cold_pred = self.cold_model._predict_wrap(
-            dataset=cold_dataset,
-            k=k,
-            queries=cold_queries,
-            items=items,
-            filter_seen_items=filter_seen_items,
+        plan = PredictionPlan(
+            dataset, k, items, filter_seen_items, self.query_column, self.item_column, self.rating_column, queries
         )
-        return hot_pred.union(cold_pred)
+        plan.add(self, hot_dataset, hot_queries)
+        plan.add(self.cold_model, cold_dataset, cold_queries)
+        return plan.execute()
 
     def fit_predict(
         self,
@@ -7,7 +7,8 @@ from replay.metrics import NDCG, Metric
 from replay.models import PopRec
 from replay.models.base_rec import BaseRecommender
 from replay.utils import SparkDataFrame
-from replay.utils.spark_utils import fallback, get_unique_entities
+from replay.scenarios.prediction_plan import PredictionPlan
+from replay.utils.spark_utils import get_unique_entities
 
 
 # pylint: disable=too-many-instance-attributes
@@ -108,22 +109,14 @@ class Fallback(BaseRecommender):
             categorical_encoded=False,
         )
 
-        hot_pred = self._predict_wrap(
-            dataset=hot_dataset,
-            k=k,
-            queries=hot_queries,
-            items=items,
-            filter_seen_items=filter_seen_items,
+        # candidates of both models are filtered and ranked together,
+        # fallback recommendations go after the main ones
+        plan = PredictionPlan(
+            dataset, k, items, filter_seen_items, self.query_column, self.item_column, self.rating_column, queries
         )
-        cold_pred = self.fb_model._predict_wrap(
-            dataset=dataset,
-            k=k,
-            queries=queries,
-            items=items,
-            filter_seen_items=filter_seen_items,
-        )
-        pred = fallback(hot_pred, cold_pred, k)
-        return pred
+        plan.add(self.main_model, hot_dataset, hot_queries)
+        plan.add(self.fb_model, dataset, queries)
+        return plan.execute(keep_model_order=True)
 
     # pylint: disable=too-many-arguments, too-many-locals
     def optimize(
@@ -0,0 +1,193 @@
+# pylint: disable=protected-access
+"""
+Shared execution of predict for several models of a scenario.
+"""
+from typing import Iterable, List, Optional, Union
+
+from replay.data import Dataset
+from replay.models.base_rec import BaseRecommender
+from replay.utils import PYSPARK_AVAILABLE, PandasDataFrame, SparkDataFrame
+from replay.utils.spark_utils import convert2spark, get_top_k_by_columns, get_unique_entities, return_recs
+
+if PYSPARK_AVAILABLE:
+    from pyspark.sql import functions as sf
+
+
+# pylint: disable=too-many-instance-attributes
+class PredictionPlan:
+    """
+    Predict with several models at once.
+
+    Item pool is calculated once for all models and items seen by queries are taken from the dataset.
+    Batch models with the default predict wrapper score their queries with inner ``_predict``,
+    other models (ANN-backed, fitted natively, instrumented or with their own wrapper)
+    are predicted with ``_predict_wrap``. Candidates of all models
+    are filtered from seen items and ranked with a single top-k,
+    where candidates of the models added earlier go first.
+    """
+
+    _margin = 0.1
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        dataset: Optional[Dataset],
+        k: int,
+        items: Optional[Union[SparkDataFrame, Iterable]],
+        filter_seen_items: bool,
+        query_column: str,
+        item_column: str,
+        rating_column: str,
+        queries: Optional[SparkDataFrame] = None,
+    ):
+        """
+        :param dataset: historical interactions of the queries
+            ``[user_idx, item_idx, timestamp, rating]``
+        :param k: number of recommendations for each query
+        :param items: candidate items for recommendations
+            dataframe containing ``[item_idx]`` or ``array-like``;
+            if ``None``, every model takes its fitted items
+        :param filter_seen_items: flag to remove seen items from recommendations based on ``dataset``
+        :param query_column: query id column
+        :param item_column: item id column
+        :param rating_column: rating column of recommendations
+        :param queries: queries of the plan to filter seen items for;
+            if ``None``, seen items of all queries from ``dataset`` are used
+        """
+        self.k = k
+        self.query_column = query_column
+        self.item_column = item_column
+        self.rating_column = rating_column
+        self.items = None if items is None else get_unique_entities(items, item_column).cache()
+        self.seen_items = dataset.get_seen_items(queries) if filter_seen_items and dataset is not None else None
+        self._candidates: List[SparkDataFrame] = []
+        self._wrapped_recs: List[SparkDataFrame] = []
+
+    @staticmethod
+    def _can_predict_inner(model: BaseRecommender) -> bool:
+        return (
+            type(model)._predict_wrap is BaseRecommender._predict_wrap
+            and not model._is_fitted_native
+            and getattr(model, "instrumentation", None) is None
+        )
+
+    def add(self, model: BaseRecommender, dataset: Optional[Dataset], queries: SparkDataFrame) -> None:
+        """
+        Add candidates of a model for ``queries``.
+
+        :param model: fitted model
+        :param dataset: historical interactions used by the model
+        :param queries: unique queries to score by the model ``[user_idx]``
+        """
+        if self._can_predict_inner(model):
+            recs = self._predict_inner(model, dataset, queries)
+        else:
+            recs = model._predict_wrap(
+                dataset, self.k, queries, self.items, filter_seen_items=self.seen_items is not None
+            )
+            if isinstance(recs, PandasDataFrame):
+                recs = convert2spark(recs)
+            self._wrapped_recs.append(recs)
+        self._candidates.append(
+            recs.select(
+                sf.col(model.query_column).alias(self.query_column),
+                sf.col(model.item_column).alias(self.item_column),
+                sf.col(model.rating_column).cast("double").alias(self.rating_column),
+                sf.lit(len(self._candidates)).alias("priority"),
+            )
+        )
+
+    def _predict_inner(
+        self, model: BaseRecommender, dataset: Optional[Dataset], queries: SparkDataFrame
+    ) -> SparkDataFrame:
+        items = self.items if self.items is not None else get_unique_entities(model.fit_items, self.item_column)
+        interactions = dataset.interactions if dataset is not None else None
+        queries, interactions = model._filter_cold_for_predict(queries, interactions, "query")
+        items, interactions = model._filter_cold_for_predict(items, interactions, "item")
+        if dataset is not None:
+            dataset = Dataset(
+                feature_schema=dataset.feature_schema,
+                interactions=interactions,
+                query_features=dataset.query_features,
+                item_features=dataset.item_features,
+                check_consistency=False,
+            )
+        # seen items are filtered once for all models, so the model keeps its candidates
+        return model._predict(dataset, self.k, queries, items, filter_seen_items=self.seen_items is not None)
+
+    def execute(
+        self, keep_model_order: bool = False, recs_file_path: Optional[str] = None
+    ) -> Optional[SparkDataFrame]:
+        """
+        Rank candidates of all models.
+
+        :param keep_model_order: decrease ratings of the models added later,
+            so that ratings reflect the order of recommendations
+        :param recs_file_path: save recommendations at the given absolute path as parquet file.
+            If None, cached and materialized recommendations dataframe will be returned
+        :return: recommendations ``[user_idx, item_idx, rating]``
+        """
+        recs = self._candidates[0]
+        for candidates in self._candidates[1:]:
+            recs = recs.unionByName(candidates)
+        order_columns = ["priority", self.rating_column, self.item_column]
+
+        if self.seen_items is not None:
+            recs = (
+                recs.join(self.seen_items, on=self.query_column, how="left")
+                .filter(
+                    sf.col("seen_items").isNull()
+                    | ~sf.array_contains(sf.col("seen_items"), sf.col(self.item_column))
+                )
+                .drop("seen_items")
+            )
+
+        if len(self._candidates) > 1:
+            # an item recommended by several models keeps the rating of the first one
+            recs = (
+                recs.groupBy(self.query_column, self.item_column)
+                .agg(sf.min(sf.struct("priority", self.rating_column)).alias("first"))
+                .select(self.query_column, self.item_column, "first.priority", f"first.{self.rating_column}")
+            )
+        recs = get_top_k_by_columns(recs, self.query_column, order_columns, self.k, ascending=[True, False, True])
+
+        ranked_recs = None
+        if keep_model_order and len(self._candidates) > 1:
+            ranked_recs = recs.cache()
+            recs = self._shift_ratings(ranked_recs)
+
+        output = return_recs(recs.select(self.query_column, self.item_column, self.rating_column), recs_file_path)
+        self.unpersist()
+        if ranked_recs is not None:
+            ranked_recs.unpersist()
+        return output
+
+    def _shift_ratings(self, recs: SparkDataFrame) -> SparkDataFrame:
+        ratings = {
+            row["priority"]: (row["min_rating"], row["max_rating"])
+            for row in recs.groupBy("priority")
+            .agg(sf.min(self.rating_column).alias("min_rating"), sf.max(self.rating_column).alias("max_rating"))
+            .collect()
+        }
+        shifted_rating = sf.col(self.rating_column)
+        min_rating = None
+        for priority in sorted(ratings):
+            lowest, highest = ratings[priority]
+            diff = 0.0
+            if min_rating is not None and highest >= min_rating:
+                diff = highest - min_rating + self._margin
+            shifted_rating = sf.when(sf.col("priority") == priority, sf.col(self.rating_column) - diff).otherwise(
+                shifted_rating
+            )
+            min_rating = lowest - diff
+        return recs.withColumn(self.rating_column, shifted_rating)
+
+    def unpersist(self) -> None:
+        """
+        Release cached item data and recommendations of the wrapped models,
+        seen items are kept by the dataset.
+        """
+        if self.items is not None:
+            self.items.unpersist()
+        for recs in self._wrapped_recs:
+            recs.unpersist()
@@ -1,7 +1,8 @@
-from typing import Literal, Optional
+from typing import List, Literal, Optional
 
 from replay.splitters.base_splitter import Splitter, SplitterReturnType
 from replay.utils import PYSPARK_AVAILABLE, DataFrameLike, SparkDataFrame
+from replay.utils.session_handler import State
 
 if PYSPARK_AVAILABLE:
     import pyspark.sql.functions as sf
@@ -14,6 +15,9 @@ StrategyName = Literal["query"]
 class KFolds(Splitter):
     """
     Splits interactions inside each query into folds at random.
+
+    Folds materialized with ``materialize_folds`` stay cached after the splits are consumed,
+    so the splits can be used later. Call ``release`` when they are not needed anymore.
     """
     _init_arg_names = [
         "n_folds",
@@ -26,6 +30,8 @@ class KFolds(Splitter):
         "timestamp_column",
         "session_id_column",
         "session_id_processing_strategy",
+        "materialize_folds",
+        "folds_path",
     ]
 
     # pylint: disable=too-many-arguments
@@ -41,6 +47,8 @@ class KFolds(Splitter):
         timestamp_column: Optional[str] = "timestamp",
         session_id_column: Optional[str] = None,
         session_id_processing_strategy: str = "test",
+        materialize_folds: bool = False,
+        folds_path: Optional[str] = None,
     ):
         """
         :param n_folds: number of folds.
@@ -55,6 +63,12 @@ class KFolds(Splitter):
         :param session_id_processing_strategy: strategy of processing session if it is split,
             values: ``train, test``, train: whole split session goes to train. test: same but to test.
             default: ``test``.
+        :param materialize_folds: flag to calculate fold ids of spark interactions in a single pass
+            and cache them, so the splits filter the cached interactions
+            instead of recalculating fold ids from the source data.
+            The cache is kept until ``release`` is called.
+        :param folds_path: path to write spark interactions partitioned by fold as parquet.
+            Splits are read back from it with partition pruning. Implies ``materialize_folds``.
         """
         super().__init__(
             drop_cold_items=drop_cold_items,
@@ -70,10 +84,57 @@ class KFolds(Splitter):
             raise ValueError(f"Wrong splitter parameter: {strategy}")
         self.strategy = strategy
         self.seed = seed
+        self.materialize_folds = materialize_folds
+        self.folds_path = folds_path
+        self._materialized_folds: List[SparkDataFrame] = []
+
+    def release(self) -> None:
+        """
+        Unpersist the folds cached by splits with ``materialize_folds``.
+        Splits returned before are recalculated from the source data if they are used after that.
+        """
+        for dataframe in self._materialized_folds:
+            dataframe.unpersist()
+        self._materialized_folds = []
+
+    def _get_materialized_folds(self, interactions: SparkDataFrame) -> SparkDataFrame:
+        dataframe = interactions.withColumn("_rand", sf.rand(self.seed))
+        dataframe = dataframe.withColumn(
+            "fold",
+            sf.row_number().over(
+                Window.partitionBy(self.query_column).orderBy("_rand")
+            )
+            % self.n_folds,
+        ).drop("_rand")
+        if self.session_id_column:
+            # ``is_test`` of a split session is taken from its first or last row,
+            # so the whole session follows the fold of that row in every split
+            agg_function = sf.first if self.session_id_processing_strategy == "train" else sf.last
+            dataframe = dataframe.withColumn(
+                "fold",
+                agg_function("fold").over(
+                    Window.orderBy(self.timestamp_column)
+                    .partitionBy(self.query_column, self.session_id_column)  # type: ignore
+                    .rowsBetween(Window.unboundedPreceding, Window.unboundedFollowing)
+                ),
+            )
+        if self.folds_path is not None:
+            # rows of a fold are written by a single task, so every fold directory gets one file
+            dataframe.repartition("fold").write.mode("overwrite").partitionBy("fold").parquet(self.folds_path)
+            return State().session.read.parquet(self.folds_path)
+        dataframe = dataframe.cache()
+        self._materialized_folds.append(dataframe)
+        return dataframe
 
     def _core_split(self, interactions: DataFrameLike) -> SplitterReturnType:
         if self.strategy == "query":
-            if isinstance(interactions, SparkDataFrame):
+            if isinstance(interactions, SparkDataFrame) and (self.materialize_folds or self.folds_path):
+                dataframe = self._get_materialized_folds(interactions)
+                for i in range(self.n_folds):
+                    train = dataframe.filter(sf.col("fold") == i).drop("fold")
+                    test = dataframe.filter(sf.col("fold") != i).drop("fold")
+                    yield train, test
+            elif isinstance(interactions, SparkDataFrame):
                 dataframe = interactions.withColumn("_rand", sf.rand(self.seed))
                 dataframe = dataframe.withColumn(
                     "fold",
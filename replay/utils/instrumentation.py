@@ -0,0 +1,207 @@
+"""
+Opt-in instrumentation of recommender stages.
+
+Set ``model.instrumentation = Instrumentation()`` to record a report for every
+``fit``/``predict`` call of the model. Every report is a tree of stages with
+wall time, ids of Spark jobs and stages started inside the stage and
+shuffle/input/output statistics of these Spark stages.
+
+Spark is lazy, so a stage accounts only for the jobs it actually triggers:
+most of the scoring is usually executed by the final ``return_recs`` stage.
+Jobs of a nested stage are not included into its parent.
+
+Stage statistics are read from the Spark status store, which is updated asynchronously
+by the listener bus, so statistics of the stages finished right before the end
+of an instrumented stage may be incomplete.
+Stages of one instrumentation may be recorded from several threads,
+every thread nests its stages separately.
+"""
+import functools
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from .session_handler import State
+from .types import PYSPARK_AVAILABLE
+
+if PYSPARK_AVAILABLE:
+    from py4j.protocol import Py4JError
+
+JOB_GROUP_PROPERTY = "spark.jobGroup.id"
+
+
+@dataclass
+class StageReport:
+    """
+    Statistics of one instrumented stage
+    """
+
+    name: str
+    wall_seconds: float = 0.0
+    job_ids: List[int] = field(default_factory=list)
+    stage_ids: List[int] = field(default_factory=list)
+    input_rows: int = 0
+    output_rows: int = 0
+    shuffle_read_bytes: int = 0
+    shuffle_read_rows: int = 0
+    shuffle_write_bytes: int = 0
+    shuffle_write_rows: int = 0
+    children: List["StageReport"] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        :return: report with nested stages as a dictionary
+        """
+        return asdict(self)
+
+    def to_json(self, **kwargs) -> str:
+        """
+        :param kwargs: arguments of ``json.dumps``
+        :return: report with nested stages as a json string
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+
+class Instrumentation:
+    """
+    Collects stage reports of a model.
+    Finished top level stages are appended to ``reports``.
+    """
+
+    def __init__(self, collect_spark_metrics: bool = True):
+        """
+        :param collect_spark_metrics: flag to collect Spark job and stage statistics,
+            if ``False`` only wall time is recorded
+        """
+        self.collect_spark_metrics = collect_spark_metrics
+        self.reports: List[StageReport] = []
+        self._local = threading.local()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_local"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._local = threading.local()
+
+    @property
+    def _active(self) -> List[StageReport]:
+        """Stack of unfinished stages of the current thread"""
+        if not hasattr(self._local, "active"):
+            self._local.active = []
+        return self._local.active
+
+    @property
+    def last_report(self) -> Optional[StageReport]:
+        """Report of the last finished top level stage"""
+        return self.reports[-1] if self.reports else None
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[StageReport]:
+        """
+        Record statistics of the code executed inside the context.
+
+        :param name: stage name
+        :return: report filled in on exit
+        """
+        report = StageReport(name=name)
+        if self._active:
+            self._active[-1].children.append(report)
+        self._active.append(report)
+
+        spark_context = State().session.sparkContext if self.collect_spark_metrics else None
+        if spark_context is not None:
+            job_group = f"replay_{name}_{uuid4().hex}"
+            parent_job_group = spark_context.getLocalProperty(JOB_GROUP_PROPERTY)
+            spark_context.setLocalProperty(JOB_GROUP_PROPERTY, job_group)
+
+        start = time.perf_counter()
+        try:
+            yield report
+        finally:
+            report.wall_seconds = time.perf_counter() - start
+            if spark_context is not None:
+                spark_context.setLocalProperty(JOB_GROUP_PROPERTY, parent_job_group)
+                self._fill_spark_metrics(report, spark_context, job_group)
+            self._active.pop()
+            if not self._active:
+                self.reports.append(report)
+
+    @staticmethod
+    def _fill_spark_metrics(report: StageReport, spark_context, job_group: str) -> None:
+        status_tracker = spark_context.statusTracker()
+        report.job_ids = sorted(status_tracker.getJobIdsForGroup(job_group))
+        stage_ids = set()
+        for job_id in report.job_ids:
+            job_info = status_tracker.getJobInfo(job_id)
+            if job_info is not None:
+                stage_ids.update(job_info.stageIds)
+        report.stage_ids = sorted(stage_ids)
+
+        try:
+            # stage statistics are not exposed by python status tracker
+            status_store = spark_context._jsc.sc().statusStore()
+        except Py4JError:
+            logging.getLogger("replay").debug("Spark stage statistics are unavailable for %s", report.name)
+            return
+        for stage_id in report.stage_ids:
+            try:
+                stage_data = status_store.lastStageAttempt(stage_id)
+                stage_statistics = (
+                    stage_data.inputRecords(),
+                    stage_data.outputRecords(),
+                    stage_data.shuffleReadBytes(),
+                    stage_data.shuffleReadRecords(),
+                    stage_data.shuffleWriteBytes(),
+                    stage_data.shuffleWriteRecords(),
+                )
+            except Py4JError:
+                # the stage is not in the status store yet or it is already evicted
+                logging.getLogger("replay").debug(
+                    "Statistics of Spark stage %d are unavailable for %s", stage_id, report.name
+                )
+                continue
+            report.input_rows += stage_statistics[0]
+            report.output_rows += stage_statistics[1]
+            report.shuffle_read_bytes += stage_statistics[2]
+            report.shuffle_read_rows += stage_statistics[3]
+            report.shuffle_write_bytes += stage_statistics[4]
+            report.shuffle_write_rows += stage_statistics[5]
+
+
+def instrumented_stage_of(obj: Any, name: str) -> ContextManager:
+    """
+    Stage context of ``obj.instrumentation`` or a no-op context if instrumentation is disabled.
+
+    :param obj: instrumented object
+    :param name: stage name
+    """
+    instrumentation = getattr(obj, "instrumentation", None)
+    if instrumentation is None:
+        return nullcontext()
+    return instrumentation.stage(name)
+
+
+def instrumented_stage(name: str) -> Callable[[Callable], Callable]:
+    """
+    Decorator recording method calls as stages of ``self.instrumentation``.
+
+    :param name: stage name
+    """
+
+    def decorator(method: Callable) -> Callable:
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with instrumented_stage_of(self, name):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
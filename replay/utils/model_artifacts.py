@@ -0,0 +1,257 @@
+"""
+Lightweight scoring of fitted models without Spark.
+
+Artifacts are written by ``replay.utils.model_handler.save_model_artifacts``
+as a folder of ``.npy`` files and a json description.
+``load_model_artifacts`` memory-maps the arrays, so a serving process
+reads only the pages it touches and never starts a JVM.
+"""
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+from .native import query_blocks, top_k_sparse
+from .types import PandasDataFrame
+
+ARTIFACTS_META_FILE = "artifacts.json"
+
+
+def save_arrays(path: str, meta: Dict, arrays: Dict[str, np.ndarray]) -> None:
+    """
+    Save arrays as separate ``.npy`` files, so each of them can be memory-mapped.
+
+    :param path: destination folder
+    :param meta: json-serializable description of artifacts
+    :param arrays: arrays to save by names
+    """
+    os.makedirs(path, exist_ok=True)
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), np.ascontiguousarray(array))
+    with open(os.path.join(path, ARTIFACTS_META_FILE), "w", encoding="utf-8") as meta_file:
+        json.dump({**meta, "arrays": list(arrays)}, meta_file)
+
+
+def _get_positions(ids: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find positions of values in sorted array of ids.
+
+    :param ids: sorted unique ids
+    :param values: values to look for
+    :return: mask of found values and their positions
+    """
+    positions = np.searchsorted(ids, values)
+    positions = np.minimum(positions, len(ids) - 1) if len(ids) > 0 else positions
+    is_found = (ids[positions] == values) if len(ids) > 0 else np.zeros(len(values), dtype=bool)
+    return is_found, positions[is_found]
+
+
+def _top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions and values of ``k`` biggest scores of each row sorted in descending order.
+
+    :param scores: dense matrix of scores
+    :param k: number of scores to keep
+    :return: positions and values of the best scores
+    """
+    k = min(k, scores.shape[1])
+    best = np.argpartition(-scores, k - 1, axis=1)[:, :k] if k > 0 else np.empty((len(scores), 0), dtype=np.int64)
+    best_scores = np.take_along_axis(scores, best, axis=1)
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    return np.take_along_axis(best, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+
+class _ArtifactsScorer:
+    """Common logic of scorers"""
+
+    def __init__(self, query_column: str, item_column: str, rating_column: str):
+        self.query_column = query_column
+        self.item_column = item_column
+        self.rating_column = rating_column
+
+    def _get_history(
+        self, interactions: Optional[PandasDataFrame], query_ids: np.ndarray, item_ids: np.ndarray
+    ) -> csr_matrix:
+        """
+        Binary matrix of interactions of the scored queries with known items.
+
+        :param interactions: interactions ``[query_id, item_id]``
+        :param query_ids: sorted ids of the scored queries
+        :param item_ids: sorted ids of known items
+        :return: matrix of shape ``(len(query_ids), len(item_ids))``
+        """
+        if interactions is None or len(interactions) == 0:
+            return csr_matrix((len(query_ids), len(item_ids)), dtype=np.float32)
+        is_query_found, rows = _get_positions(query_ids, interactions[self.query_column].to_numpy())
+        is_item_found, columns = _get_positions(
+            item_ids, interactions[self.item_column].to_numpy()[is_query_found]
+        )
+        rows = rows[is_item_found]
+        history = csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(len(query_ids), len(item_ids))
+        )
+        history.data[:] = 1
+        return history
+
+    def _to_recs(self, query_ids: np.ndarray, items: np.ndarray, scores: np.ndarray) -> PandasDataFrame:
+        is_valid = np.isfinite(scores)
+        return PandasDataFrame(
+            {
+                self.query_column: np.repeat(query_ids, items.shape[1])[is_valid.ravel()],
+                self.item_column: items[is_valid],
+                self.rating_column: scores[is_valid].astype(np.float64),
+            }
+        )
+
+
+class FactorScorer(_ArtifactsScorer):
+    """
+    Scoring with query and item factors, relevance is a dot product of factors.
+    Created by ``load_model_artifacts`` for ``ALSWrap``.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        query_ids: np.ndarray,
+        item_ids: np.ndarray,
+        query_factors: np.ndarray,
+        item_factors: np.ndarray,
+        query_column: str = "query_id",
+        item_column: str = "item_id",
+        rating_column: str = "rating",
+    ):
+        """
+        :param query_ids: sorted query ids
+        :param item_ids: sorted item ids
+        :param query_factors: query factors in order of ``query_ids``
+        :param item_factors: item factors in order of ``item_ids``
+        :param query_column: query id column name
+        :param item_column: item id column name
+        :param rating_column: rating column name
+        """
+        super().__init__(query_column, item_column, rating_column)
+        self.query_ids = query_ids
+        self.item_ids = item_ids
+        self.query_factors = query_factors
+        self.item_factors = item_factors
+
+    def predict(
+        self, queries: Iterable, k: int, interactions: Optional[PandasDataFrame] = None
+    ) -> PandasDataFrame:
+        """
+        Get top-k recommendations for known queries.
+
+        :param queries: query ids to recommend to
+        :param k: number of recommendations for each query
+        :param interactions: interactions ``[query_id, item_id]`` to filter seen items from recommendations
+        :return: recommendations ``[query_id, item_id, rating]``
+        """
+        queries = np.unique(np.asarray(list(queries)))
+        is_found, positions = _get_positions(self.query_ids, queries)
+        queries = queries[is_found]
+        scores = np.asarray(self.query_factors[positions] @ np.asarray(self.item_factors).T, dtype=np.float64)
+        history = self._get_history(interactions, queries, self.item_ids)
+        history_rows, history_columns = history.nonzero()
+        scores[history_rows, history_columns] = -np.inf
+        best, best_scores = _top_k(scores, k)
+        return self._to_recs(queries, np.asarray(self.item_ids)[best], best_scores)
+
+
+class SimilarityScorer(_ArtifactsScorer):
+    """
+    Scoring with sparse item-to-item similarity matrix,
+    relevance is a sum of similarities to the items from query history.
+    Created by ``load_model_artifacts`` for models based on ``NeighbourRec``.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        item_ids: np.ndarray,
+        similarity: csr_matrix,
+        query_column: str = "query_id",
+        item_column: str = "item_id",
+        rating_column: str = "rating",
+    ):
+        """
+        :param item_ids: sorted item ids
+        :param similarity: similarity matrix with rows and columns in order of ``item_ids``
+        :param query_column: query id column name
+        :param item_column: item id column name
+        :param rating_column: rating column name
+        """
+        super().__init__(query_column, item_column, rating_column)
+        self.item_ids = item_ids
+        self.similarity = similarity
+
+    def predict(self, interactions: PandasDataFrame, k: int, filter_seen_items: bool = True) -> PandasDataFrame:
+        """
+        Get top-k recommendations for queries from ``interactions``.
+
+        :param interactions: interactions ``[query_id, item_id]`` of queries to recommend to
+        :param k: number of recommendations for each query
+        :param filter_seen_items: flag to remove items from ``interactions`` from recommendations
+        :return: recommendations ``[query_id, item_id, rating]``
+        """
+        queries = np.unique(interactions[self.query_column].to_numpy())
+        history = self._get_history(interactions, queries, self.item_ids)
+        recs = [(np.empty(0, dtype=queries.dtype), np.empty(0, dtype=np.int64), np.empty(0))]
+        for block in query_blocks(len(queries), len(self.item_ids)):
+            block_history = history[block]
+            scores = (block_history @ self.similarity).tocsr()
+            if filter_seen_items:
+                scores = scores - scores.multiply(block_history.astype(bool))
+                scores.eliminate_zeros()
+            best = top_k_sparse(scores, k).tocoo()
+            order = np.lexsort((best.col, -best.data, best.row))
+            recs.append((queries[block][best.row[order]], best.col[order], best.data[order].astype(np.float64)))
+        query_ids, items, ratings = (np.concatenate(values) for values in zip(*recs))
+        return PandasDataFrame(
+            {
+                self.query_column: query_ids,
+                self.item_column: np.asarray(self.item_ids)[items],
+                self.rating_column: ratings,
+            }
+        )
+
+
+def load_model_artifacts(path: Union[str, Path], mmap: bool = True) -> Union[FactorScorer, SimilarityScorer]:
+    """
+    Load scoring object from artifacts saved by ``save_model_artifacts``.
+
+    :param path: path to artifacts folder
+    :param mmap: flag to memory-map arrays instead of reading them into memory
+    :return: scorer of the saved model
+    """
+    path = str(path)
+    with open(os.path.join(path, ARTIFACTS_META_FILE), encoding="utf-8") as meta_file:
+        meta = json.load(meta_file)
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None, allow_pickle=False)
+        for name in meta["arrays"]
+    }
+    columns = {
+        "query_column": meta["query_column"],
+        "item_column": meta["item_column"],
+        "rating_column": meta["rating_column"],
+    }
+    if meta["kind"] == "factors":
+        return FactorScorer(
+            query_ids=arrays["query_ids"],
+            item_ids=arrays["item_ids"],
+            query_factors=arrays["query_factors"],
+            item_factors=arrays["item_factors"],
+            **columns,
+        )
+    if meta["kind"] == "similarity":
+        num_items = len(arrays["item_ids"])
+        similarity = csr_matrix(
+            (arrays["similarity_data"], arrays["similarity_indices"], arrays["similarity_indptr"]),
+            shape=(num_items, num_items),
+        )
+        return SimilarityScorer(item_ids=arrays["item_ids"], similarity=similarity, **columns)
+    raise ValueError(f"Unknown artifacts kind: {meta['kind']}")
@@ -7,13 +7,18 @@ from os.path import join
 from pathlib import Path
 from typing import Union
 
+import numpy as np
+from scipy.sparse import csr_matrix
+
 from replay.data.dataset_utils import DatasetLabelEncoder
 from replay.models import *
+from replay.models.base_neighbour_rec import NeighbourRec
 from replay.models.base_rec import BaseRecommender
 from replay.splitters import *
 from replay.utils.session_handler import State
 
-from .types import PYSPARK_AVAILABLE
+from .model_artifacts import save_arrays
+from .types import PYSPARK_AVAILABLE, PandasDataFrame
 
 if PYSPARK_AVAILABLE:
     from pyspark.sql import SparkSession
@@ -148,6 +153,84 @@ def load(path: str, model_type=None) -> BaseRecommender:
     return model
 
 
+def save_model_artifacts(model: BaseRecommender, path: Union[str, Path]) -> None:
+    """
+    Save fitted model state as memory-mappable numpy arrays on local disk.
+    The result is loaded without Spark with ``replay.utils.model_artifacts.load_model_artifacts``.
+    Supported models are ``ALSWrap`` (query and item factors)
+    and models based on ``NeighbourRec`` (sparse item-to-item similarity) fitted on Spark or pandas datasets.
+    Artifacts keep encoded ids, use ``save_encoder`` to keep the mapping to the original ids.
+
+    :param model: Trained recommender
+    :param path: local destination folder
+    """
+    if isinstance(path, Path):
+        path = str(path)
+
+    meta = {
+        "model_name": str(model),
+        "query_column": model.query_column,
+        "item_column": model.item_column,
+        "rating_column": model.rating_column,
+    }
+    if isinstance(model, ALSWrap):
+        query_factors = model.model.userFactors.toPandas().sort_values("id")
+        item_factors = model.model.itemFactors.toPandas().sort_values("id")
+        save_arrays(
+            path,
+            {**meta, "kind": "factors"},
+            {
+                "query_ids": query_factors["id"].to_numpy(),
+                "item_ids": item_factors["id"].to_numpy(),
+                "query_factors": np.vstack(query_factors["features"]).astype(np.float32),
+                "item_factors": np.vstack(item_factors["features"]).astype(np.float32),
+            },
+        )
+    elif isinstance(model, NeighbourRec):
+        # pylint: disable=protected-access
+        if model._is_fitted_native:
+            native_similarity = model._native_similarity.tocoo()
+            similarity = PandasDataFrame(
+                {
+                    "item_idx_one": native_similarity.row,
+                    "item_idx_two": native_similarity.col,
+                    model.similarity_metric: native_similarity.data,
+                }
+            )
+            fit_items = model.fit_items
+        else:
+            similarity = model.similarity.select(
+                "item_idx_one", "item_idx_two", model.similarity_metric
+            ).toPandas()
+            fit_items = model.fit_items.toPandas()
+        item_ids = np.union1d(
+            np.union1d(similarity["item_idx_one"], similarity["item_idx_two"]),
+            fit_items[model.item_column],
+        )
+        similarity_matrix = csr_matrix(
+            (
+                similarity[model.similarity_metric].to_numpy(dtype=np.float32),
+                (
+                    np.searchsorted(item_ids, similarity["item_idx_one"]),
+                    np.searchsorted(item_ids, similarity["item_idx_two"]),
+                ),
+            ),
+            shape=(len(item_ids), len(item_ids)),
+        )
+        save_arrays(
+            path,
+            {**meta, "kind": "similarity"},
+            {
+                "item_ids": item_ids,
+                "similarity_data": similarity_matrix.data,
+                "similarity_indices": similarity_matrix.indices,
+                "similarity_indptr": similarity_matrix.indptr,
+            },
+        )
+    else:
+        raise TypeError(f"Artifacts are not supported for {model}")
+
+
 def save_encoder(encoder: DatasetLabelEncoder, path: Union[str, Path]) -> None:
     """
     Save fitted DatasetLabelEncoder to disk as a folder
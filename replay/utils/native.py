@@ -0,0 +1,160 @@
+"""
+In-process numpy/scipy helpers for recommenders fitted on pandas datasets.
+
+Queries and items are identified by their integer ids, which are used as
+row and column indices of scipy sparse matrices.
+"""
+from typing import Iterable, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix, issparse
+
+# maximal number of cells in a dense block of scores
+SCORES_BLOCK_SIZE = 2**24
+
+
+def get_ids(data: Union[pd.DataFrame, Iterable, None], column: str) -> Optional[np.ndarray]:
+    """
+    Unique sorted ids from a dataframe column or an array-like.
+
+    :param data: pandas dataframe with ``column`` or array-like of ids
+    :param column: id column name
+    :return: sorted unique ids or ``None`` if ``data`` is ``None``
+    """
+    if data is None:
+        return None
+    if isinstance(data, pd.DataFrame):
+        data = data[column]
+    return np.unique(np.asarray(data, dtype=np.int64))
+
+
+def interactions_to_csr(
+    interactions: pd.DataFrame,
+    query_column: str,
+    item_column: str,
+    shape: Tuple[int, int],
+    rating_column: Optional[str] = None,
+) -> csr_matrix:
+    """
+    Query-item matrix of interactions, values of duplicated pairs are summed up.
+
+    :param interactions: pandas dataframe with interactions
+    :param query_column: query id column, ids are row indices
+    :param item_column: item id column, ids are column indices
+    :param shape: matrix shape
+    :param rating_column: column with values, every interaction counts as ``1`` if ``None``
+    :return: sparse matrix
+    """
+    values = (
+        np.ones(len(interactions), dtype=np.float64)
+        if rating_column is None
+        else interactions[rating_column].to_numpy(dtype=np.float64)
+    )
+    matrix = csr_matrix(
+        (values, (interactions[query_column].to_numpy(), interactions[item_column].to_numpy())),
+        shape=shape,
+    )
+    matrix.sum_duplicates()
+    return matrix
+
+
+def sparse_product(left: csr_matrix, right: csr_matrix) -> csr_matrix:
+    """
+    Product of sparse matrices, which keeps entries with zero values
+    if they are produced by stored entries of ``left`` and ``right``,
+    like a join of Spark dataframes does.
+
+    :param left: left sparse matrix
+    :param right: right sparse matrix
+    :return: sparse matrix product
+    """
+    structure = (_structure(left) @ _structure(right)).tocoo()
+    if structure.nnz == 0:
+        return csr_matrix(structure.shape)
+    values = (left @ right).tocsr()
+    return csr_matrix(
+        (np.asarray(values[structure.row, structure.col]).ravel(), (structure.row, structure.col)),
+        shape=structure.shape,
+    )
+
+
+def _structure(matrix: csr_matrix) -> csr_matrix:
+    matrix = csr_matrix(matrix, copy=True)
+    matrix.data = np.ones_like(matrix.data)
+    return matrix
+
+
+def to_dense_scores(scores: Union[np.ndarray, csr_matrix]) -> np.ndarray:
+    """
+    Dense float scores, where missing values of a sparse matrix become ``NaN``.
+
+    :param scores: dense array or sparse matrix of scores
+    :return: writable dense array
+    """
+    if not issparse(scores):
+        return np.array(scores, dtype=np.float64)
+    coo = scores.tocoo()
+    dense = np.full(coo.shape, np.nan)
+    dense[coo.row, coo.col] = coo.data
+    return dense
+
+
+def top_k_dense(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Positions of ``k`` largest finite scores in every row.
+    Ties are resolved by the smaller column index.
+
+    :param scores: dense array of scores, non-finite scores are never selected
+    :param k: number of positions for each row
+    :return: row and column indices ordered by row, descending score and column
+    """
+    scores = np.where(np.isfinite(scores), scores, -np.inf)
+    if k < scores.shape[1]:
+        kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1 : k]
+        rows, cols = np.nonzero((scores >= kth) & np.isfinite(scores))
+    else:
+        rows, cols = np.nonzero(np.isfinite(scores))
+    order = np.lexsort((cols, -scores[rows, cols], rows))
+    rows, cols = rows[order], cols[order]
+    return _first_k_of_rows(rows, cols, k)
+
+
+def top_k_sparse(matrix: csr_matrix, k: int, ascending_ties: bool = True) -> csr_matrix:
+    """
+    Keep ``k`` largest values in every row of a sparse matrix.
+
+    :param matrix: sparse matrix
+    :param k: number of values to keep in each row
+    :param ascending_ties: resolve ties by the smaller column index, by the larger one otherwise
+    :return: sparse matrix of the same shape
+    """
+    coo = matrix.tocoo()
+    order = np.lexsort((coo.col if ascending_ties else -coo.col, -coo.data, coo.row))
+    kept = order[_first_k_mask(coo.row[order], k)]
+    return csr_matrix((coo.data[kept], (coo.row[kept], coo.col[kept])), shape=matrix.shape)
+
+
+def _first_k_mask(sorted_rows: np.ndarray, k: int) -> np.ndarray:
+    is_row_start = np.ones(len(sorted_rows), dtype=bool)
+    is_row_start[1:] = sorted_rows[1:] != sorted_rows[:-1]
+    positions = np.arange(len(sorted_rows))
+    row_starts = np.maximum.accumulate(np.where(is_row_start, positions, 0))
+    return positions - row_starts < k
+
+
+def _first_k_of_rows(sorted_rows: np.ndarray, cols: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    mask = _first_k_mask(sorted_rows, k)
+    return sorted_rows[mask], cols[mask]
+
+
+def query_blocks(num_queries: int, num_items: int) -> Iterable[slice]:
+    """
+    Slices of queries, such that dense scores of a slice fit into ``SCORES_BLOCK_SIZE`` cells.
+
+    :param num_queries: number of queries
+    :param num_items: number of items scored for every query
+    """
+    block = max(1, SCORES_BLOCK_SIZE // max(num_items, 1))
+    for start in range(0, num_queries, block):
+        yield slice(start, min(start + block, num_queries))
@@ -15,10 +15,11 @@ from .types import PYSPARK_AVAILABLE, DataFrameLike, MissingImportType, NumType,
 
 if PYSPARK_AVAILABLE:
     import pyspark.sql.types as st
-    from pyspark.ml.linalg import DenseVector, Vectors, VectorUDT
+    from pyspark.ml.functions import array_to_vector, vector_to_array
     from pyspark.sql import Column, SparkSession, Window
     from pyspark.sql import functions as sf
     from pyspark.sql.column import _to_java_column, _to_seq
+    from pyspark.sql.pandas.types import to_arrow_schema
     from pyspark.sql.types import DoubleType, IntegerType, StructField, StructType
 else:
     Column = MissingImportType
@@ -143,11 +144,72 @@ def get_top_k(
     )
 
 
+# pylint: disable=too-many-arguments
+def get_top_k_by_columns(
+    dataframe: SparkDataFrame,
+    partition_column: str,
+    order_columns: List[str],
+    k: int,
+    ascending: Union[bool, List[bool]] = False,
+    rank_column: Optional[str] = None,
+) -> SparkDataFrame:
+    """
+    Return top ``k`` rows for each value of ``partition_column`` ordered by ``order_columns``.
+    Unlike ``get_top_k`` every Spark partition at first keeps only ``k`` best rows of each value
+    of ``partition_column`` in every Arrow batch, so only these rows are shuffled and ranked by the window.
+    Put a unique column last into ``order_columns`` to make ties resolution deterministic.
+
+    >>> from replay.utils.session_handler import State
+    >>> spark = State().session
+    >>> log = spark.createDataFrame([(1, 2, 1.), (1, 3, 1.), (1, 4, 0.5), (2, 1, 1.)]).toDF("user_id", "item_id", "relevance")
+    >>> get_top_k_by_columns(log, "user_id", ["relevance", "item_id"], k=2, ascending=[False, True]).orderBy("user_id", "item_id").show()
+    +-------+-------+---------+
+    |user_id|item_id|relevance|
+    +-------+-------+---------+
+    |      1|      2|      1.0|
+    |      1|      3|      1.0|
+    |      2|      1|      1.0|
+    +-------+-------+---------+
+    <BLANKLINE>
+
+    :param dataframe: spark dataframe to filter
+    :param partition_column: column to select top rows for each of its values
+    :param order_columns: columns to order rows by
+    :param k: number of first rows for each value of ``partition_column`` to return
+    :param ascending: sort order for all ``order_columns`` or for each of them, descending by default
+    :param rank_column: name of column with rank of row starting from 1 to add to the result,
+        the rank is not returned if ``None``
+    :return: filtered spark dataframe
+    """
+    ascending = ascending if isinstance(ascending, list) else [ascending] * len(order_columns)
+
+    def keep_top_k(batches: Iterable[pd.DataFrame]) -> Iterable[pd.DataFrame]:
+        for batch in batches:
+            batch = batch.sort_values(order_columns, ascending=ascending, kind="stable")
+            yield batch[batch.groupby(partition_column, sort=False, dropna=False).cumcount() < k]
+
+    try:
+        to_arrow_schema(dataframe.schema)
+        candidates = dataframe.mapInPandas(keep_top_k, dataframe.schema)
+    except TypeError:
+        # columns of types unsupported by Arrow are ranked by the window only
+        candidates = dataframe
+
+    order_by_col = [
+        sf.col(column).asc() if is_ascending else sf.col(column).desc()
+        for column, is_ascending in zip(order_columns, ascending)
+    ]
+    rank = sf.row_number().over(Window.partitionBy(partition_column).orderBy(*order_by_col))
+    top_k = candidates.withColumn(rank_column or "temp_rank", rank).filter(sf.col(rank_column or "temp_rank") <= k)
+    return top_k if rank_column else top_k.drop("temp_rank")
+
+
 def get_top_k_recs(
     recs: SparkDataFrame,
     k: int,
     query_column: str = "user_idx",
     rating_column: str = "relevance",
+    item_column: Optional[str] = None,
 ) -> SparkDataFrame:
     """
     Get top k recommendations by `rating`.
@@ -155,22 +217,41 @@ def get_top_k_recs(
     :param recs: recommendations DataFrame
         `[user_idx, item_idx, rating]`
     :param k: length of a recommendation list
-    :param id_type: id or idx
+    :param query_column: query column name
+    :param rating_column: rating column name
+    :param item_column: if set, items with equal rating are ordered by ascending item id,
+        otherwise the order of ties is arbitrary
     :return: top k recommendations `[user_id, item_id, rating]`
     """
-    return get_top_k(
-        dataframe=recs,
-        partition_by_col=sf.col(query_column),
-        order_by_col=[sf.col(rating_column).desc()],
-        k=k,
-    )
+    if item_column is None:
+        return get_top_k_by_columns(recs, query_column, [rating_column], k)
+    return get_top_k_by_columns(recs, query_column, [rating_column, item_column], k, ascending=[False, True])
 
 
 if PYSPARK_AVAILABLE:
-    @sf.udf(returnType=st.DoubleType())
-    def vector_dot(one: DenseVector, two: DenseVector) -> float:
+    def _sum_array(array: Column) -> Column:
+        """
+        sum of array elements calculated in JVM
+
+        :param array: column with arrays of doubles
+        :returns: column expression
+        """
+        return sf.aggregate(array, sf.lit(0.0).cast(st.DoubleType()), lambda acc, x: acc + x)
+
+    def _double_array_mult(first: Column, second: Column) -> Column:
+        """
+        elementwise multiplication of two arrays with double precision
+
+        :param first: first array
+        :param second: second array
+        :returns: column expression
         """
-        dot product of two column vectors
+        return sf.zip_with(first, second, lambda x, y: x.cast(st.DoubleType()) * y.cast(st.DoubleType()))
+
+    def vector_dot(one: Union[Column, str], two: Union[Column, str]) -> Column:
+        """
+        dot product of two column vectors.
+        It is calculated with Spark higher-order functions without Python serialization.
 
         >>> from replay.utils.session_handler import State
         >>> from pyspark.ml.linalg import Vectors
@@ -203,14 +284,12 @@ if PYSPARK_AVAILABLE:
         :param two: vector two
         :returns: dot product
         """
-        return float(one.dot(two))
+        return _sum_array(_double_array_mult(vector_to_array(one), vector_to_array(two)))
 
-    @sf.udf(returnType=VectorUDT())  # type: ignore
-    def vector_mult(
-        one: Union[DenseVector, NumType], two: DenseVector
-    ) -> DenseVector:
+    def vector_mult(one: Union[Column, str, NumType], two: Union[Column, str], scalar: bool = False) -> Column:
         """
-        elementwise vector multiplication
+        elementwise vector multiplication.
+        It is calculated with Spark higher-order functions without Python serialization.
 
         >>> from replay.utils.session_handler import State
         >>> from pyspark.ml.linalg import Vectors
@@ -238,17 +317,31 @@ if PYSPARK_AVAILABLE:
         |[3.0,8.0]|
         +---------+
         <BLANKLINE>
+        >>> scalars = spark.createDataFrame([(2, Vectors.dense([3.0, 4.0]))]).toDF("one", "two")
+        >>> scalars.select(vector_mult("one", "two", scalar=True).alias("mult")).show()
+        +---------+
+        |     mult|
+        +---------+
+        |[6.0,8.0]|
+        +---------+
+        <BLANKLINE>
 
-        :param one: vector one
+        :param one: vector one, a number or a numeric column if ``scalar`` is ``True``
         :param two: vector two
+        :param scalar: ``one`` is a column with numbers, which multiply vector two
         :returns: result
         """
-        return one * two
-
-    @sf.udf(returnType=st.ArrayType(st.DoubleType()))
-    def array_mult(first: st.ArrayType, second: st.ArrayType):
+        if isinstance(one, (int, float)):
+            one, scalar = sf.lit(float(one)), True
+        if scalar:
+            one = (one if isinstance(one, Column) else sf.col(one)).cast(st.DoubleType())
+            return array_to_vector(sf.transform(vector_to_array(two), lambda x: x * one))
+        return array_to_vector(_double_array_mult(vector_to_array(one), vector_to_array(two)))
+
+    def array_mult(first: Union[Column, str], second: Union[Column, str]) -> Column:
         """
-        elementwise array multiplication
+        elementwise array multiplication.
+        It is calculated with Spark higher-order functions without Python serialization.
 
         >>> from replay.utils.session_handler import State
         >>> spark = State().session
@@ -280,8 +373,10 @@ if PYSPARK_AVAILABLE:
         :param second: second array
         :returns: result
         """
-
-        return [first[i] * second[i] for i in range(len(first))]
+        return _double_array_mult(
+            first if isinstance(first, Column) else sf.col(first),
+            second if isinstance(second, Column) else sf.col(second),
+        )
 
 
 def multiply_scala_udf(scalar, vector):
@@ -668,46 +763,50 @@ def process_timestamp_column(
 
 
 if PYSPARK_AVAILABLE:
-    @sf.udf(returnType=VectorUDT())
-    def list_to_vector_udf(array: st.ArrayType) -> DenseVector:
+    def list_to_vector_udf(array: Union[Column, str]) -> Column:
         """
         convert spark array to vector
 
         :param array: spark Array to convert
         :return:  spark DenseVector
         """
-        return Vectors.dense(array)
+        return array_to_vector(array)
+
+    def _squared_distance(first: Union[Column, str], second: Union[Column, str]) -> Column:
+        """
+        :param first: first vector
+        :param second: second vector
+        :returns: squared distance value of double type
+        """
+        return _sum_array(
+            sf.zip_with(vector_to_array(first), vector_to_array(second), lambda x, y: (x - y) * (x - y))
+        )
 
-    @sf.udf(returnType=st.FloatType())
-    def vector_squared_distance(first: DenseVector, second: DenseVector) -> float:
+    def vector_squared_distance(first: Union[Column, str], second: Union[Column, str]) -> Column:
         """
         :param first: first vector
         :param second: second vector
         :returns: squared distance value
         """
-        return float(first.squared_distance(second))
+        return _squared_distance(first, second).cast(st.FloatType())
 
-    @sf.udf(returnType=st.FloatType())
-    def vector_euclidean_distance_similarity(
-        first: DenseVector, second: DenseVector
-    ) -> float:
+    def vector_euclidean_distance_similarity(first: Union[Column, str], second: Union[Column, str]) -> Column:
         """
         :param first: first vector
         :param second: second vector
         :returns: 1/(1 + euclidean distance value)
         """
-        return 1 / (1 + float(first.squared_distance(second)) ** 0.5)
+        return (1 / (1 + sf.sqrt(_squared_distance(first, second)))).cast(st.FloatType())
 
-    @sf.udf(returnType=st.FloatType())
-    def cosine_similarity(first: DenseVector, second: DenseVector) -> float:
+    def cosine_similarity(first: Union[Column, str], second: Union[Column, str]) -> Column:
         """
         :param first: first vector
         :param second: second vector
         :returns: cosine similarity value
         """
-        num = first.dot(second)
-        denom = first.dot(first) ** 0.5 * second.dot(second) ** 0.5
-        return float(num / denom)
+        num = vector_dot(first, second)
+        denom = sf.sqrt(vector_dot(first, first)) * sf.sqrt(vector_dot(second, second))
+        return (num / denom).cast(st.FloatType())
 
 
 def cache_temp_view(df: SparkDataFrame, name: str) -> None:
@@ -0,0 +1,57 @@
+# pylint: disable=redefined-outer-name, missing-function-docstring
+import json
+from dataclasses import replace
+
+import pandas as pd
+import pytest
+
+from benchmarks.compare import compare_results, main
+from benchmarks.data import SCALES, generate_interactions
+
+
+def _results(median_seconds, peak_python_memory_mb):
+    return {
+        "meta": {"scale": SCALES["tiny"].as_dict()},
+        "results": {
+            "ItemKNN._fit_wrap[spark]": {
+                "median_seconds": median_seconds,
+                "peak_python_memory_mb": peak_python_memory_mb,
+            }
+        },
+    }
+
+
+@pytest.mark.core
+def test_generate_interactions_is_deterministic():
+    scale = SCALES["tiny"]
+    interactions = generate_interactions(scale)
+
+    pd.testing.assert_frame_equal(interactions, generate_interactions(scale))
+    assert not interactions.equals(generate_interactions(replace(scale, seed=scale.seed + 1)))
+    assert not interactions.duplicated(["user_idx", "item_idx"]).any()
+    assert interactions["user_idx"].nunique() == scale.num_queries
+
+
+@pytest.mark.core
+def test_compare_results_flags_slowdown():
+    rows = compare_results(_results(1.0, 10.0), _results(1.5, 10.5), threshold=0.2)
+
+    regressions = {row["metric"]: row["regression"] for row in rows}
+    assert regressions == {"median_seconds": True, "peak_python_memory_mb": False}
+
+
+@pytest.mark.core
+@pytest.mark.parametrize("threshold, is_regression", [("0.2", True), ("0.6", False)])
+def test_compare_exit_code(tmp_path, threshold, is_regression):
+    paths = []
+    for name, results in [("baseline", _results(1.0, 10.0)), ("current", _results(1.5, 10.0))]:
+        path = tmp_path / f"{name}.json"
+        path.write_text(json.dumps(results), encoding="utf-8")
+        paths.append(str(path))
+
+    if is_regression:
+        with pytest.raises(SystemExit) as error:
+            main([*paths, "--threshold", threshold])
+        assert error.value.code == 1
+    else:
+        main([*paths, "--threshold", threshold])
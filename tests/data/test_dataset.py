@@ -1018,3 +1018,29 @@ def test_pandas_dataframe_in_storage_levels_of_spark(full_pandas_dataset):
     assert dataset.persist() is None
     assert dataset.unpersist() is None
     assert dataset.cache() is None
+
+
+@pytest.mark.spark
+def test_get_seen_items(interactions_full_spark_dataset):
+    dataset = create_dataset(interactions_full_spark_dataset)
+    seen_items = dataset.get_seen_items()
+    assert dataset.get_seen_items() is seen_items
+    assert {row["user_id"]: row["seen_items"] for row in seen_items.collect()} == {
+        0: [0, 1],
+        1: [0, 2, 3],
+        2: [1],
+    }
+
+    dataset.unpersist()
+    compare_storage_level(seen_items.storageLevel, StorageLevel(False, False, False, False, 1))
+    assert dataset.get_seen_items() is not seen_items
+
+
+@pytest.mark.spark
+def test_get_seen_items_of_queries(interactions_full_spark_dataset, spark):
+    dataset = create_dataset(interactions_full_spark_dataset)
+    queries = spark.createDataFrame([(1,), (2,), (5,)], schema=["user_id"])
+    seen_items = dataset.get_seen_items(queries)
+    assert {row["user_id"]: row["seen_items"] for row in seen_items.collect()} == {1: [0, 2, 3], 2: [1]}
+    compare_storage_level(seen_items.storageLevel, StorageLevel(False, False, False, False, 1))
+    assert dataset._seen_items is None
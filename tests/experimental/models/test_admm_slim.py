@@ -3,6 +3,7 @@ from datetime import datetime
 
 import numpy as np
 import pytest
+from scipy.sparse import csr_matrix
 
 pyspark = pytest.importorskip("pyspark")
 torch = pytest.importorskip("torch")
@@ -78,6 +79,51 @@ def test_fit(simple_log, model):
     )
 
 
+@pytest.mark.experimental
+def test_sparse_fit_equals_dense(simple_log):
+    dense_model = ADMMSLIM(1, 10, seed=SEED)
+    sparse_model = ADMMSLIM(1, 10, seed=SEED, num_neighbours=2)
+    sparse_model.block_size = 4
+    for model in [dense_model, sparse_model]:
+        model.max_iteration = 3000
+        model.eps_abs = model.eps_rel = 1e-9
+        model.fit(simple_log)
+    columns = ["item_idx_one", "item_idx_two", "similarity"]
+    dense = dense_model.similarity.toPandas().sort_values(columns[:2])[columns].to_numpy()
+    sparse = sparse_model.similarity.toPandas().sort_values(columns[:2])[columns].to_numpy()
+    assert dense.shape == sparse.shape
+    assert np.allclose(dense, sparse, atol=1e-6)
+
+
+@pytest.mark.experimental
+@pytest.mark.parametrize("num_neighbours", [None, 2])
+def test_fit_with_rescaled_rho(num_neighbours):
+    xtx = np.array([[2.0, 0.0, 2.0], [0.0, 9.0, 4.0], [2.0, 4.0, 8.0]])
+    model = ADMMSLIM(1, 10, seed=SEED, num_neighbours=num_neighbours)
+    model.max_iteration = 3000
+    model.eps_abs = model.eps_rel = 1e-9
+    model._item_dim_size = 3
+    similarity = (model._fit_dense(xtx) if num_neighbours is None else model._fit_sparse(csr_matrix(xtx))).toarray()
+    assert model.rho != 10
+
+    # proximal gradient descent for the same objective
+    expected = np.zeros_like(xtx)
+    step = 1 / (np.linalg.eigvalsh(xtx).max() + 10)
+    for _ in range(100_000):
+        expected -= step * (xtx @ expected - xtx + 10 * expected)
+        expected = np.sign(expected) * np.maximum(np.abs(expected) - step, 0)
+        np.fill_diagonal(expected, 0)
+    assert np.allclose(similarity, expected, atol=1e-6)
+
+
+@pytest.mark.experimental
+def test_sparse_fit_num_neighbours(log):
+    model = ADMMSLIM(1, 10, seed=SEED, num_neighbours=1)
+    model.fit(log)
+    neighbours = model.similarity.groupBy("item_idx_two").count().toPandas()
+    assert (neighbours["count"] <= 1).all()
+
+
 @pytest.mark.experimental
 def test_predict(simple_log, model):
     model.fit(simple_log)
@@ -94,6 +140,12 @@ def test_exceptions(lambda_1, lambda_2):
         ADMMSLIM(lambda_1, lambda_2)
 
 
+@pytest.mark.experimental
+def test_invalid_num_neighbours():
+    with pytest.raises(ValueError, match="num_neighbours"):
+        ADMMSLIM(num_neighbours=0)
+
+
 @pytest.mark.experimental
 def test_predict_pairs_warm_items_only(log, log_to_pred):
     model = ADMMSLIM(seed=SEED)
@@ -109,6 +109,29 @@ def test_mdp_dataset_builder(log: SparkDataFrame):
     assert mdp_dataset.terminals[:n] == approx(gt_terminals)
 
 
+@pytest.mark.experimental
+def test_mdp_dataset_builder_partitions(log: SparkDataFrame):
+    """Test MDP dataset does not depend on partitioning of the log."""
+    builder = MdpDatasetBuilder(top_k=1, action_randomization_scale=1e-9)
+    log = log.filter(sf.col("user_idx").isin([0, 1]))
+    mdp_dataset = builder.build(log.coalesce(1))
+    partitioned_mdp_dataset = builder.build(log.repartition(4))
+
+    assert partitioned_mdp_dataset.observations == approx(mdp_dataset.observations)
+    assert partitioned_mdp_dataset.actions.flatten() == approx(mdp_dataset.actions.flatten(), abs=1e-2)
+    assert partitioned_mdp_dataset.rewards == approx(mdp_dataset.rewards)
+    assert partitioned_mdp_dataset.terminals == approx(mdp_dataset.terminals)
+
+
+@pytest.mark.experimental
+def test_policy_is_deserialized_once(log: SparkDataFrame):
+    model = CQL(n_epochs=1, mdp_dataset_builder=MdpDatasetBuilder(top_k=1))
+    policy_bytes = model._serialize_policy()
+    policy = model._get_policy("key", policy_bytes)
+    assert model._get_policy("key", policy_bytes) is policy
+    assert model._get_policy("other_key", policy_bytes) is not policy
+
+
 @pytest.mark.experimental
 def test_predict_pairs_warm_items_only(log, log_to_pred):
     model = CQL(n_epochs=1, mdp_dataset_builder=MdpDatasetBuilder(top_k=3), batch_size=512)
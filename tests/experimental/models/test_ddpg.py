@@ -425,6 +425,54 @@ def test_env_step(log, model, user=[0, 1, 2]):
     assert (model.model.environment.memory[user, -1] == global_action).prod()
 
 
+@pytest.mark.experimental
+def test_env_reset(log, model, user=[0, 1, 2]):
+    train_matrix, _, _, _ = model._preprocess_log(log)
+    model.model = ActorDRR(
+        model.user_num,
+        model.item_num,
+        model.embedding_dim,
+        model.hidden_dim,
+        model.memory_size,
+        1,
+        torch.device("cpu"),
+        min_trajectory_len=2,
+    )
+    environment = model.model.environment
+    environment.update_env(matrix=train_matrix)
+
+    environment.reset(user)
+
+    assert environment.available_items.shape == (len(user), 2 * environment.max_num_rele)
+    for idx, user_id in enumerate(user):
+        related = set(train_matrix[user_id].nonzero()[1])
+        available = environment.available_items[idx].tolist()
+        assert set(environment.related_items[idx].tolist()) - {-1} == related
+        assert related.issubset(available)
+        assert len(available) - len(related) == sum(item not in related for item in available)
+
+
+@pytest.mark.experimental
+def test_replay_buffer_ring():
+    replay_buffer = ReplayBuffer(torch.device("cpu"), 5, 2, 3)
+    for step in range(3):
+        users = torch.arange(2 * step, 2 * step + 2)
+        replay_buffer.push(
+            users,
+            torch.zeros((2, 2)),
+            torch.zeros((2, 3)),
+            torch.ones(2),
+            users,
+            torch.zeros((2, 2)),
+            torch.ones(2),
+            torch.ones(2),
+        )
+
+    assert len(replay_buffer) == 5
+    assert replay_buffer.buffer["user"].tolist() == [5, 1, 2, 3, 4]
+    assert replay_buffer.sample(7)["memory"].shape == (7, 2)
+
+
 @pytest.mark.experimental
 def test_predict_pairs_to_file(spark, long_log_with_features, tmp_path):
     model = DDPG(seed=SEED, user_num=6, item_num=6)
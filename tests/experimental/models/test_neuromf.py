@@ -275,3 +275,32 @@ def test_predict_cold_and_new_filter_out(long_log_with_features):
         assert pred.count() == 0
     else:
         assert 1 <= pred.count() <= 2
+
+
+@pytest.mark.experimental
+def test_predict_batch_size_does_not_change_recs(log):
+    model = NeuroMF()
+    model.fit(log)
+    recs = model.predict(log, k=2).toPandas()
+    model.predict_batch_size = 1
+    batched_recs = model.predict(log, k=2).toPandas()
+    assert np.allclose(
+        recs.sort_values(["user_idx", "item_idx"]).to_numpy(),
+        batched_recs.sort_values(["user_idx", "item_idx"]).to_numpy(),
+    )
+
+
+@pytest.mark.experimental
+def test_predict_batch_size_bounded_by_pairs_block(log):
+    model = NeuroMF()
+    model.predict_pairs_block_size = 10
+    assert model._get_predict_batch_size(4) == 2
+    assert model._get_predict_batch_size(100) == 1
+    model.fit(log)
+    recs = model.predict(log, k=2)
+    assert model._model_broadcast is None
+    model.predict_pairs_block_size = NeuroMF.predict_pairs_block_size
+    assert np.allclose(
+        recs.toPandas().sort_values(["user_idx", "item_idx"]).to_numpy(),
+        model.predict(log, k=2).toPandas().sort_values(["user_idx", "item_idx"]).to_numpy(),
+    )
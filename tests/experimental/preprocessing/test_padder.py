@@ -377,3 +377,46 @@ def test_not_array_column(pad_columns, dataframe):
 def test_invalid_column_dtype_pandas(pad_columns, dataframe_pandas):
     with pytest.raises(ValueError):
         Padder(pad_columns=pad_columns).transform(dataframe_pandas)
+
+
+@pytest.mark.experimental
+@pytest.mark.parametrize(
+    "padding_side, cut_array, cut_side, array_size",
+    [("right", True, "right", 5), ("left", True, "left", 3), ("right", False, "right", 3), ("left", True, "right", None)],
+)
+@pytest.mark.parametrize("dataset", ["dataframe", "dataframe_pandas"])
+def test_padder_columnar_equals_default(padding_side, cut_array, cut_side, array_size, dataset, request):
+    dataframe = request.getfixturevalue(dataset)
+    params = {
+        "pad_columns": ["item_id", "timestamp"],
+        "padding_value": [-1, 0],
+        "padding_side": padding_side,
+        "array_size": array_size,
+        "cut_array": cut_array,
+        "cut_side": cut_side,
+    }
+
+    padded = Padder(**params).transform(dataframe)
+    columnar_padded = Padder(**params, columnar=True).transform(dataframe)
+    if isinstance(padded, SparkDataFrame):
+        padded, columnar_padded = padded.toPandas(), columnar_padded.toPandas()
+
+    for column in ["item_id", "timestamp"]:
+        assert [list(value) for value in padded[column]] == [list(value) for value in columnar_padded[column]]
+
+
+@pytest.mark.experimental
+def test_padder_transform_to_arrays(dataframe_pandas):
+    arrays = Padder(
+        pad_columns=["item_id", "timestamp"], padding_value=[-1, 0], array_size=4, columnar=True
+    ).transform_to_arrays(dataframe_pandas)
+
+    assert arrays["item_id"].shape == (len(dataframe_pandas), 4)
+    assert arrays["timestamp"].shape == (len(dataframe_pandas), 4)
+    assert arrays["timestamp"].dtype.kind == "i"
+
+
+@pytest.mark.experimental
+def test_padder_transform_to_arrays_without_cut(dataframe_pandas):
+    with pytest.raises(ValueError):
+        Padder(pad_columns="item_id", array_size=1, cut_array=False).transform_to_arrays(dataframe_pandas)
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 import pytest
 
@@ -378,3 +379,37 @@ def test_array_columns(dataset, request):
     assert "timestamp_list" in columns
     assert "label_timestamp" in columns
     assert "user_id" in columns
+
+
+@pytest.mark.experimental
+@pytest.mark.parametrize("len_window, get_list_len", [(5, False), (2, True)])
+@pytest.mark.parametrize("orderby_column", [["user_id", "timestamp"], "timestamp"])
+@pytest.mark.parametrize("dataset", ["simple_dataframe", "simple_dataframe_pandas"])
+def test_columnar_equals_default(len_window, get_list_len, orderby_column, dataset, request):
+    simple_dataframe = request.getfixturevalue(dataset)
+    params = {
+        "groupby_column": "user_id",
+        "orderby_column": orderby_column,
+        "transform_columns": ["item_id", "timestamp"],
+        "len_window": len_window,
+        "get_list_len": get_list_len,
+    }
+
+    sequences = SequenceGenerator(**params).transform(simple_dataframe)
+    columnar_sequences = SequenceGenerator(**params, columnar=True).transform(simple_dataframe)
+
+    if isinstance(sequences, SparkDataFrame):
+        sequences = sequences.toPandas().sort_values(["user_id", "label_timestamp"], ignore_index=True)
+        columnar_sequences = columnar_sequences.toPandas().sort_values(
+            ["user_id", "label_timestamp"], ignore_index=True
+        )
+
+    assert list(sequences.columns) == list(columnar_sequences.columns)
+    for column in sequences.columns:
+        assert [_to_list(value) for value in sequences[column]] == [
+            _to_list(value) for value in columnar_sequences[column]
+        ]
+
+
+def _to_list(value):
+    return list(value) if isinstance(value, (list, np.ndarray)) else value
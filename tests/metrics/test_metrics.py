@@ -1,6 +1,8 @@
 import random
 import string
 
+import numpy as np
+import pandas as pd
 import pytest
 from pytest import approx
 
@@ -21,7 +23,9 @@ from replay.metrics import (
     Surprisal,
     Unexpectedness,
 )
+from replay.metrics.base_metric import _get_hits_matrices
 from replay.utils import DataFrameLike, PandasDataFrame, SparkDataFrame
+from tests.utils import spark
 
 ABS = 1e-5
 QUERY_COLUMN = "uid"
@@ -480,3 +484,55 @@ def test_check_types(metric, predict_data, gt_data, request):
 def test_topk_instance(metric, topk):
     with pytest.raises(ValueError):
         metric(topk)
+
+
+@pytest.mark.core
+@pytest.mark.parametrize("metric", [Coverage, CategoricalDiversity, Novelty, RocAuc])
+def test_metric_without_hits_kernel(metric):
+    assert metric._get_metric_values_by_hits is None
+
+
+@pytest.mark.core
+@pytest.mark.parametrize("metric", [MAP, MRR, NDCG, HitRate, Precision, Recall])
+def test_metric_values_by_hits_equal_to_per_user(metric):
+    rng = np.random.default_rng(42)
+    topk = [1, 3, 5, 20]
+    ground_truth = [rng.choice(30, size=rng.integers(1, 10), replace=False) for _ in range(200)]
+    pred = [rng.integers(0, 30, size=rng.integers(0, 25)) for _ in range(200)]
+
+    hits, unique_hits, pred_len, ground_truth_len = _get_hits_matrices(
+        pd.Series(ground_truth), pd.Series(pred), max(topk)
+    )
+    values = metric._get_metric_values_by_hits(topk, hits, unique_hits, ground_truth_len)
+    values[(pred_len == 0) | (ground_truth_len == 0)] = 0.0
+
+    for user, (user_gt, user_pred) in enumerate(zip(ground_truth, pred)):
+        expected = metric._get_metric_value_by_user(topk, list(user_gt), list(user_pred))
+        assert list(values[user]) == expected
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("metric", [MAP, MRR, NDCG, HitRate, Precision, Recall])
+def test_spark_metric_equal_to_dict(metric, spark):
+    rng = np.random.default_rng(7)
+    recs = pd.DataFrame(
+        {
+            QUERY_COLUMN: rng.integers(0, 50, size=500),
+            ITEM_COLUMN: [f"item_{i}" for i in rng.integers(0, 40, size=500)],
+            RATING_COLUMN: rng.permutation(500) / 500,
+        }
+    ).drop_duplicates([QUERY_COLUMN, ITEM_COLUMN])
+    ground_truth = pd.DataFrame(
+        {
+            QUERY_COLUMN: rng.integers(0, 60, size=300),
+            ITEM_COLUMN: [f"item_{i}" for i in rng.integers(0, 40, size=300)],
+        }
+    ).drop_duplicates()
+
+    metric_instance = metric([1, 5, 10], mode=PerUser(), **INIT_DICT)
+    result_spark = metric_instance(spark.createDataFrame(recs), spark.createDataFrame(ground_truth))
+    result_pd = metric_instance(recs, ground_truth)
+
+    assert result_spark.keys() == result_pd.keys()
+    for metric_name, values in result_pd.items():
+        assert result_spark[metric_name] == approx(values, abs=1e-12)
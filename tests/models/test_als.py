@@ -1,8 +1,10 @@
 # pylint: disable-all
 import numpy as np
+import pandas as pd
 import pytest
 
 from replay.models import ALSWrap, AssociationRulesItemRec
+from replay.models.als import _top_k_by_factors
 from replay.utils import PYSPARK_AVAILABLE
 from tests.utils import (
     create_dataset,
@@ -172,6 +174,68 @@ def test_init_args(model):
     assert args["seed"] == 42
 
 
+def _factor_scores(model):
+    query_factors = model.model.userFactors.toPandas().set_index("id")["features"]
+    item_factors = model.model.itemFactors.toPandas().set_index("id")["features"]
+    return {
+        (query, item): float(np.dot(query_factor, item_factor))
+        for query, query_factor in query_factors.items()
+        for item, item_factor in item_factors.items()
+    }
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("filter_seen_items", [True, False])
+@pytest.mark.parametrize("items", [None, [0, 2, 3]])
+def test_predict_top_k_by_factors(log, model, filter_seen_items, items):
+    dataset = create_dataset(log)
+    model.fit(dataset)
+    recs = model.predict(dataset, k=2, items=items, filter_seen_items=filter_seen_items).toPandas()
+
+    scores = _factor_scores(model)
+    seen = set(map(tuple, log.select("user_idx", "item_idx").toPandas().to_numpy()))
+    for query, query_recs in recs.groupby("user_idx"):
+        candidates = {
+            item: score
+            for (score_query, item), score in scores.items()
+            if score_query == query
+            and (items is None or item in items)
+            and not (filter_seen_items and (query, item) in seen)
+        }
+        expected = sorted(candidates.values(), reverse=True)[:2]
+        assert np.allclose(sorted(query_recs["relevance"], reverse=True), expected, atol=1e-5)
+        assert all(np.isclose(candidates[item], rating, atol=1e-5) for item, rating in zip(query_recs["item_idx"], query_recs["relevance"]))
+
+
+@pytest.mark.core
+def test_top_k_by_factors_masks_seen_items():
+    query_factors = pd.Series([np.array([1.0, 0.0]), np.array([0.0, 1.0]), np.array([1.0, 1.0])])
+    seen_items = pd.Series([np.array([2, 7]), None, np.array([], dtype=np.int64)], dtype=object)
+    item_ids = np.array([1, 2, 3])
+    item_factors = np.array([[1.0, 0.0], [2.0, 0.0], [0.0, 3.0]])
+    query_ids, item_ids, ratings = _top_k_by_factors(
+        np.array([10, 11, 12]), query_factors, seen_items, item_ids, item_factors, k=1
+    )
+    assert dict(zip(query_ids, zip(item_ids, ratings))) == {10: (1, 1.0), 11: (3, 3.0), 12: (3, 3.0)}
+
+
+@pytest.mark.spark
+def test_predict_pairs_by_factors(log, log_to_pred, model):
+    dataset = create_dataset(log)
+    model.fit(dataset)
+    pairs = log_to_pred.select("user_idx", "item_idx").unionByName(log.select("user_idx", "item_idx"))
+    recs = model.predict_pairs(pairs, dataset).toPandas()
+
+    scores = _factor_scores(model)
+    expected = [
+        pair for pair in map(tuple, pairs.toPandas().to_numpy()) if pair in scores
+    ]
+    assert sorted(zip(recs["user_idx"], recs["item_idx"])) == sorted(expected)
+    assert np.allclose(
+        recs["relevance"], [scores[pair] for pair in zip(recs["user_idx"], recs["item_idx"])], atol=1e-5
+    )
+
+
 @pytest.mark.spark
 def test_predict_pairs_raises_pairs_format(log):
     model = ALSWrap(seed=SEED)
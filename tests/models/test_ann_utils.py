@@ -2,7 +2,7 @@
 import numpy as np
 import pytest
 
-from replay.models.extensions.ann.index_inferers.utils import get_csr_matrix
+from replay.models.extensions.ann.index_inferers.utils import get_batch_slices, get_csr_matrix
 from tests.utils import log2, spark
 
 pyspark = pytest.importorskip("pyspark")
@@ -32,3 +32,16 @@ def test_get_csr_matrix(spark, log2):
     )
 
     assert np.array_equal(actual_array, expected_array)
+
+
+@pytest.mark.parametrize(
+    "num_rows, batch_size, expected",
+    [
+        (5, None, [slice(0, 5)]),
+        (5, 2, [slice(0, 2), slice(2, 4), slice(4, 6)]),
+        (4, 4, [slice(0, 4)]),
+        (0, 3, []),
+    ],
+)
+def test_get_batch_slices(num_rows, batch_size, expected):
+    assert list(get_batch_slices(num_rows, batch_size)) == expected
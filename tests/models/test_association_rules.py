@@ -1,4 +1,5 @@
 # pylint: disable=redefined-outer-name, missing-function-docstring, unused-import
+import pandas as pd
 import pytest
 
 from replay.models import AssociationRulesItemRec
@@ -134,3 +135,100 @@ def test_similarity_metric_raises(log, model):
         dataset = create_dataset(log)
         model.fit(dataset)
         model.similarity_metric = "invalid"
+
+
+@pytest.mark.parametrize("use_rating", [True, False])
+@pytest.mark.parametrize("min_item_count", [1, 2])
+def test_refit(log, use_rating, min_item_count):
+    first_part = log.filter(sf.col("timestamp") < "2019-08-26")
+    second_part = log.filter(sf.col("timestamp") >= "2019-08-26")
+    params = {
+        "min_item_count": min_item_count,
+        "min_pair_count": 1,
+        "num_neighbours": 1,
+        "use_rating": use_rating,
+        "session_column": "user_idx",
+    }
+    model = AssociationRulesItemRec(**params)
+    model.fit(create_dataset(first_part))
+    model.refit(create_dataset(second_part))
+    full_model = AssociationRulesItemRec(**params)
+    full_model.fit(create_dataset(log))
+
+    assert model.num_sessions == full_model.num_sessions
+    sparkDataFrameEqual(model.similarity, full_model.similarity)
+
+
+@pytest.mark.parametrize("session_sampling", ["random", "rating"])
+def test_max_session_items(log, session_sampling):
+    params = {"min_item_count": 1, "min_pair_count": 1, "session_column": "user_idx"}
+    model = AssociationRulesItemRec(**params)
+    model.fit(create_dataset(log))
+    long_sessions_model = AssociationRulesItemRec(
+        **params, max_session_items=3, session_sampling=session_sampling
+    )
+    long_sessions_model.fit(create_dataset(log))
+    sparkDataFrameEqual(model.similarity, long_sessions_model.similarity)
+    sparkDataFrameEqual(model.item_stats, long_sessions_model.item_stats)
+
+    # every session contributes at most one pair
+    sampled_model = AssociationRulesItemRec(**params, max_session_items=2, session_sampling=session_sampling)
+    sampled_model.fit(create_dataset(log))
+    sparkDataFrameEqual(model.item_stats, sampled_model.item_stats)
+    num_pairs = sampled_model.pair_stats.select(sf.sum("pair_count")).collect()[0][0]
+    assert num_pairs == log.select("user_idx").distinct().count()
+
+
+@pytest.mark.parametrize("session_sampling", ["random", "rating"])
+def test_refit_with_max_session_items(log, session_sampling):
+    params = {
+        "min_item_count": 1,
+        "min_pair_count": 1,
+        "session_column": "user_idx",
+        "max_session_items": 2,
+        "session_sampling": session_sampling,
+    }
+    model = AssociationRulesItemRec(**params)
+    model.fit(create_dataset(log.filter(sf.col("timestamp") < "2019-08-26")))
+    model.refit(create_dataset(log.filter(sf.col("timestamp") >= "2019-08-26")))
+    full_model = AssociationRulesItemRec(**params)
+    full_model.fit(create_dataset(log))
+
+    sparkDataFrameEqual(model.pair_stats, full_model.pair_stats)
+    sparkDataFrameEqual(model.similarity, full_model.similarity)
+
+
+@pytest.mark.parametrize("session_sampling", ["random", "rating"])
+def test_refit_with_max_session_items_and_new_frequent_items(spark, session_sampling):
+    interactions = pd.DataFrame(
+        {
+            "user_idx": [0, 0, 0, 1, 1, 1, 2, 2, 3, 3],
+            "item_idx": [0, 1, 2, 0, 1, 3, 1, 2, 3, 4],
+            "relevance": [1.0, 2.0, 3.0, 3.0, 2.0, 1.0, 1.0, 2.0, 2.0, 1.0],
+            "timestamp": [0, 0, 0, 0, 0, 0, 0, 0, 1, 1],
+        }
+    )
+    params = {
+        "min_item_count": 2,
+        "min_pair_count": 1,
+        "session_column": "user_idx",
+        "max_session_items": 2,
+        "session_sampling": session_sampling,
+    }
+    model = AssociationRulesItemRec(**params)
+    model.fit(create_dataset(interactions[interactions["timestamp"] == 0]))
+    # item 3 becomes frequent, so the sample of the untouched session 1 changes
+    model.refit(create_dataset(interactions[interactions["timestamp"] == 1]))
+    full_model = AssociationRulesItemRec(**params)
+    full_model.fit(create_dataset(interactions))
+
+    sparkDataFrameEqual(model.pair_stats, full_model.pair_stats)
+    sparkDataFrameEqual(model.similarity, full_model.similarity)
+
+
+@pytest.mark.parametrize(
+    "params", [{"max_session_items": 0}, {"session_sampling": "invalid"}]
+)
+def test_invalid_session_sampling_raises(params):
+    with pytest.raises(ValueError):
+        AssociationRulesItemRec(session_column="user_idx", **params)
@@ -1,9 +1,13 @@
 # pylint: disable=redefined-outer-name, missing-function-docstring, unused-import, pointless-statement
+import pickle
+import threading
+
 import pytest
 
 from replay.data.dataset import Dataset
-from replay.models import Recommender
+from replay.models import PopRec, Recommender
 from replay.utils import PandasDataFrame
+from replay.utils.instrumentation import Instrumentation
 from tests.utils import create_dataset, log, spark
 
 
@@ -56,3 +60,57 @@ def test_items_count(model, log):
 @pytest.mark.core
 def test_str(model):
     assert str(model) == "DerivedRec"
+
+
+@pytest.mark.spark
+def test_instrumentation(log):
+    dataset = create_dataset(log)
+    model = PopRec()
+    model.instrumentation = Instrumentation()
+    model.fit(dataset)
+    model.predict(dataset, k=2)
+
+    fit_report, predict_report = model.instrumentation.reports
+    assert fit_report.name == "fit"
+    assert fit_report.job_ids
+    assert predict_report.name == "predict"
+    stages = [child.name for child in predict_report.children]
+    assert stages == [
+        "filter_cold_for_predict",
+        "filter_cold_for_predict",
+        "score",
+        "filter_seen",
+        "return_recs",
+    ]
+    return_recs_report = predict_report.children[-1]
+    assert return_recs_report.stage_ids
+    assert return_recs_report.output_rows + return_recs_report.shuffle_write_rows > 0
+    assert set(return_recs_report.job_ids).isdisjoint(predict_report.job_ids)
+    assert '"name": "predict"' in predict_report.to_json()
+
+
+@pytest.mark.core
+def test_instrumentation_threads():
+    instrumentation = Instrumentation(collect_spark_metrics=False)
+    started = threading.Barrier(2)
+
+    def run_trial(name):
+        with instrumentation.stage(name):
+            started.wait()
+            with instrumentation.stage(f"{name}_child"):
+                pass
+
+    threads = [threading.Thread(target=run_trial, args=(name,)) for name in ["first", "second"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reports = {report.name: [child.name for child in report.children] for report in instrumentation.reports}
+    assert reports == {"first": ["first_child"], "second": ["second_child"]}
+
+    loaded = pickle.loads(pickle.dumps(instrumentation))
+    assert [report.name for report in loaded.reports] == [report.name for report in instrumentation.reports]
+    with loaded.stage("after_load"):
+        pass
+    assert loaded.last_report.name == "after_load"
@@ -12,6 +12,8 @@ from replay.utils import PYSPARK_AVAILABLE
 from tests.utils import create_dataset, spark
 
 if PYSPARK_AVAILABLE:
+    import pyspark.sql.functions as sf
+
     from replay.models.extensions.ann.index_stores.spark_files_index_store import SparkFilesIndexStore
     from replay.utils.spark_utils import convert2spark
     INTERACTIONS_SCHEMA = get_schema("user_idx", "item_idx", "timestamp", "relevance")
@@ -196,6 +198,18 @@ def test_knn_predict_filter_seen_items(log, model, model_with_ann):
     assert recs1.item_idx.equals(recs2.item_idx)
 
 
+@pytest.mark.spark
+def test_knn_predict_filter_seen_items_of_queries(log, model):
+    dataset = create_dataset(log)
+    model.fit(dataset)
+    recs = model.predict(dataset, k=3, queries=[0], filter_seen_items=True).toPandas()
+
+    seen = log.filter(sf.col("user_idx") == 0).select("item_idx").toPandas()["item_idx"]
+    assert set(recs["user_idx"]) == {0}
+    assert not set(recs["item_idx"]) & set(seen)
+    assert dataset._seen_items is None
+
+
 @pytest.mark.spark
 def test_knn_predict(log_2items_per_user, model, model_with_ann):
     dataset = create_dataset(log_2items_per_user)
@@ -215,3 +229,61 @@ def test_knn_predict(log_2items_per_user, model, model_with_ann):
     )
     assert all(recs1.user_idx.values == recs2.user_idx.values)
     assert all(recs1.item_idx.values == recs2.item_idx.values)
+
+
+@pytest.mark.core
+def test_invalid_similarity_backend():
+    with pytest.raises(ValueError, match="similarity_backend must be one of .*"):
+        ItemKNN(1, similarity_backend="invalid_backend")
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("weighting", [None, "tf_idf", "bm25"])
+@pytest.mark.parametrize("shrink", [0.0, 10.0])
+def test_sparse_similarity_backend(weighting_log, log_2items_per_user, weighting, shrink):
+    interactions = weighting_log.union(log_2items_per_user).union(weighting_log.limit(2))
+    dataset = create_dataset(interactions)
+    join_model = ItemKNN(2, shrink=shrink, weighting=weighting, use_rating=True)
+    sparse_model = ItemKNN(2, shrink=shrink, weighting=weighting, use_rating=True, similarity_backend="sparse")
+    join_model.fit(dataset)
+    sparse_model.fit(dataset)
+
+    columns = ["item_idx_one", "item_idx_two"]
+    join_similarity = join_model.similarity.toPandas().sort_values(columns).reset_index(drop=True)
+    sparse_similarity = sparse_model.similarity.toPandas().sort_values(columns).reset_index(drop=True)
+    assert (join_similarity[columns] == sparse_similarity[columns]).all(axis=None)
+    assert np.allclose(join_similarity["similarity"], sparse_similarity["similarity"])
+
+
+def _sorted_similarity(model):
+    columns = ["item_idx_one", "item_idx_two"]
+    return model.similarity.toPandas().sort_values(columns).reset_index(drop=True)
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("similarity_backend", ["join", "sparse"])
+@pytest.mark.parametrize("use_rating", [True, False])
+def test_refit(log, similarity_backend, use_rating):
+    first_part = log.filter(log.timestamp < datetime(2019, 8, 26))
+    second_part = log.filter(log.timestamp >= datetime(2019, 8, 26))
+    model = ItemKNN(2, shrink=1.0, use_rating=use_rating, similarity_backend=similarity_backend)
+    model.fit(create_dataset(first_part))
+    model.refit(create_dataset(second_part))
+    full_model = ItemKNN(2, shrink=1.0, use_rating=use_rating, similarity_backend=similarity_backend)
+    full_model.fit(create_dataset(log))
+
+    similarity = _sorted_similarity(model)
+    full_similarity = _sorted_similarity(full_model)
+    columns = ["item_idx_one", "item_idx_two"]
+    assert (similarity[columns] == full_similarity[columns]).all(axis=None)
+    assert np.allclose(similarity["similarity"], full_similarity["similarity"])
+    assert model._num_queries == full_model._num_queries
+    assert model._num_items == full_model._num_items
+
+
+@pytest.mark.spark
+def test_refit_with_weighting_raises(log):
+    model = ItemKNN(weighting="tf_idf")
+    model.fit(create_dataset(log))
+    with pytest.raises(ValueError, match="refit is not supported with weighting.*"):
+        model.refit(create_dataset(log))
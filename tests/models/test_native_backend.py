@@ -0,0 +1,148 @@
+# pylint: disable=redefined-outer-name, missing-function-docstring, unused-import
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.sparse import csr_matrix
+
+from replay.data import Dataset, FeatureHint, FeatureInfo, FeatureSchema, FeatureType
+from replay.models import ItemKNN, PopRec, UCB, Wilson
+from replay.utils.model_artifacts import load_model_artifacts
+from replay.utils.model_handler import save_model_artifacts
+from replay.utils.native import sparse_product
+from tests.utils import create_dataset, spark
+
+
+@pytest.fixture
+def pandas_log():
+    return pd.DataFrame(
+        {
+            "user_idx": [0, 0, 0, 1, 1, 2, 2, 2, 3, 3, 4],
+            "item_idx": [0, 2, 1, 3, 0, 1, 0, 2, 1, 0, 4],
+            "relevance": [1.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0, 1.0, 1.0, 1.0, 0.0],
+            "timestamp": [1, 2, 3, 4, 5, 6, 6, 6, 7, 7, 8],
+        }
+    )
+
+
+def _pandas_dataset(log):
+    feature_schema = FeatureSchema(
+        [
+            FeatureInfo(column="user_idx", feature_type=FeatureType.CATEGORICAL, feature_hint=FeatureHint.QUERY_ID),
+            FeatureInfo(column="item_idx", feature_type=FeatureType.CATEGORICAL, feature_hint=FeatureHint.ITEM_ID),
+            FeatureInfo(column="relevance", feature_type=FeatureType.NUMERICAL, feature_hint=FeatureHint.RATING),
+            FeatureInfo(column="timestamp", feature_type=FeatureType.NUMERICAL, feature_hint=FeatureHint.TIMESTAMP),
+        ]
+    )
+    return Dataset(feature_schema=feature_schema, interactions=log, check_consistency=False)
+
+
+def _sorted(recs):
+    return recs.sort_values(["user_idx", "item_idx"]).reset_index(drop=True)
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize(
+    "model_class, params",
+    [
+        (PopRec, {}),
+        (PopRec, {"use_rating": True}),
+        (Wilson, {}),
+        (UCB, {}),
+        (ItemKNN, {"num_neighbours": 2}),
+        (ItemKNN, {"use_rating": True, "shrink": 1.0, "weighting": "tf_idf"}),
+        (ItemKNN, {"weighting": "bm25"}),
+    ],
+)
+@pytest.mark.parametrize("filter_seen_items", [True, False])
+@pytest.mark.parametrize("k", [2, 10])
+def test_native_equals_spark(pandas_log, model_class, params, filter_seen_items, k):
+    native_model = model_class(**params)
+    native_model.fit(_pandas_dataset(pandas_log))
+    native_recs = native_model.predict(
+        _pandas_dataset(pandas_log), k=k, queries=[0, 1, 2, 3, 4], filter_seen_items=filter_seen_items
+    )
+
+    spark_model = model_class(**params)
+    spark_model.fit(create_dataset(pandas_log))
+    spark_recs = spark_model.predict(
+        create_dataset(pandas_log), k=k, queries=[0, 1, 2, 3, 4], filter_seen_items=filter_seen_items
+    ).toPandas()
+
+    assert isinstance(native_recs, pd.DataFrame)
+    if k == 2:
+        # items with equal relevance may be ranked differently
+        native_recs, spark_recs = [
+            recs.sort_values(["user_idx", "relevance"]).reset_index(drop=True) for recs in [native_recs, spark_recs]
+        ]
+        assert native_recs["user_idx"].tolist() == spark_recs["user_idx"].tolist()
+    else:
+        native_recs, spark_recs = _sorted(native_recs), _sorted(spark_recs)
+        assert (
+            native_recs[["user_idx", "item_idx"]].values.tolist() == spark_recs[["user_idx", "item_idx"]].values.tolist()
+        )
+    assert np.allclose(native_recs["relevance"], spark_recs["relevance"])
+
+
+@pytest.mark.spark
+def test_native_predict_pairs(pandas_log):
+    model = ItemKNN()
+    model.fit(_pandas_dataset(pandas_log))
+    pairs = pd.DataFrame({"user_idx": [0, 1, 4], "item_idx": [3, 2, 0]})
+    spark_model = ItemKNN()
+    spark_model.fit(create_dataset(pandas_log))
+
+    native_recs = _sorted(model.predict_pairs(pairs, dataset=_pandas_dataset(pandas_log)))
+    spark_recs = _sorted(
+        spark_model.predict_pairs(pairs, dataset=create_dataset(pandas_log)).toPandas()
+    )
+    assert native_recs[["user_idx", "item_idx"]].values.tolist() == spark_recs[["user_idx", "item_idx"]].values.tolist()
+    assert np.allclose(native_recs["relevance"], spark_recs["relevance"])
+
+
+@pytest.mark.core
+def test_sparse_product_without_common_entries():
+    left = csr_matrix(([1.0], ([0], [0])), shape=(1, 2))
+    right = csr_matrix(([1.0], ([1], [1])), shape=(2, 3))
+    product = sparse_product(left, right)
+    assert product.shape == (1, 3)
+    assert product.nnz == 0
+    assert product.dtype == np.float64
+
+
+@pytest.mark.core
+def test_native_item_knn_query_without_neighbours(pandas_log):
+    model = ItemKNN()
+    model.fit(_pandas_dataset(pandas_log))
+    # item 4 is interacted only by query 4, so it has no similar items
+    recs = model.predict(_pandas_dataset(pandas_log), k=2, queries=[4])
+    assert isinstance(recs, pd.DataFrame)
+    assert recs.empty
+
+    recs = model.predict(_pandas_dataset(pandas_log), k=2, queries=[0, 4])
+    assert set(recs["user_idx"]) == {0}
+    assert not set(recs["item_idx"]) & {0, 1, 2}
+
+
+@pytest.mark.core
+def test_native_neighbour_rec_requires_interactions(pandas_log):
+    model = ItemKNN()
+    model.fit(_pandas_dataset(pandas_log))
+    with pytest.raises(ValueError, match="interactions is not provided"):
+        model.predict(None, k=2, queries=[0])
+    with pytest.raises(ValueError, match="interactions is not provided"):
+        model.predict_pairs(pd.DataFrame({"user_idx": [0], "item_idx": [3]}))
+
+
+@pytest.mark.core
+@pytest.mark.parametrize("filter_seen_items", [True, False])
+def test_native_item_knn_artifacts(pandas_log, tmp_path, filter_seen_items):
+    model = ItemKNN(num_neighbours=2)
+    model.fit(_pandas_dataset(pandas_log))
+    recs = model.predict(_pandas_dataset(pandas_log), k=2, filter_seen_items=filter_seen_items)
+    save_model_artifacts(model, tmp_path / "artifacts")
+
+    scorer_recs = load_model_artifacts(tmp_path / "artifacts").predict(pandas_log, 2, filter_seen_items)
+    recs, scorer_recs = _sorted(recs), _sorted(scorer_recs)
+    assert recs[["user_idx", "item_idx"]].equals(scorer_recs[["user_idx", "item_idx"]])
+    assert np.allclose(recs["relevance"], scorer_recs["relevance"])
+
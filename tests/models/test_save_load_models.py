@@ -23,7 +23,8 @@ if PYSPARK_AVAILABLE:
     from pyspark.sql import functions as sf
 
     from replay.models.extensions.ann.index_stores.spark_files_index_store import SparkFilesIndexStore
-    from replay.utils.model_handler import load, save
+    from replay.utils.model_artifacts import FactorScorer, SimilarityScorer, load_model_artifacts
+    from replay.utils.model_handler import load, save, save_model_artifacts
     from replay.utils.spark_utils import convert2spark
 
 
@@ -83,6 +84,39 @@ def test_equal_preds(long_log_with_features, recommender, tmp_path):
     sparkDataFrameEqual(base_pred, new_pred)
 
 
+@pytest.mark.spark
+@pytest.mark.parametrize(
+    "recommender, scorer_type",
+    [(ALSWrap, FactorScorer), (ItemKNN, SimilarityScorer)],
+)
+def test_model_artifacts_preds(long_log_with_features, recommender, scorer_type, tmp_path):
+    dataset = create_dataset(long_log_with_features)
+    model = recommender()
+    model.fit(dataset)
+    base_pred = model.predict(dataset, 3).toPandas()
+    save_model_artifacts(model, tmp_path / "artifacts")
+    scorer = load_model_artifacts(tmp_path / "artifacts")
+    assert isinstance(scorer, scorer_type)
+
+    interactions = long_log_with_features.toPandas()
+    if isinstance(scorer, FactorScorer):
+        pred = scorer.predict(interactions["user_idx"], 3, interactions)
+    else:
+        pred = scorer.predict(interactions, 3)
+    base_pred = base_pred.sort_values(["user_idx", "relevance"], ascending=False)
+    pred = pred.sort_values(["user_idx", "relevance"], ascending=False)
+    assert base_pred["user_idx"].tolist() == pred["user_idx"].tolist()
+    assert pred["relevance"].to_numpy() == pytest.approx(base_pred["relevance"].to_numpy(), rel=1e-5)
+
+
+@pytest.mark.spark
+def test_model_artifacts_unsupported_model(long_log_with_features, tmp_path):
+    model = PopRec()
+    model.fit(create_dataset(long_log_with_features))
+    with pytest.raises(TypeError, match="Artifacts are not supported"):
+        save_model_artifacts(model, tmp_path / "artifacts")
+
+
 @pytest.mark.xfail
 @pytest.mark.spark
 def test_random(long_log_with_features, tmp_path):
@@ -208,6 +242,8 @@ def test_ann_word2vec_saving_loading(long_log_with_features, tmp_path):
                 ef_c=2000,
                 post=0,
                 ef_s=2000,
+                num_threads=2,
+                batch_size=2,
             ),
             index_store=SharedDiskIndexStore(
                 warehouse_dir=str(tmp_path),
@@ -222,6 +258,8 @@ def test_ann_word2vec_saving_loading(long_log_with_features, tmp_path):
     base_pred = model.predict(dataset, 5)
     save(model, path)
     loaded_model = load(path)
+    assert loaded_model.index_builder.index_params.num_threads == 2
+    assert loaded_model.index_builder.index_params.batch_size == 2
     new_pred = loaded_model.predict(dataset, 5)
     sparkDataFrameEqual(base_pred, new_pred)
 
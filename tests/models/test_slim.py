@@ -4,6 +4,7 @@ import numpy as np
 import pytest
 
 from replay.models import SLIM
+from replay.models.slim import _fit_elastic_net_gram
 from replay.models.extensions.ann.entities.nmslib_hnsw_param import NmslibHnswParam
 from replay.models.extensions.ann.index_builders.executor_nmslib_index_builder import ExecutorNmslibIndexBuilder
 from replay.models.extensions.ann.index_builders.nmslib_index_builder_mixin import NmslibIndexBuilderMixin
@@ -130,3 +131,50 @@ def test_build_index_udf(log, model, tmp_path):
     NmslibIndexBuilderMixin.build_and_save_index(
         similarity_pdf, nmslib_hnsw_params, index_store
     )
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("beta,lambda_", [(0.0, 0.01), (0.5, 0.1)])
+def test_gram_backend_equals_driver(log, beta, lambda_):
+    dataset = create_dataset(log)
+    driver_model = SLIM(beta, lambda_, seed=42)
+    gram_model = SLIM(beta, lambda_, seed=42, similarity_backend="gram")
+    driver_model.fit(dataset)
+    gram_model.fit(dataset)
+
+    columns = ["item_idx_one", "item_idx_two"]
+    driver_similarity = driver_model.similarity.toPandas().sort_values(columns).reset_index(drop=True)
+    gram_similarity = gram_model.similarity.toPandas().sort_values(columns).reset_index(drop=True)
+    assert (driver_similarity[columns] == gram_similarity[columns]).all(axis=None)
+    # sklearn ElasticNet of the driver backend stops at its default tolerance
+    assert np.allclose(driver_similarity["similarity"], gram_similarity["similarity"], atol=1e-3)
+
+
+@pytest.mark.core
+def test_invalid_similarity_backend():
+    with pytest.raises(ValueError, match="similarity_backend must be one of .*"):
+        SLIM(similarity_backend="invalid_backend")
+
+
+@pytest.mark.core
+@pytest.mark.parametrize("l2_penalty", [0.0, 0.5])
+def test_elastic_net_gram_batch_equals_single_problems(l2_penalty):
+    rng = np.random.default_rng(42)
+    problems = []
+    for size in [1, 3, 5]:
+        interactions = rng.integers(0, 3, size=(20, size + 1)).astype(float)
+        gram = interactions[:, :-1].T @ interactions[:, :-1]
+        problems.append((gram, interactions[:, :-1].T @ interactions[:, -1]))
+
+    batch_gram = np.zeros((len(problems), 5, 5))
+    batch_target_gram = np.zeros((len(problems), 5))
+    for i, (gram, target_gram) in enumerate(problems):
+        batch_gram[i, : len(gram), : len(gram)] = gram
+        batch_target_gram[i, : len(gram)] = target_gram
+    weights = _fit_elastic_net_gram(batch_gram, batch_target_gram, 1.0, l2_penalty, 5000, 1e-6)
+
+    for i, (gram, target_gram) in enumerate(problems):
+        expected = _fit_elastic_net_gram(gram[None], target_gram[None], 1.0, l2_penalty, 5000, 1e-6)[0]
+        assert np.array_equal(weights[i, : len(gram)], expected)
+        assert (weights[i, len(gram) :] == 0).all()
+
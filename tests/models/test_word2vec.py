@@ -2,10 +2,12 @@
 from datetime import datetime
 
 import numpy as np
+import pandas as pd
 import pytest
 
 from replay.data import get_schema
 from replay.models import Word2VecRec
+from replay.models.word2vec import _score_histories
 from replay.models.extensions.ann.entities.hnswlib_param import HnswlibParam
 from replay.models.extensions.ann.index_builders.driver_hnswlib_index_builder import DriverHnswlibIndexBuilder
 from replay.models.extensions.ann.index_stores.shared_disk_index_store import SharedDiskIndexStore
@@ -134,3 +136,41 @@ def test_word2vec_predict(log2, model, model_with_ann):
     )
     assert recs1.user_idx.equals(recs2.user_idx)
     assert recs1.item_idx.equals(recs2.item_idx)
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("filter_seen_items", [True, False])
+def test_predict_equals_predict_pairs(log2, model, filter_seen_items):
+    dataset = create_dataset(log2)
+    model.fit(dataset)
+    recs = model.predict(dataset, k=10, filter_seen_items=filter_seen_items).toPandas()
+
+    pairs = (
+        log2.select("user_idx").distinct().crossJoin(model.vectors.select(sf.col("item").alias("item_idx")))
+    )
+    if filter_seen_items:
+        pairs = pairs.join(log2, on=["user_idx", "item_idx"], how="left_anti")
+    pairs_recs = model.predict_pairs(pairs, dataset).toPandas()
+
+    columns = ["user_idx", "item_idx"]
+    recs = recs.sort_values(columns).reset_index(drop=True)
+    pairs_recs = pairs_recs.sort_values(columns).reset_index(drop=True)
+    assert recs[columns].equals(pairs_recs[columns])
+    assert np.allclose(recs["relevance"], pairs_recs["relevance"])
+
+
+@pytest.mark.core
+def test_score_histories_blocks(monkeypatch):
+    histories = pd.DataFrame({"user_idx": [0, 1, 2, 3], "history": [[0, 1], [2, 5], [7], []]})
+    vocabulary_ids = np.array([0, 1, 2, 3])
+    vectors = np.array([[1.0, 0.0], [0.0, 1.0], [1.0, 1.0], [-1.0, 2.0]])
+    args = (histories, vocabulary_ids, vectors, vocabulary_ids[1:], vectors[1:], 2, True, 2, "user_idx", "item_idx", "relevance")
+
+    recs = _score_histories(*args)
+    monkeypatch.setattr("replay.utils.native.SCORES_BLOCK_SIZE", 3)
+    block_recs = _score_histories(*args)
+
+    assert recs.equals(block_recs)
+    assert recs["user_idx"].tolist() == [0, 0, 1, 1]
+    assert recs["item_idx"].tolist() == [2, 3, 1, 3]
+    assert np.allclose(recs["relevance"], [3.0, 2.5, 3.0, 3.0])
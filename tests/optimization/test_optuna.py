@@ -1,7 +1,9 @@
 # pylint: disable=redefined-outer-name, missing-function-docstring, unused-import
 import pytest
 
+from replay.metrics import NDCG
 from replay.models import SLIM, ALSWrap, ItemKNN
+from replay.optimization.optuna_objective import calculate_criterion_value, prepare_ground_truth
 from tests.utils import create_dataset, log, spark
 
 
@@ -79,3 +81,35 @@ def test_it_works(model, log):
     assert len(model.study.trials) == 1
     model.optimize(dataset, dataset, k=2, budget=1, new_study=False)
     assert len(model.study.trials) == 2
+
+
+@pytest.mark.spark
+def test_concurrent_trials(model, log, tmp_path):
+    dataset = create_dataset(log)
+    storage_path = str(tmp_path / "study.log")
+    res = model.optimize(dataset, dataset, k=2, budget=2, n_jobs=2, storage_path=storage_path)
+    assert isinstance(res["rank"], int)
+    assert len(model.study.trials) == 2
+    assert not dataset.interactions.is_cached
+
+    new_model = ALSWrap()
+    new_model.optimize(dataset, dataset, k=2, budget=1, new_study=False, storage_path=storage_path)
+    assert len(new_model.study.trials) == 3
+
+    new_model.optimize(dataset, dataset, k=2, budget=1, storage_path=storage_path)
+    assert len(new_model.study.trials) == 1
+
+
+@pytest.mark.spark
+def test_prepared_ground_truth(log):
+    dataset = create_dataset(log)
+    model = ItemKNN()
+    model.fit(dataset)
+    recs = model.predict(dataset, k=2, filter_seen_items=False)
+    criterion = NDCG(topk=2, query_column="user_idx", item_column="item_idx", rating_column="relevance")
+
+    ground_truth = prepare_ground_truth(criterion, log)
+    assert set(ground_truth.columns) == {"user_idx", "ground_truth"}
+    assert calculate_criterion_value(criterion, recs, log, ground_truth) == pytest.approx(
+        calculate_criterion_value(criterion, recs, log)
+    )
@@ -1,3 +1,5 @@
+import pickle
+
 import pandas as pd
 import pytest
 
@@ -321,3 +323,99 @@ def test_default_value_after_partial_fit(
     assert after_fit["item2"].tolist()[-1] == 5
     assert after_partial_fit["item1"].tolist()[-1] == 3
     assert after_partial_fit["item2"].tolist()[-1] == 5
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("broadcast_threshold", [0, 100])
+@pytest.mark.usefixtures("simple_dataframe")
+def test_label_encoder_distributed_mapping_spark(broadcast_threshold, simple_dataframe):
+    rule = LabelEncodingRule("user_id", distributed_mapping=True, broadcast_threshold=broadcast_threshold)
+    encoder = LabelEncoder([rule]).fit(simple_dataframe)
+    assert rule._mapping is None
+
+    mapped_data = encoder.transform(simple_dataframe)
+    rebuild_original_cols = encoder.inverse_transform(mapped_data)
+
+    columns_order = ["user_id", "item_id", "timestamp"]
+    df1 = simple_dataframe.orderBy(*columns_order).toPandas()[columns_order]
+    df2 = rebuild_original_cols.orderBy(*columns_order).toPandas()[columns_order]
+    pd.testing.assert_frame_equal(df1, df2)
+
+    mapping = encoder.mapping["user_id"]
+    assert sorted(mapping.values()) == list(range(simple_dataframe.select("user_id").distinct().count()))
+
+
+@pytest.mark.spark
+@pytest.mark.usefixtures("simple_dataframe")
+def test_label_encoder_distributed_mapping_save_load(simple_dataframe, tmp_path):
+    encoder = LabelEncoder([LabelEncodingRule("user_id", distributed_mapping=True)]).fit(simple_dataframe)
+    path = tmp_path / "encoder.pickle"
+    with open(path, "wb") as encoder_file:
+        pickle.dump(encoder, encoder_file)
+    with open(path, "rb") as encoder_file:
+        loaded_encoder = pickle.load(encoder_file)
+
+    assert loaded_encoder.mapping == encoder.mapping
+    columns_order = ["user_id", "item_id", "timestamp"]
+    df1 = encoder.transform(simple_dataframe).orderBy(*columns_order).toPandas()[columns_order]
+    df2 = loaded_encoder.transform(simple_dataframe).orderBy(*columns_order).toPandas()[columns_order]
+    pd.testing.assert_frame_equal(df1, df2)
+
+
+@pytest.mark.spark
+@pytest.mark.usefixtures("spark_df_for_labelencoder", "spark_df_for_labelencoder_modified")
+def test_label_encoder_distributed_mapping_pickled_to_parquet(
+    spark_df_for_labelencoder, spark_df_for_labelencoder_modified, tmp_path
+):
+    rule = LabelEncodingRule("item1", distributed_mapping=True, mapping_path=str(tmp_path / "mapping"))
+    rule.fit(spark_df_for_labelencoder)
+    loaded_rule = pickle.loads(pickle.dumps(rule))
+
+    assert rule._mapping is None
+    assert loaded_rule._mapping is None
+    assert (tmp_path / "mapping").exists()
+    columns_order = ["user_id", "item1", "item2"]
+    df1 = rule.transform(spark_df_for_labelencoder).toPandas().sort_values("user_id")[columns_order]
+    df2 = loaded_rule.transform(spark_df_for_labelencoder).toPandas().sort_values("user_id")[columns_order]
+    pd.testing.assert_frame_equal(df1, df2)
+    assert loaded_rule._mapping is None
+
+    loaded_rule.partial_fit(spark_df_for_labelencoder_modified)
+    reloaded_rule = pickle.loads(pickle.dumps(loaded_rule))
+    assert reloaded_rule.get_mapping() == loaded_rule.get_mapping()
+    assert reloaded_rule.get_mapping()["item_3"] == 2
+    assert sorted(reloaded_rule.get_mapping().values()) == [0, 1, 2]
+
+
+@pytest.mark.spark
+@pytest.mark.usefixtures(
+    "spark_df_for_labelencoder",
+    "spark_df_for_labelencoder_modified",
+)
+def test_spark_distributed_partial_fit(spark_df_for_labelencoder, spark_df_for_labelencoder_modified):
+    encoder = LabelEncoder(
+        [LabelEncodingRule("item1", distributed_mapping=True), LabelEncodingRule("item2", distributed_mapping=True)]
+    )
+    encoder.fit(spark_df_for_labelencoder.repartition(2))
+    encoder.set_handle_unknowns({"item1": "use_default_value", "item2": "use_default_value"})
+    encoder.set_default_values({"item1": "last", "item2": None})
+    after_fit = encoder.transform(spark_df_for_labelencoder_modified).toPandas().sort_values("user_id")
+
+    encoder.partial_fit(spark_df_for_labelencoder_modified)
+    transformed = encoder.transform(spark_df_for_labelencoder_modified).toPandas().sort_values("user_id")
+
+    assert after_fit["item1"].tolist()[-1] == 2
+    assert str(after_fit["item2"].tolist()[-1]) == "nan"
+    assert sorted(transformed["item1"]) == [0, 1, 2]
+    assert sorted(transformed["item2"]) == [0, 1, 2]
+    assert transformed["item1"].tolist()[-1] == 2
+    assert encoder.mapping["item1"]["item_3"] == 2
+    assert encoder.inverse_mapping["item2"][2] == "item_3"
+
+
+@pytest.mark.spark
+@pytest.mark.usefixtures("spark_df_for_labelencoder")
+def test_distributed_mapping_default_value_in_seen_labels(spark_df_for_labelencoder):
+    rule = LabelEncodingRule("item1", handle_unknown="use_default_value", default_value=1, distributed_mapping=True)
+    with pytest.raises(ValueError):
+        rule.fit(spark_df_for_labelencoder)
@@ -160,3 +160,13 @@ def test_valid_session_ids(request, dataset, session_gap, min_interactions, max_
         session_ids = _get_column_list_pandas(result, "session_id")
 
     assert session_ids == answer
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("num_partitions", [1, 3, 7])
+def test_session_ids_do_not_depend_on_partitioning(session_dataset_spark, session_dataset_pandas, num_partitions):
+    sessionizer = Sessionizer(time_column="timestamp", user_column="user_id", session_gap=10)
+    result = sessionizer.transform(session_dataset_spark.repartition(num_partitions, "timestamp"))
+
+    session_ids = _get_column_list(result.sort("user_id", "timestamp"), "session_id")
+    assert session_ids == _get_column_list_pandas(sessionizer.transform(session_dataset_pandas), "session_id")
@@ -44,3 +44,39 @@ def test_sum_pandas(df):
 def test_wrong_type():
     with pytest.raises(ValueError):
         next(KFolds(2, strategy="totally not query"))
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("session_id_column", [None, "session_id"])
+@pytest.mark.parametrize("use_folds_path", [False, True])
+def test_materialized_folds_equal_to_lazy(df_spark, tmp_path, session_id_column, use_folds_path):
+    params = dict(n_folds=2, seed=1337, session_id_column=session_id_column, query_column="user_id")
+    lazy_cv = KFolds(**params)
+    materialized_cv = KFolds(
+        **params,
+        materialize_folds=True,
+        folds_path=str(tmp_path / "folds") if use_folds_path else None,
+    )
+    for lazy_split, materialized_split in zip(
+        lazy_cv._core_split(df_spark), materialized_cv._core_split(df_spark)
+    ):
+        for lazy, materialized in zip(lazy_split, materialized_split):
+            lazy = lazy.toPandas().sort_values(["user_id", "item_id"]).reset_index(drop=True)
+            materialized = materialized.toPandas().sort_values(["user_id", "item_id"]).reset_index(drop=True)
+            pd.testing.assert_frame_equal(lazy, materialized[lazy.columns])
+
+
+@pytest.mark.spark
+def test_materialized_folds_are_released(df_spark):
+    java_context = df_spark.sql_ctx.sparkSession.sparkContext._jsc
+    cached_before = java_context.getPersistentRDDs().size()
+    cv = KFolds(n_folds=2, seed=1337, query_column="user_id", materialize_folds=True)
+    splits = list(cv._core_split(df_spark))
+    for train, test in splits:
+        assert train.count() + test.count() == df_spark.count()
+    assert java_context.getPersistentRDDs().size() > cached_before
+
+    cv.release()
+    assert java_context.getPersistentRDDs().size() == cached_before
+    train, test = splits[0]
+    assert train.count() + test.count() == df_spark.count()
@@ -6,6 +6,7 @@ pyspark = pytest.importorskip("pyspark")
 
 from replay.models import ItemKNN
 from replay.scenarios import Fallback
+from replay.utils.instrumentation import Instrumentation
 from replay.utils.spark_utils import convert2spark, fallback
 from tests.utils import create_dataset, log, log2, spark
 
@@ -42,3 +43,38 @@ def test_class(log, log2):
     assert p2 is None
     assert isinstance(p1, dict)
     model.predict(dataset2, k=1)
+
+
+@pytest.mark.spark
+def test_predict_ranks_main_recs_first(log):
+    dataset = create_dataset(log)
+    model = Fallback(ItemKNN(num_neighbours=1), threshold=3)
+    model.fit(dataset)
+    recs = model.predict(dataset, k=3).toPandas()
+
+    hot_queries = model.hot_queries.toPandas()["user_idx"]
+    main_recs = model.main_model.predict(dataset, k=3, queries=hot_queries.tolist()).toPandas()
+    seen = log.toPandas()
+    num_items = seen["item_idx"].nunique()
+    for user_idx, user_recs in recs.groupby("user_idx"):
+        user_seen = set(seen.loc[seen["user_idx"] == user_idx, "item_idx"])
+        assert not user_seen & set(user_recs["item_idx"])
+        assert len(user_recs) == min(3, num_items - len(user_seen))
+        main_items = set(main_recs.loc[main_recs["user_idx"] == user_idx, "item_idx"])
+        if main_items:
+            ranked_items = user_recs.sort_values("relevance", ascending=False)["item_idx"].tolist()
+            assert set(ranked_items[: len(main_items)]) == main_items
+
+
+@pytest.mark.spark
+def test_predict_with_main_model_wrapper(log):
+    dataset = create_dataset(log)
+    model = Fallback(ItemKNN(num_neighbours=1), threshold=3)
+    model.fit(dataset)
+    recs = model.predict(dataset, k=3).toPandas().sort_values(["user_idx", "item_idx"], ignore_index=True)
+
+    model.main_model.instrumentation = Instrumentation(collect_spark_metrics=False)
+    wrapped_recs = model.predict(dataset, k=3).toPandas().sort_values(["user_idx", "item_idx"], ignore_index=True)
+    # seen items are filtered by the wrapper of the model, not by the plan
+    assert "filter_seen" in [report.name for report in model.main_model.instrumentation.reports]
+    pd.testing.assert_frame_equal(recs, wrapped_recs)
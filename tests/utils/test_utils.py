@@ -11,7 +11,7 @@ from tests.utils import long_log_with_features, spark, sparkDataFrameEqual
 pyspark = pytest.importorskip("pyspark")
 
 import pyspark.sql.functions as sf
-from pyspark.sql import SparkSession
+from pyspark.sql import SparkSession, Window
 from pyspark.sql.types import TimestampType
 
 import replay.utils.session_handler
@@ -134,3 +134,47 @@ def test_get_unique_entities(spark, array):
     assert sorted(
         list(utils.get_unique_entities(array or log, "test").toPandas()["test"])
     ) == [1, 2, 3]
+
+
+@pytest.mark.spark
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_get_top_k_by_columns_equals_window_ranking(spark, k):
+    rng = np.random.default_rng(0)
+    recs = pd.DataFrame(
+        {
+            "user_idx": rng.integers(0, 20, 1000),
+            "item_idx": np.arange(1000),
+            "relevance": rng.integers(0, 5, 1000).astype(float),
+        }
+    )
+    recs = spark.createDataFrame(recs).repartition(4)
+
+    top_k = utils.get_top_k_by_columns(
+        recs, "user_idx", ["relevance", "item_idx"], k, ascending=[False, True], rank_column="rank"
+    )
+    expected = utils.get_top_k(
+        recs.withColumn(
+            "rank",
+            sf.row_number().over(
+                Window.partitionBy("user_idx").orderBy(sf.col("relevance").desc(), sf.col("item_idx"))
+            ),
+        ),
+        sf.col("user_idx"),
+        [sf.col("rank")],
+        k,
+    )
+    sparkDataFrameEqual(top_k, expected)
+
+
+@pytest.mark.spark
+def test_get_top_k_by_columns_without_arrow_support(spark):
+    from pyspark.ml.linalg import Vectors
+
+    recs = spark.createDataFrame(
+        [(1, 1, 1.0, Vectors.dense([1.0])), (1, 2, 2.0, Vectors.dense([2.0])), (2, 3, 1.0, Vectors.dense([3.0]))],
+        schema=["user_idx", "item_idx", "relevance", "vector"],
+    )
+
+    top_k = utils.get_top_k_by_columns(recs, "user_idx", ["relevance", "item_idx"], 1, ascending=[False, True])
+
+    assert sorted(top_k.select("user_idx", "item_idx").collect()) == [(1, 2), (2, 3)]